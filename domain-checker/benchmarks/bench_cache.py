@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Benchmark cache backends by writing N cached results one at a time
+
+    python benchmarks/bench_cache.py --entries 100000
+
+The JSON backend rewrites the whole file per entry, so it is measured on a
+smaller sample (--json-entries) to keep the run short.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from domain_checker_mcp.cache import JSONCacheBackend, SQLiteCacheBackend
+
+
+def write_entries(backend, count: int) -> float:
+    now = datetime.now()
+    entry = {'status': 'unavailable', 'method': 'dns', 'timestamp': now.isoformat(),
+             'expires_at': now.timestamp() + 86400}
+    start = time.perf_counter()
+    for i in range(count):
+        backend.set(f"bench-{i}.com", entry)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Domain cache backend benchmark")
+    parser.add_argument("--entries", type=int, default=100_000, help="Entries written to SQLite")
+    parser.add_argument("--json-entries", type=int, default=2_000, help="Entries written to JSON")
+    args = parser.parse_args()
+
+    print(f"{'backend':>8} {'entries':>9} {'seconds':>9} {'writes/s':>10} {'last 1k writes/s':>17}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, backend, count in (
+            ("json", JSONCacheBackend(Path(tmp) / "cache.json"), args.json_entries),
+            ("sqlite", SQLiteCacheBackend(Path(tmp) / "cache.sqlite3"), args.entries),
+        ):
+            elapsed = write_entries(backend, count - 1000)
+            # Per-write cost once the cache is already large
+            tail = time.perf_counter()
+            for i in range(count - 1000, count):
+                backend.set(f"bench-{i}.com", backend.get("bench-0.com"))
+            tail = time.perf_counter() - tail
+            elapsed += tail
+            assert len(backend) == count
+            print(f"{name:>8} {count:>9} {elapsed:>9.2f} {count / elapsed:>10.0f} {1000 / tail:>17.0f}")
+            backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Benchmark DomainChecker.check_domains_batch against a local stub DNS server
+
+Shows how batch throughput scales with the max_concurrency setting:
+
+    python benchmarks/bench_concurrency.py --domains 500 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.stubs import StubDNSServer
+from domain_checker_mcp.checker import DomainChecker
+
+
+async def run_batch(port: int, concurrency: int, domains: list[str], cache_dir: Path) -> float:
+    checker = DomainChecker(
+        max_concurrency=concurrency,
+        dns_rate=0,  # measure the engine, not the limiter
+        nameservers=["127.0.0.1"],
+        dns_port=port,
+        cache_dir=cache_dir,
+    )
+    start = time.perf_counter()
+    results = await checker.check_domains_batch(domains)
+    elapsed = time.perf_counter() - start
+    assert results['summary']['unavailable_count'] == len(domains), results['summary']
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Domain checker concurrency benchmark")
+    parser.add_argument("--domains", type=int, default=200, help="Number of domains per batch")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub DNS latency in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 5, 20, 50, 100])
+    args = parser.parse_args()
+
+    domains = [f"bench-{i}.com" for i in range(args.domains)]
+
+    print(f"=== Concurrency benchmark: {args.domains} domains, {args.latency * 1000:.0f}ms stub latency ===\n")
+    print(f"{'concurrency':>12} {'seconds':>10} {'domains/s':>12}")
+    with StubDNSServer(latency=args.latency) as stub:
+        for concurrency in args.concurrency:
+            # Fresh cache per run so every domain goes to the stub
+            with tempfile.TemporaryDirectory() as tmp:
+                elapsed = asyncio.run(run_batch(stub.port, concurrency, domains, Path(tmp)))
+            print(f"{concurrency:>12} {elapsed:>10.2f} {args.domains / elapsed:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
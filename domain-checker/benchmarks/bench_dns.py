@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark the adaptive DNS resolver against dnspython's fixed-timeout resolver
+
+Two local stub resolvers stand in for the upstreams: a primary that is fast
+but drops some packets, and a secondary that is reliable but slow. The
+stock resolver waits out its full timeout on every lost packet; the
+adaptive one races both and learns how long to wait:
+
+    python benchmarks/bench_dns.py --queries 300 --loss 0.05
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import dns.asyncresolver
+
+from benchmarks.stubs import StubDNSServer
+from domain_checker_mcp.resolver import AdaptiveResolver
+
+
+async def run_queries(resolver, names: list[str], concurrency: int) -> tuple[list[float], int]:
+    """Resolve every name; returns per-query seconds and the number of failures"""
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def one(name: str) -> float:
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await resolver.resolve(name, 'A')
+            except Exception:
+                failures += 1
+            return time.perf_counter() - start
+
+    elapsed = await asyncio.gather(*(one(name) for name in names))
+    return list(elapsed), failures
+
+
+def report(label: str, elapsed: list[float], failures: int, wall: float):
+    ordered = sorted(elapsed)
+    pct = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    print(f"{label:>10} {wall:>8.2f} {statistics.mean(elapsed) * 1000:>9.1f} {pct(0.5):>9.1f} "
+          f"{pct(0.95):>9.1f} {pct(0.99):>9.1f} {max(elapsed) * 1000:>9.1f} {failures:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive vs fixed-timeout DNS benchmark")
+    parser.add_argument("--queries", type=int, default=300, help="Number of names to resolve")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--primary-latency", type=float, default=0.01, help="Fast, lossy resolver latency (s)")
+    parser.add_argument("--secondary-latency", type=float, default=0.08, help="Slow, reliable resolver latency (s)")
+    parser.add_argument("--loss", type=float, default=0.05, help="Packet loss on the fast resolver")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Fixed timeout for the stock resolver")
+    args = parser.parse_args()
+
+    names = [f"bench-{i}.com" for i in range(args.queries)]
+    print(f"=== DNS benchmark: {args.queries} queries, primary {args.primary_latency * 1000:.0f}ms "
+          f"with {args.loss:.0%} loss, secondary {args.secondary_latency * 1000:.0f}ms ===\n")
+    print(f"{'resolver':>10} {'wall s':>8} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9} {'failures':>9}")
+
+    with StubDNSServer(host="127.0.0.1", latency=args.primary_latency, loss=args.loss) as primary:
+        with StubDNSServer(host="127.0.0.2", port=primary.port, latency=args.secondary_latency):
+            stock = dns.asyncresolver.Resolver(configure=False)
+            stock.nameservers = ["127.0.0.1", "127.0.0.2"]
+            stock.port = primary.port
+            stock.timeout = args.timeout
+            stock.lifetime = args.timeout * 2
+            start = time.perf_counter()
+            elapsed, failures = asyncio.run(run_queries(stock, names, args.concurrency))
+            report("fixed", elapsed, failures, time.perf_counter() - start)
+
+            adaptive = AdaptiveResolver(["127.0.0.1", "127.0.0.2"], port=primary.port)
+            start = time.perf_counter()
+            elapsed, failures = asyncio.run(run_queries(adaptive, names, args.concurrency))
+            report("adaptive", elapsed, failures, time.perf_counter() - start)
+
+    print("\nAdaptive resolver per-nameserver state:")
+    for ns, stats in adaptive.nameserver_stats().items():
+        print(f"  {ns}: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Load test DomainChecker end to end against local stand-ins
+
+A stub resolver, a stub TLD nameserver, a fake RDAP server and a fake WHOIS
+server (each with configurable latency, packet loss or rate limit) stand in
+for the internet. The domain mix exercises every stage: names with DNS
+records, parked names only the registry delegates, registered names without
+DNS (answered by RDAP, or WHOIS for a TLD without RDAP), and free names.
+
+Every size is run cold (empty cache) and then warm (same names again), and
+each result is compared with what the stand-ins were told, so the run also
+catches wrong answers:
+
+    python benchmarks/bench_load.py --sizes 10 1000 100000
+    python benchmarks/bench_load.py --sizes 1000 --json results.json
+    python benchmarks/bench_load.py --sizes 1000 --baseline results.json --tolerance 0.3
+
+With --baseline the script exits with status 1 if throughput for any size
+and phase dropped by more than --tolerance, for use as a CI gate.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.stubs import StubDNSServer, StubRDAPServer, StubTLDServer, StubWhoisServer
+from domain_checker_mcp.delegation import DelegationChecker
+from domain_checker_mcp.rdap import RDAPClient
+from domain_checker_mcp.checker import DomainChecker
+from domain_checker_mcp.whois_transport import WhoisTransport
+
+# Share of each kind of name in the mix; the rest are free
+MIX = (
+    ('dns', 0.55),  # has A records
+    ('ns', 0.10),  # registry delegates it, resolver SERVFAILs (lame/parked)
+    ('rdap', 0.10),  # registered, no DNS, .com (RDAP)
+    ('whois', 0.05),  # registered, no DNS, .xyz (no RDAP -> WHOIS)
+)
+
+
+def build_domains(size: int) -> Dict[str, str]:
+    """domain -> expected method ('dns', 'ns', 'rdap', 'whois', or 'none' for available)"""
+    expected = {}
+    for i in range(size):
+        position, kind = (i * 0.6180339887) % 1.0, 'none'  # spread kinds evenly through the list
+        cumulative = 0.0
+        for name, share in MIX:
+            cumulative += share
+            if position < cumulative:
+                kind = name
+                break
+        tld = 'xyz' if kind == 'whois' or (kind == 'none' and i % 4 == 0) else 'com'
+        expected[f"load-{i}.{tld}"] = kind
+    return expected
+
+
+def percentile_summary(checker: DomainChecker, name: str, **labels: str) -> Dict[str, Any]:
+    for h in checker.metrics.snapshot()['histograms']:
+        if h['name'] == name and all(h['labels'].get(k) == v for k, v in labels.items()):
+            return {k: h[k] for k in ('count', 'p50_ms', 'p95_ms', 'p99_ms')}
+    return {'count': 0, 'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+
+
+async def run_phase(checker: DomainChecker, expected: Dict[str, str]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    results = await checker.check_domains_batch(list(expected))
+    elapsed = time.perf_counter() - start
+
+    wrong = 0
+    for category in ('available', 'unavailable'):
+        for result in results[category]:
+            kind = expected[result['domain']]
+            if (category == 'available') != (kind == 'none'):
+                wrong += 1
+    summary = results['summary']
+    return {
+        'seconds': round(elapsed, 3),
+        'domains_per_second': round(len(expected) / elapsed, 1),
+        'cache_hit_rate': summary['cache_hit_rate'],
+        'errors': summary['error_count'],
+        'wrong': wrong,
+    }
+
+
+async def run_size(size: int, args, stubs: Dict[str, Any]) -> Dict[str, Any]:
+    expected = build_domains(size)
+    with tempfile.TemporaryDirectory() as tmp:
+        checker = DomainChecker(
+            max_concurrency=args.concurrency,
+            dns_rate=0,
+            whois_rate=0,
+            nameservers=["127.0.0.1"],
+            dns_port=stubs['dns'].port,
+            cache_dir=Path(tmp),
+            memory_cache_size=max(size, 1),
+            delegation=DelegationChecker(tld_servers={'com': ['127.0.0.1'], 'xyz': ['127.0.0.1']},
+                                         port=stubs['tld'].port),
+            rdap=RDAPClient(base_urls={'com': stubs['rdap'].base_url}, max_connections=args.concurrency),
+            whois_transport=WhoisTransport([f"127.0.0.1:{stubs['whois'].port}"], rate=0),
+            metrics_file=None,
+        )
+        cold = await run_phase(checker, expected)
+        cold['latency'] = {
+            'check': percentile_summary(checker, 'check_seconds', status='unavailable'),
+            'dns_A': percentile_summary(checker, 'dns_query_seconds', rdtype='A'),
+            'delegation': percentile_summary(checker, 'delegation_seconds'),
+            'rdap': percentile_summary(checker, 'rdap_seconds'),
+            'whois': percentile_summary(checker, 'whois_seconds'),
+            'cache_save': percentile_summary(checker, 'cache_save_seconds'),
+        }
+        warm = await run_phase(checker, expected)
+        warm['latency'] = {'cache_load': percentile_summary(checker, 'cache_load_seconds')}
+        await checker.rdap.close()
+    return {'size': size, 'cold': cold, 'warm': warm}
+
+
+def start_stubs(args, expected: Dict[str, str]) -> Dict[str, Any]:
+    """One set of stand-ins for every size; they answer from the largest size's mix"""
+    names = lambda *kinds: {d for d, k in expected.items() if k in kinds}
+    return {
+        'dns': StubDNSServer(registered=names('dns'), servfail=names('ns'),
+                             latency=args.dns_latency, loss=args.dns_loss).start(),
+        'tld': StubTLDServer(delegated=names('dns', 'ns'), latency=args.dns_latency).start(),
+        'rdap': StubRDAPServer(registered=names('rdap'), latency=args.rdap_latency,
+                               rate_limit=args.rdap_rate_limit).start(),
+        'whois': StubWhoisServer(registered=names('whois'), latency=args.whois_latency,
+                                 rate_limit=args.whois_rate_limit).start(),
+    }
+
+
+def run_load(sizes: List[int], args) -> List[Dict[str, Any]]:
+    """Run every size; returns one report per size"""
+    stubs = start_stubs(args, build_domains(max(sizes)))
+    try:
+        return [asyncio.run(run_size(size, args, stubs)) for size in sizes]
+    finally:
+        for stub in stubs.values():
+            stub.stop()
+
+
+def print_report(reports: List[Dict[str, Any]]):
+    print(f"{'size':>8} {'phase':>5} {'seconds':>9} {'domains/s':>10} {'hit rate':>9} "
+          f"{'errors':>7} {'wrong':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for report in reports:
+        for phase in ('cold', 'warm'):
+            r = report[phase]
+            stage = r['latency']['check'] if phase == 'cold' else r['latency']['cache_load']
+            fmt = lambda v: f"{v:>8.1f}" if v is not None else f"{'-':>8}"
+            print(f"{report['size']:>8} {phase:>5} {r['seconds']:>9.2f} {r['domains_per_second']:>10.1f} "
+                  f"{r['cache_hit_rate']:>9.0%} {r['errors']:>7} {r['wrong']:>6} "
+                  f"{fmt(stage['p50_ms'])} {fmt(stage['p95_ms'])} {fmt(stage['p99_ms'])}")
+    print("\n(cold percentiles: whole uncached check; warm: cache lookup)")
+    for report in reports:
+        stages = report['cold']['latency']
+        parts = [f"{name} p99 {s['p99_ms']}ms (n={s['count']})" for name, s in stages.items() if s['count']]
+        print(f"  {report['size']:>7}: " + ", ".join(parts))
+
+
+def compare_baseline(reports: List[Dict[str, Any]], baseline_path: Path, tolerance: float) -> List[str]:
+    """Throughput regressions beyond `tolerance` compared with a saved run"""
+    baseline = {r['size']: r for r in json.loads(baseline_path.read_text())['reports']}
+    regressions = []
+    for report in reports:
+        base = baseline.get(report['size'])
+        if not base:
+            continue
+        for phase in ('cold', 'warm'):
+            now, before = report[phase]['domains_per_second'], base[phase]['domains_per_second']
+            if now < before * (1 - tolerance):
+                regressions.append(f"{report['size']} {phase}: {now} domains/s vs {before} in baseline")
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Domain checker load test against local stand-ins")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10, 1000, 100000])
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--dns-latency", type=float, default=0.005, help="Stub resolver/TLD latency (s)")
+    parser.add_argument("--dns-loss", type=float, default=0.0, help="Fraction of DNS queries dropped")
+    parser.add_argument("--rdap-latency", type=float, default=0.01)
+    parser.add_argument("--rdap-rate-limit", type=float, default=0.0, help="RDAP requests/s before 429s (0: none)")
+    parser.add_argument("--whois-latency", type=float, default=0.02)
+    parser.add_argument("--whois-rate-limit", type=float, default=0.0, help="WHOIS queries/s before refusals")
+    parser.add_argument("--json", type=Path, help="Write the results to this file")
+    parser.add_argument("--baseline", type=Path, help="Fail if throughput regressed against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Allowed throughput drop vs the baseline")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+
+    print(f"=== Load test: sizes {args.sizes}, concurrency {args.concurrency}, "
+          f"DNS {args.dns_latency * 1000:.0f}ms/{args.dns_loss:.0%} loss, "
+          f"RDAP {args.rdap_latency * 1000:.0f}ms, WHOIS {args.whois_latency * 1000:.0f}ms ===\n")
+    reports = run_load(args.sizes, args)
+    print_report(reports)
+
+    if args.json:
+        args.json.write_text(json.dumps({'args': {k: str(v) for k, v in vars(args).items()},
+                                         'reports': reports}, indent=2))
+    if args.baseline:
+        regressions = compare_baseline(reports, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+    if any(r[phase]['wrong'] for r in reports for phase in ('cold', 'warm')):
+        print("Some domains got the wrong answer")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Compare per-lookup latency of the pooled RDAP client with the WHOIS path
+
+Both run against local stand-ins. The WHOIS path does what python-whois does
+for every lookup: open a new TCP connection, read free text, and parse it.
+--connect-latency stands in for the handshake cost a real registry adds to
+each new connection.
+
+    python benchmarks/bench_rdap.py --lookups 200 --connect-latency 0.03
+"""
+
+import argparse
+import asyncio
+import socket
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from whois.parser import WhoisEntry
+
+from benchmarks.stubs import StubRDAPServer, StubWhoisServer
+from domain_checker_mcp.rdap import RDAPClient
+
+
+def whois_lookup(host: str, port: int, domain: str) -> bool:
+    with socket.create_connection((host, port), timeout=10) as sock:
+        sock.sendall(f"{domain}\r\n".encode())
+        chunks = []
+        while chunk := sock.recv(4096):
+            chunks.append(chunk)
+    try:
+        entry = WhoisEntry.load(domain, b"".join(chunks).decode())
+    except Exception:
+        return False
+    return bool(entry.domain_name or entry.registrar)
+
+
+async def rdap_lookups(base_url: str, domains: list[str]) -> list[float]:
+    client = RDAPClient(base_urls={"com": base_url})
+    latencies = []
+    for domain in domains:
+        start = time.perf_counter()
+        await client.is_registered(domain)
+        latencies.append(time.perf_counter() - start)
+    await client.close()
+    return latencies
+
+
+def report(name: str, latencies: list[float]):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:>6} {statistics.mean(latencies) * 1000:>9.2f} "
+          f"{statistics.median(latencies) * 1000:>9.2f} {p95 * 1000:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RDAP vs WHOIS per-lookup latency")
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--connect-latency", type=float, default=0.03,
+                        help="Seconds added per new connection")
+    args = parser.parse_args()
+
+    domains = [f"bench-{i}.com" for i in range(args.lookups)]
+    registered = set(domains[::2])
+
+    print(f"=== {args.lookups} sequential lookups, {args.connect_latency * 1000:.0f}ms per new connection ===\n")
+    print(f"{'path':>6} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    with StubWhoisServer(registered, connect_latency=args.connect_latency) as whois_stub:
+        latencies = []
+        for domain in domains:
+            start = time.perf_counter()
+            whois_lookup(whois_stub.host, whois_stub.port, domain)
+            latencies.append(time.perf_counter() - start)
+        report("whois", latencies)
+
+    with StubRDAPServer(registered, connect_latency=args.connect_latency) as rdap_stub:
+        report("rdap", asyncio.run(rdap_lookups(rdap_stub.base_url, domains)))
+        print(f"\nRDAP connections opened: {rdap_stub.connections}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark the MCP server's cold start
+
+Spawns `python -m domain_checker_mcp` over stdio, the way an MCP client does
+at the start of every session, and times the initialize handshake, the tool
+listing and the first tool call (which is when the checker, dnspython,
+python-whois and the caches are loaded). Each run uses a fresh home
+directory, so the cache starts empty unless --cache-entries fills it:
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --runs 5 --cache-entries 100000 --json startup.json
+    python benchmarks/bench_startup.py --runs 5 --baseline startup.json --tolerance 0.3
+
+With --baseline the script exits with status 1 if the median time to the
+tool listing grew by more than --tolerance.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent
+PHASES = ('initialize', 'list_tools', 'first_call')
+
+
+def fill_cache(home: Path, entries: int):
+    """Write a legacy JSON cache of `entries` results, which the SQLite backend imports on first open"""
+    cache_dir = home / ".domain_checker_cache"
+    cache_dir.mkdir(parents=True)
+    timestamp = datetime.now().isoformat()
+    expires_at = time.time() + 7 * 24 * 3600
+    data = {f"cached-{i}.com": {'status': 'unavailable', 'method': 'dns',
+                                'timestamp': timestamp, 'expires_at': expires_at}
+            for i in range(entries)}
+    (cache_dir / "domain_cache.json").write_text(json.dumps(data))
+
+
+async def time_startup(home: Path) -> Dict[str, float]:
+    """Milliseconds from spawning the server to the end of each phase"""
+    env = dict(os.environ, HOME=str(home), PYTHONPATH=str(PACKAGE_DIR))
+    params = StdioServerParameters(command=sys.executable, args=["-m", "domain_checker_mcp"],
+                                   env=env, cwd=str(PACKAGE_DIR))
+    timings = {}
+    start = time.perf_counter()
+    with open(os.devnull, "w") as errlog:
+        async with stdio_client(params, errlog=errlog) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                timings['initialize'] = time.perf_counter() - start
+                await session.list_tools()
+                timings['list_tools'] = time.perf_counter() - start
+                # Offline tool that loads the checker
+                await session.call_tool("whois_server_stats", {})
+                timings['first_call'] = time.perf_counter() - start
+    return {phase: seconds * 1000 for phase, seconds in timings.items()}
+
+
+def run_startup(runs: int, cache_entries: int = 0) -> Dict[str, Dict[str, float]]:
+    """Median/min/max milliseconds per phase over `runs` cold starts"""
+    samples: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            home = Path(tmp)
+            if cache_entries:
+                fill_cache(home, cache_entries)
+            for phase, ms in asyncio.run(time_startup(home)).items():
+                samples[phase].append(ms)
+    return {phase: {'median_ms': round(statistics.median(values), 1),
+                    'min_ms': round(min(values), 1),
+                    'max_ms': round(max(values), 1)}
+            for phase, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP server cold start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--cache-entries", type=int, default=0, help="Pre-fill the cache with this many results")
+    parser.add_argument("--json", type=Path, help="Write the results to this file")
+    parser.add_argument("--baseline", type=Path, help="Fail if startup regressed against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Allowed slowdown vs the baseline")
+    args = parser.parse_args()
+
+    print(f"=== Startup benchmark: {args.runs} runs, {args.cache_entries} cached results ===\n")
+    results = run_startup(args.runs, args.cache_entries)
+    print(f"{'phase':>12} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+    for phase, r in results.items():
+        print(f"{phase:>12} {r['median_ms']:>10.1f} {r['min_ms']:>8.1f} {r['max_ms']:>8.1f}")
+    print("\n(time from spawning the process; first_call loads the checker and its caches)")
+
+    if args.json:
+        args.json.write_text(json.dumps({'runs': args.runs, 'cache_entries': args.cache_entries,
+                                         'results': results}, indent=2))
+    if args.baseline:
+        before = json.loads(args.baseline.read_text())['results']['list_tools']['median_ms']
+        now = results['list_tools']['median_ms']
+        if now > before * (1 + args.tolerance):
+            print(f"REGRESSION list_tools: {now} ms vs {before} ms in baseline")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Local stand-in servers for benchmarking Domain Checker offline
+"""
+
+import asyncio
+import json
+import random
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import dns.flags
+import dns.message
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+
+
+class StubDNSServer:
+    """
+    Minimal UDP DNS server running on its own thread.
+
+    Every name in `registered` (or every name if `registered` is None) gets
+    an A record; everything else is NXDOMAIN. Names in `servfail` get SERVFAIL.
+    `latency` seconds (or `type_latency[rdtype]` for specific record types)
+    are added before each reply without blocking other queries, and a
+    `loss` fraction of queries is silently dropped (seeded, so repeatable).
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 registered: set | None = None, servfail: set | None = None,
+                 type_latency: dict | None = None, loss: float = 0.0, seed: int = 0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.type_latency = type_latency or {}
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.dropped = 0
+        self.registered = registered
+        self.servfail = servfail or set()
+        self.queries = 0
+        self.loop = None
+        self.transport = None
+        self.thread = None
+        self.ready = threading.Event()
+
+    def answer(self, query: dns.message.Message) -> dns.message.Message:
+        """Build the response for a parsed query"""
+        response = dns.message.make_response(query)
+        question = query.question[0]
+        name = question.name.to_text().rstrip('.').lower()
+        if name in self.servfail:
+            response.set_rcode(dns.rcode.SERVFAIL)
+        elif self.registered is not None and name not in self.registered:
+            response.set_rcode(dns.rcode.NXDOMAIN)
+        elif question.rdtype == dns.rdatatype.A:
+            response.answer.append(dns.rrset.from_text(question.name, 300, 'IN', 'A', '127.0.0.1'))
+        return response
+
+    def start(self):
+        """Start the server thread and wait until it is listening"""
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        return self
+
+    def stop(self):
+        """Stop the server thread"""
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        server = self
+
+        class Protocol(asyncio.DatagramProtocol):
+            def connection_made(self, transport):
+                server.transport = transport
+
+            def datagram_received(self, data, addr):
+                server.queries += 1
+                if server.loss and server.random.random() < server.loss:
+                    server.dropped += 1
+                    return
+                try:
+                    query = dns.message.from_wire(data)
+                except Exception:
+                    return
+                wire = server.answer(query).to_wire()
+                rdtype = dns.rdatatype.to_text(query.question[0].rdtype)
+                latency = server.type_latency.get(rdtype, server.latency)
+                if latency:
+                    server.loop.call_later(latency, server.transport.sendto, wire, addr)
+                else:
+                    server.transport.sendto(wire, addr)
+
+        self.loop.run_until_complete(
+            self.loop.create_datagram_endpoint(Protocol, local_addr=(self.host, self.port))
+        )
+        self.port = self.transport.get_extra_info('sockname')[1]
+        self.ready.set()
+        self.loop.run_forever()
+        self.transport.close()
+        self.loop.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StubTLDServer(StubDNSServer):
+    """
+    Authoritative server for a TLD zone.
+
+    NS queries for names in `delegated` get a referral (NS set in the
+    authority section, like a real registry); other names are NXDOMAIN.
+    """
+
+    def __init__(self, delegated: set, **kwargs):
+        super().__init__(**kwargs)
+        self.delegated = delegated
+
+    def answer(self, query: dns.message.Message) -> dns.message.Message:
+        response = dns.message.make_response(query)
+        response.flags &= ~dns.flags.AA
+        question = query.question[0]
+        name = question.name.to_text().rstrip('.').lower()
+        if name in self.delegated:
+            response.authority.append(dns.rrset.from_text(
+                question.name, 172800, 'IN', 'NS', f"ns1.{name}.", f"ns2.{name}."))
+        else:
+            response.set_rcode(dns.rcode.NXDOMAIN)
+        return response
+
+
+class RateWindow:
+    """Thread-safe fixed one-second window counter for stub rate limits"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.window = 0
+        self.count = 0
+
+    def exceeded(self) -> bool:
+        """Count a request; True if it is over `rate` for the current second"""
+        if not self.rate:
+            return False
+        with self.lock:
+            now = int(time.monotonic())
+            if now != self.window:
+                self.window, self.count = now, 0
+            self.count += 1
+            return self.count > self.rate
+
+
+class StubRDAPServer:
+    """
+    Local RDAP stand-in over plain HTTP/1.1 with keep-alive.
+
+    GET /domain/<name> answers 200 with a minimal RDAP domain object for names
+    in `registered`, 404 otherwise, and 429 for names in `throttled` or for
+    requests beyond `rate_limit` per second. Names in `unexpected` get a 200
+    with an entity object instead of a domain, like a misbehaving registry.
+    `connections` counts TCP connections accepted, to check pooling.
+    `connect_latency` is paid once per new connection (standing in for the
+    TCP and TLS handshakes), `latency` once per request.
+    """
+
+    def __init__(self, registered: set, throttled: set | None = None, latency: float = 0.0,
+                 connect_latency: float = 0.0, host: str = "127.0.0.1", port: int = 0,
+                 rate_limit: float = 0.0, unexpected: set | None = None):
+        self.registered = registered
+        self.throttled = throttled or set()
+        self.unexpected = unexpected or set()
+        self.limit = RateWindow(rate_limit)
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.requests = 0
+        self.connections = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Send headers and body in one segment so delayed ACKs don't stall keep-alive
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                stub.connections += 1
+                if stub.connect_latency:
+                    time.sleep(stub.connect_latency)
+
+            def do_GET(self):
+                stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                name = self.path.rsplit('/', 1)[-1].lower()
+                if name in stub.throttled or stub.limit.exceeded():
+                    code, body = 429, {"errorCode": 429, "title": "Too Many Requests"}
+                elif name in stub.unexpected:
+                    code, body = 200, {"objectClassName": "entity", "handle": name.upper()}
+                elif name in stub.registered:
+                    code, body = 200, {"objectClassName": "domain", "ldhName": name.upper(),
+                                       "status": ["active"]}
+                else:
+                    code, body = 404, {"errorCode": 404, "title": "Not Found"}
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/rdap+json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.base_url = f"http://{host}:{self.port}/"
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StubWhoisServer:
+    """
+    Local WHOIS (port 43 protocol) stand-in: one query per TCP connection,
+    free-text answer in the style of the Verisign registry. With `throttle`
+    every query gets a rate-limit refusal instead, and so do queries beyond
+    `rate_limit` per second.
+    """
+
+    def __init__(self, registered: set, latency: float = 0.0, connect_latency: float = 0.0,
+                 throttle: bool = False, host: str = "127.0.0.1", port: int = 0,
+                 rate_limit: float = 0.0):
+        self.registered = registered
+        self.limit = RateWindow(rate_limit)
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.throttle = throttle
+        self.queries = 0
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                stub.queries += 1
+                name = self.rfile.readline().decode().strip().lower()
+                if stub.connect_latency or stub.latency:
+                    time.sleep(stub.connect_latency + stub.latency)
+                if stub.throttle or stub.limit.exceeded():
+                    text = "WHOIS LIMIT EXCEEDED - SEE WWW.EXAMPLE.COM/WHOIS\r\n"
+                elif name in stub.registered:
+                    text = (f"   Domain Name: {name.upper()}\r\n"
+                            f"   Registrar: Stub Registrar, Inc.\r\n"
+                            f"   Creation Date: 2001-01-01T00:00:00Z\r\n"
+                            f"   Domain Status: clientTransferProhibited\r\n")
+                else:
+                    text = f'No match for "{name.upper()}".\r\n'
+                self.wfile.write(text.encode())
+
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.host = host
+        self.port = self.server.server_address[1]
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
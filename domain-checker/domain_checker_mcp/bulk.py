@@ -0,0 +1,291 @@
+"""
+Bulk domain checking from files
+
+Streams names from a newline-separated or CSV file, writes each result to a
+JSONL or CSV file as soon as it is known, and keeps a checkpoint next to the
+output so an interrupted run picks up where it stopped. Only a small window
+of names is held in memory, however long the input is.
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Results are written in input order; a name may finish at most this many
+# names ahead of the oldest one still being checked (per worker)
+WINDOW_PER_WORKER = 4
+DEFAULT_CHECKPOINT_EVERY = 100
+RESULT_FIELDS = ('input', 'domain', 'status', 'method', 'cached', 'error', 'timestamp')
+
+
+def output_format(path: Path, fmt: Optional[str] = None) -> str:
+    """'jsonl' or 'csv', from an explicit choice or the file extension"""
+    fmt = (fmt or path.suffix.lstrip('.') or 'jsonl').lower()
+    if fmt == 'json':
+        fmt = 'jsonl'
+    if fmt not in ('jsonl', 'csv'):
+        raise ValueError(f"Unsupported output format: {fmt} (use jsonl or csv)")
+    return fmt
+
+
+def read_domains(path: Path) -> Iterator[str]:
+    """
+    Yield domain names from a file, one at a time
+
+    .csv files use the 'domain' column if the header has one, otherwise the
+    first column. Other files have one name per line. Blank lines and lines
+    starting with '#' are skipped.
+    """
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        if path.suffix.lower() != '.csv':
+            for line in f:
+                name = line.strip()
+                if name and not name.startswith('#'):
+                    yield name
+            return
+
+        reader = csv.reader(f)
+        column = 0
+        for i, row in enumerate(reader):
+            if not row:
+                continue
+            if i == 0:
+                header = [cell.strip().lower() for cell in row]
+                if 'domain' in header:
+                    column = header.index('domain')
+                    continue
+            if column < len(row):
+                name = row[column].strip()
+                if name and not name.startswith('#'):
+                    yield name
+
+
+class ResultWriter:
+    """Appends results to a JSONL or CSV file, flushing after every record"""
+
+    def __init__(self, path: Path, fmt: str, truncate_at: Optional[int] = None):
+        self.path = path
+        self.fmt = fmt
+        self.file = open(path, 'a+', newline='', encoding='utf-8')
+        # Drop anything written after the last checkpoint; it will be redone
+        if truncate_at is not None:
+            self.file.truncate(truncate_at)
+        self.file.seek(0, os.SEEK_END)
+        if fmt == 'csv' and self.file.tell() == 0:
+            self.write_line(','.join(RESULT_FIELDS))
+
+    def write_line(self, line: str):
+        self.file.write(line + '\n')
+
+    def write(self, detail: Dict[str, Any]):
+        record = {
+            'input': detail.get('input', detail['domain']),
+            'domain': detail['domain'],
+            'status': detail['status'],
+            'method': detail['method'],
+            'cached': detail['cached'],
+            'error': detail.get('error'),
+            'timestamp': datetime.now().isoformat(),
+        }
+        if self.fmt == 'jsonl':
+            self.write_line(json.dumps(record, separators=(',', ':')))
+        else:
+            buf = io.StringIO()
+            csv.writer(buf, lineterminator='').writerow(
+                '' if record[k] is None else record[k] for k in RESULT_FIELDS)
+            self.write_line(buf.getvalue())
+        self.file.flush()
+
+    def offset(self) -> int:
+        """Bytes written so far"""
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class Checkpoint:
+    """How far a bulk run got, stored as JSON next to the output file"""
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Load the checkpoint, or None if there is none"""
+        if not self.path.exists():
+            return None
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return None
+
+    def save(self, state: Dict[str, Any]):
+        """Write the checkpoint atomically"""
+        tmp = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        tmp.replace(self.path)
+
+    def remove(self):
+        self.path.unlink(missing_ok=True)
+
+
+def checkpoint_path(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + '.checkpoint')
+
+
+async def check_domains_file(
+    checker,
+    input_path: Path,
+    output_path: Path,
+    fmt: Optional[str] = None,
+    resume: bool = True,
+    checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+    on_result: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """
+    Check every name in input_path with a DomainChecker, appending results to output_path
+
+    Results are written in input order, and the checkpoint records how many
+    input names are in the output and how many bytes they take. Resuming
+    skips those names and truncates anything written after the checkpoint.
+    Returns a summary of counts (this run and resumed totals).
+    """
+    input_path, output_path = Path(input_path), Path(output_path)
+    fmt = output_format(output_path, fmt)
+    checkpoint = Checkpoint(checkpoint_path(output_path))
+
+    state = checkpoint.load() if resume else None
+    if state and state.get('input') != str(input_path.resolve()):
+        raise ValueError(f"Checkpoint {checkpoint.path} belongs to {state.get('input')}, not {input_path}")
+    if state is None:
+        state = {'input': str(input_path.resolve()), 'processed': 0, 'offset': 0,
+                 'counts': {'available': 0, 'unavailable': 0, 'error': 0}}
+        # A fresh run starts a fresh output file
+        output_path.unlink(missing_ok=True)
+    skip = state['processed']
+    counts = state['counts']
+
+    writer = ResultWriter(output_path, fmt, truncate_at=state['offset'] if skip else None)
+    names = enumerate(read_domains(input_path))
+    window = max(1, checker.max_concurrency) * WINDOW_PER_WORKER
+    pending: Dict[int, Dict[str, Any]] = {}
+    next_to_write = skip
+    window_open = asyncio.Condition()
+    start = time.monotonic()
+    run = {'checked': 0}
+
+    def save_checkpoint():
+        state['processed'] = next_to_write
+        state['offset'] = writer.offset()
+        checkpoint.save(state)
+        checker.export_metrics()
+
+    async def finish(index: int, detail: Dict[str, Any]):
+        nonlocal next_to_write
+        pending[index] = detail
+        # Write whatever is now contiguous with what is already on disk
+        while next_to_write in pending:
+            done = pending.pop(next_to_write)
+            writer.write(done)
+            key = done['status'] if done['status'] in counts else 'error'
+            counts[key] += 1
+            next_to_write += 1
+            run['checked'] += 1
+            if (next_to_write - skip) % checkpoint_every == 0:
+                save_checkpoint()
+            if on_result:
+                try:
+                    await on_result(done)
+                except Exception as e:
+                    logger.warning(f"Result callback failed for {done['domain']}: {e}")
+        async with window_open:
+            window_open.notify_all()
+
+    async def worker():
+        for index, domain in names:
+            if index < skip:
+                continue
+            # Don't run too far ahead of the oldest unfinished name
+            async with window_open:
+                await window_open.wait_for(lambda: index < next_to_write + window)
+            try:
+                detail = await checker.check_domain_detailed(domain)
+            except Exception as e:
+                detail = {'domain': domain, 'status': 'error', 'method': 'error', 'cached': False, 'error': str(e)}
+            # The output maps each input line to the canonical name it was checked as
+            detail['input'] = domain
+            await finish(index, detail)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, checker.max_concurrency))))
+        save_checkpoint()
+    finally:
+        writer.close()
+    checkpoint.remove()
+
+    elapsed = time.monotonic() - start
+    return {
+        'input': str(input_path),
+        'output': str(output_path),
+        'format': fmt,
+        'resumed_from': skip,
+        'checked_this_run': run['checked'],
+        'total_processed': next_to_write,
+        'available_count': counts['available'],
+        'unavailable_count': counts['unavailable'],
+        'error_count': counts['error'],
+        'elapsed_seconds': round(elapsed, 2),
+        'domains_per_second': round(run['checked'] / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv: Optional[list] = None):
+    """Command line entry point: domain-checker-bulk INPUT -o OUTPUT"""
+    parser = argparse.ArgumentParser(
+        description="Check a file of domain names (one per line, or CSV) and write results to JSONL/CSV")
+    parser.add_argument("input", type=Path, help="Input file: one domain per line, or .csv with a 'domain' column")
+    parser.add_argument("-o", "--output", type=Path, required=True, help="Output file (.jsonl or .csv)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Output format (default: from the output extension)")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore any checkpoint and start over")
+    parser.add_argument("--concurrency", type=int, help="Domains checked at once")
+    parser.add_argument("--checkpoint-every", type=int, default=DEFAULT_CHECKPOINT_EVERY,
+                        help="Save the checkpoint after this many results")
+    args = parser.parse_args(argv)
+
+    from .checker import DomainChecker
+
+    checker = DomainChecker(**({'max_concurrency': args.concurrency} if args.concurrency else {}))
+
+    async def report(detail: Dict[str, Any]):
+        print(f"{detail['domain']}\t{detail['status']}\t{detail.get('error') or detail['method']}",
+              file=sys.stderr)
+
+    try:
+        summary = asyncio.run(check_domains_file(
+            checker, args.input, args.output, fmt=args.format, resume=not args.no_resume,
+            checkpoint_every=args.checkpoint_every, on_result=report))
+    except KeyboardInterrupt:
+        print(f"Interrupted; rerun the same command to resume from {checkpoint_path(args.output)}",
+              file=sys.stderr)
+        sys.exit(130)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
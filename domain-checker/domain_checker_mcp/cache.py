@@ -0,0 +1,460 @@
+"""
+Persistent cache backends for Domain Checker
+
+A cache entry is a dict with:
+- status: 'available' or 'unavailable'
+- method: how the status was determined ('dns', 'whois', 'none', ...)
+- timestamp: ISO time the domain was checked
+- expires_at: epoch seconds after which the entry is stale
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Where the result cache, watchlist and registry bootstrap files live
+DEFAULT_CACHE_DIR = Path.home() / ".domain_checker_cache"
+
+# How long a result stays valid, by (status, method). Registrations rarely
+# lapse, so "unavailable" answers are kept for a long time; "available" is
+# the answer we act on and the one most likely to change, so it expires fast.
+DEFAULT_TTLS = {
+    ('unavailable', 'dns'): timedelta(days=14),
+    ('unavailable', 'ns'): timedelta(days=7),
+    ('unavailable', 'rdap'): timedelta(days=7),
+    ('unavailable', 'whois'): timedelta(days=7),
+    ('available', 'none'): timedelta(hours=1),
+}
+
+
+class TTLPolicy:
+    """Per-status / per-method cache lifetimes"""
+
+    def __init__(
+        self,
+        ttls: Optional[Dict[Tuple[str, Optional[str]], timedelta]] = None,
+        default: timedelta = timedelta(hours=24),
+        negative: timedelta = timedelta(minutes=5),
+    ):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.default = default
+        self.negative = negative
+
+    def ttl_for(self, status: str, method: str) -> timedelta:
+        """Lifetime for a result: exact (status, method), then (status, None), then default"""
+        ttl = self.ttls.get((status, method))
+        if ttl is None:
+            ttl = self.ttls.get((status, None), self.default)
+        return ttl
+
+
+class NegativeCache:
+    """
+    Short-lived in-memory cache of transient lookup failures.
+
+    Kept apart from the persistent cache so a timeout or SERVFAIL is never
+    mistaken for an answer, but a batch retried straight away doesn't hit the
+    same struggling server again.
+    """
+
+    def __init__(self, ttl: timedelta):
+        self.ttl = ttl
+        self.entries: Dict[str, Tuple[str, float]] = {}
+
+    def get(self, domain: str) -> Optional[Tuple[str, float]]:
+        """Return (reason, seconds remaining) for a recent failure, or None"""
+        entry = self.entries.get(domain)
+        if entry is None:
+            return None
+        reason, expires_at = entry
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            del self.entries[domain]
+            return None
+        return reason, remaining
+
+    def add(self, domain: str, reason: str):
+        """Remember a transient failure for a domain"""
+        self.entries[domain] = (reason, time.time() + self.ttl.total_seconds())
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class CacheBackend:
+    """Interface for persistent domain cache stores"""
+
+    def get(self, domain: str) -> Optional[Dict[str, Any]]:
+        """Return the entry for a domain, or None"""
+        raise NotImplementedError
+
+    def set(self, domain: str, entry: Dict[str, Any]):
+        """Store the entry for a domain"""
+        raise NotImplementedError
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Iterate over all (domain, entry) pairs"""
+        raise NotImplementedError
+
+    def compact(self, now: Optional[float] = None) -> int:
+        """Drop expired entries. Returns the number removed"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources held by the backend"""
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on a side file, shared between processes
+
+    Also serializes threads of this process, since flock locks belong to the
+    open file and would not exclude a second thread.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.thread_lock = threading.Lock()
+        self.file = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        try:
+            self.file = open(self.path, 'a')
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        except Exception:
+            self.thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            self.file.close()
+        finally:
+            self.file = None
+            self.thread_lock.release()
+
+
+class JSONCacheBackend(CacheBackend):
+    """
+    The original single-file JSON cache.
+
+    Every write re-serializes the whole file, so this is only suitable for
+    small caches. Kept for compatibility and as the import source for SQLite.
+    Writes take a lock file and merge with what is on disk, so several
+    processes sharing the file don't drop each other's results.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.lock = FileLock(self.path.with_name(self.path.name + '.lock'))
+        self._data: Optional[Dict[str, Dict[str, Any]]] = None
+        self._version: Optional[Tuple[int, int, int]] = None
+
+    def disk_version(self) -> Optional[Tuple[int, int, int]]:
+        """Identifies the file on disk; every save replaces it with a new inode"""
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def reload(self) -> Dict[str, Dict[str, Any]]:
+        self._version = self.disk_version()
+        self._data = self.load(self.path)
+        return self._data
+
+    @property
+    def data(self) -> Dict[str, Dict[str, Any]]:
+        """The whole cache, re-read from disk whenever another process has changed it"""
+        if self._data is None or self.disk_version() != self._version:
+            return self.reload()
+        return self._data
+
+    @staticmethod
+    def load(path: Path) -> Dict[str, Dict[str, Any]]:
+        """Load a JSON cache file, filling in expires_at for old entries"""
+        if not path.exists():
+            return {}
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except Exception:
+            return {}
+        for entry in data.values():
+            if 'expires_at' not in entry:
+                # Entries written before expires_at existed used a fixed 24h lifetime
+                entry['expires_at'] = datetime.fromisoformat(entry['timestamp']).timestamp() + 24 * 3600
+        return data
+
+    def save(self):
+        """Save cache to disk (caller holds self.lock)"""
+        try:
+            # Per-process temp name so concurrent writers never share one
+            tmp_path = self.path.with_suffix(f'.{os.getpid()}.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(self._data, f, indent=2)
+            tmp_path.replace(self.path)
+            self._version = self.disk_version()
+        except Exception as e:
+            logger.error(f"Failed to save cache: {e}")
+
+    def get(self, domain: str) -> Optional[Dict[str, Any]]:
+        return self.data.get(domain)
+
+    def set(self, domain: str, entry: Dict[str, Any]):
+        with self.lock:
+            # Re-read under the lock so entries other processes wrote are kept
+            self.reload()[domain] = entry
+            self.save()
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        return iter(list(self.data.items()))
+
+    def compact(self, now: Optional[float] = None) -> int:
+        now = now if now is not None else time.time()
+        with self.lock:
+            data = self.reload()
+            expired = [d for d, e in data.items() if e['expires_at'] < now]
+            for domain in expired:
+                del data[domain]
+            if expired:
+                self.save()
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Indexed SQLite cache in WAL mode.
+
+    Each write is a single-row upsert, so cost per result is constant no
+    matter how large the cache grows, and a crash can at worst lose the last
+    uncommitted row.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS domains (
+            domain TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            method TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS domains_expires_at ON domains (expires_at);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, path: Path, import_json: Optional[Path] = None):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        if import_json is not None:
+            self.import_json(import_json)
+
+    def import_json(self, json_path: Path) -> int:
+        """Import a legacy JSON cache file once. Returns the number of entries imported"""
+        json_path = Path(json_path)
+        with self.lock:
+            done = self.conn.execute("SELECT value FROM meta WHERE key = 'json_imported'").fetchone()
+        if done or not json_path.exists():
+            return 0
+
+        data = JSONCacheBackend.load(json_path)
+        rows = [(d, e['status'], e['method'], e['timestamp'], e['expires_at']) for d, e in data.items()]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO domains (domain, status, method, timestamp, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)", rows)
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', ?)",
+                              (datetime.now().isoformat(),))
+        logger.info(f"Imported {len(rows)} entries from {json_path}")
+        return len(rows)
+
+    def get(self, domain: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT status, method, timestamp, expires_at FROM domains WHERE domain = ?",
+                (domain,)).fetchone()
+        if row is None:
+            return None
+        return {'status': row[0], 'method': row[1], 'timestamp': row[2], 'expires_at': row[3]}
+
+    def set(self, domain: str, entry: Dict[str, Any]):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO domains (domain, status, method, timestamp, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (domain, entry['status'], entry['method'], entry['timestamp'], entry['expires_at']))
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT domain, status, method, timestamp, expires_at FROM domains").fetchall()
+        for row in rows:
+            yield row[0], {'status': row[1], 'method': row[2], 'timestamp': row[3], 'expires_at': row[4]}
+
+    def compact(self, now: Optional[float] = None) -> int:
+        now = now if now is not None else time.time()
+        with self.lock, self.conn:
+            cursor = self.conn.execute("DELETE FROM domains WHERE expires_at < ?", (now,))
+        return cursor.rowcount
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM domains").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class TieredCache(CacheBackend):
+    """
+    Size-bounded in-memory LRU in front of a persistent backend.
+
+    Entries are pulled from the store on demand, and the in-memory copy keeps
+    the time it stops being served as epoch seconds so a hot lookup is a dict
+    hit and a float compare. Writes go through to the store.
+
+    A copy is served for at most max_age seconds (and never past its
+    expires_at) before it is read again from the store, so a result another
+    process has refreshed in a shared store is picked up within max_age.
+    """
+
+    def __init__(self, store: CacheBackend, maxsize: int = 10000, max_age: float = 30):
+        self.store = store
+        self.maxsize = maxsize
+        self.max_age = max_age
+        # domain -> (entry, epoch seconds until which the copy is served)
+        self.memory: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.store_hits = 0
+        self.evictions = 0
+
+    def _remember(self, domain: str, entry: Dict[str, Any]):
+        self.memory[domain] = (entry, min(entry['expires_at'], time.time() + self.max_age))
+        self.memory.move_to_end(domain)
+        while len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, domain: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            cached = self.memory.get(domain)
+            if cached is not None:
+                entry, fresh_until = cached
+                if fresh_until > time.time():
+                    self.memory.move_to_end(domain)
+                    self.hits += 1
+                    return entry
+                del self.memory[domain]
+
+        # Each lookup counts once, at the tier that answered it
+        entry = self.store.get(domain)
+        with self.lock:
+            if entry is not None and entry['expires_at'] > time.time():
+                self.store_hits += 1
+                self._remember(domain, entry)
+            else:
+                self.misses += 1
+        return entry
+
+    def set(self, domain: str, entry: Dict[str, Any]):
+        self.store.set(domain, entry)
+        with self.lock:
+            self._remember(domain, entry)
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        return self.store.items()
+
+    def compact(self, now: Optional[float] = None) -> int:
+        now = now if now is not None else time.time()
+        with self.lock:
+            for domain in [d for d, (e, _) in self.memory.items() if e['expires_at'] < now]:
+                del self.memory[domain]
+        return self.store.compact(now)
+
+    def stats(self) -> Dict[str, int]:
+        """Lookups answered from memory (hits) or the store (store_hits), lookups neither answered (misses), evictions"""
+        with self.lock:
+            return {
+                'size': len(self.memory),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'store_hits': self.store_hits,
+                'evictions': self.evictions,
+            }
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def close(self):
+        self.store.close()
+
+
+class CacheCompactor:
+    """Daemon thread that periodically drops expired entries from a backend"""
+
+    def __init__(self, backend: CacheBackend, interval: float = 3600):
+        self.backend = backend
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="cache-compactor", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                removed = self.backend.compact()
+                if removed:
+                    logger.info(f"Cache compaction removed {removed} expired entries")
+            except Exception as e:
+                logger.error(f"Cache compaction failed: {e}")
+
+
+def open_cache_backend(cache_dir: Path, kind: str = "sqlite") -> CacheBackend:
+    """Open the cache backend of the given kind ('sqlite' or 'json') in cache_dir"""
+    json_path = cache_dir / "domain_cache.json"
+    if kind == "json":
+        return JSONCacheBackend(json_path)
+    if kind == "sqlite":
+        return SQLiteCacheBackend(cache_dir / "domain_cache.sqlite3", import_json=json_path)
+    raise ValueError(f"Unknown cache backend: {kind}")
@@ -0,0 +1,77 @@
+"""
+Candidate domain generation for brainstorming
+
+Expands base words x prefixes/suffixes x TLDs lazily, dropping labels that
+could never be registered before they cost a lookup. Unicode words and TLDs
+are IDNA-encoded, so "café" yields xn--caf-dma.com.
+"""
+
+from typing import Dict, Iterable, Iterator, List, Set
+
+from .normalize import InvalidDomainError, is_valid_label, to_ascii
+
+
+class CandidateGenerator:
+    """
+    Lazily yields `prefix + word + suffix . tld` names, in word order.
+
+    Invalid labels and repeats are skipped and counted, so nothing is
+    materialized up front no matter how large the product is. TLDs that
+    are not valid labels are left out and listed in invalid_tlds.
+    """
+
+    def __init__(self, words: Iterable[str], tlds: Iterable[str],
+                 prefixes: Iterable[str] = (), suffixes: Iterable[str] = ()):
+        self.words = words
+        self.tlds: List[str] = []
+        self.invalid_tlds: Dict[str, str] = {}  # TLD as given -> reason
+        for raw in tlds:
+            if not raw.strip():
+                continue
+            try:
+                tld = clean_tld(raw)
+            except InvalidDomainError as e:
+                self.invalid_tlds[raw] = str(e)
+                continue
+            if tld not in self.tlds:
+                self.tlds.append(tld)
+        self.prefixes: List[str] = [''] + [p.strip().lower() for p in prefixes if p.strip()]
+        self.suffixes: List[str] = [''] + [s.strip().lower() for s in suffixes if s.strip()]
+        self.generated = 0
+        self.invalid = 0
+        self.duplicates = 0
+
+    def __iter__(self) -> Iterator[str]:
+        seen: Set[str] = set()
+        for word in self.words:
+            word = word.strip().lower()
+            for prefix in self.prefixes:
+                for suffix in self.suffixes:
+                    try:
+                        label = to_ascii(f"{prefix}{word}{suffix}")
+                    except InvalidDomainError:
+                        label = ''
+                    if not is_valid_label(label):
+                        self.invalid += len(self.tlds)
+                        continue
+                    for tld in self.tlds:
+                        name = f"{label}.{tld}"
+                        if name in seen:
+                            self.duplicates += 1
+                            continue
+                        seen.add(name)
+                        self.generated += 1
+                        yield name
+
+
+def clean_tld(raw: str) -> str:
+    """
+    A TLD or multi-label suffix as given (".IO", "рф", "co.uk") in lowercase IDNA form
+    Raises InvalidDomainError if it can't be one
+    """
+    tld = to_ascii(raw.strip().strip('.'))
+    labels = tld.split('.')
+    # An all-numeric last label would make the name look like an IP address
+    if not all(is_valid_label(label) for label in labels) or labels[-1].isdigit():
+        raise InvalidDomainError(f"Invalid TLD {raw!r}")
+    return tld
@@ -0,0 +1,683 @@
+"""
+Domain availability checking for Domain Checker
+
+Checks domain availability by:
+1. DNS lookup - if domain resolves, it's taken
+2. WHOIS lookup - if no DNS but WHOIS exists, it's taken
+3. Otherwise - domain is available
+
+This is the engine behind the MCP server. It pulls in dnspython and
+python-whois and opens the on-disk caches, so server.py only imports it
+when the first tool call needs it.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from datetime import datetime
+import os
+import time
+from pathlib import Path
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+from whois.exceptions import WhoisDomainNotFoundError
+from whois.parser import WhoisEntry
+
+from .cache import DEFAULT_CACHE_DIR, CacheBackend, CacheCompactor, NegativeCache, TieredCache, TTLPolicy, open_cache_backend
+from .delegation import DelegationChecker
+from .metrics import Metrics
+from .normalize import InvalidDomainError, NormalizedBatch, get_tld, normalize_domain, normalize_domains
+from .ratelimit import RateLimiter
+from .resolver import AdaptiveResolver
+from .singleflight import SingleFlight
+from .rdap import RDAPClient, RDAPError, RDAPPayloadError
+from .whois_transport import WhoisTransport, WhoisTransportError
+
+logger = logging.getLogger(__name__)
+
+# Public WHOIS servers to round-robin through
+WHOIS_SERVERS = [
+    "whois.iana.org",
+    "whois.internic.net",
+    "whois.verisign-grs.com",
+    "whois.publicdomainregistry.com",
+    "whois.publicinterestregistry.org",
+    "whois.nic.info",
+    "whois.nic.io",
+    "whois.nic.ai",
+    "whois.nic.xyz",
+    "whois.nic.me",
+    "whois.nic.google",
+]
+
+# TLDs each rotation server answers for. None means any TLD: whois.iana.org
+# answers by referring us to the registry's own server. The PDR server is a
+# registrar and only knows its own customers, so a "no match" there says
+# nothing about availability; it is kept out of availability lookups.
+# Registry servers for popular TLDs give those TLDs a second server besides
+# IANA; any other TLD only has IANA (and the registry it refers us to).
+WHOIS_SERVER_TLDS = {
+    "whois.iana.org": None,
+    "whois.internic.net": {"com", "net", "edu"},
+    "whois.verisign-grs.com": {"com", "net"},
+    "whois.publicdomainregistry.com": set(),
+    "whois.publicinterestregistry.org": {"org"},
+    "whois.nic.info": {"info"},
+    "whois.nic.io": {"io"},
+    "whois.nic.ai": {"ai"},
+    "whois.nic.xyz": {"xyz"},
+    "whois.nic.me": {"me"},
+    "whois.nic.google": {"app", "dev"},
+}
+# Concurrency defaults, overridable through the environment (see mcp.json "env")
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("DOMAIN_CHECKER_CONCURRENCY", "20"))
+DEFAULT_DNS_RATE = float(os.environ.get("DOMAIN_CHECKER_DNS_RATE", "100"))  # queries/sec per nameserver
+DEFAULT_WHOIS_RATE = float(os.environ.get("DOMAIN_CHECKER_WHOIS_RATE", "2"))  # lookups/sec per TLD
+DEFAULT_WHOIS_SERVER_RATE = float(os.environ.get("DOMAIN_CHECKER_WHOIS_SERVER_RATE", "1"))  # queries/sec per server
+DEFAULT_CACHE_BACKEND = os.environ.get("DOMAIN_CHECKER_CACHE_BACKEND", "sqlite")  # 'sqlite' or 'json'
+DEFAULT_MEMORY_CACHE_SIZE = int(os.environ.get("DOMAIN_CHECKER_MEMORY_CACHE_SIZE", "10000"))
+# Seconds an in-memory copy is served before re-reading the shared store
+DEFAULT_MEMORY_CACHE_MAX_AGE = float(os.environ.get("DOMAIN_CHECKER_MEMORY_CACHE_MAX_AGE", "30"))
+DEFAULT_PARALLEL_DNS = os.environ.get("DOMAIN_CHECKER_PARALLEL_DNS", "1") != "0"  # query A/AAAA/MX at once
+DEFAULT_DELEGATION_CHECK = os.environ.get("DOMAIN_CHECKER_DELEGATION_CHECK", "1") != "0"  # NS check before WHOIS
+DEFAULT_RDAP_LOOKUP = os.environ.get("DOMAIN_CHECKER_RDAP", "1") != "0"  # RDAP before WHOIS
+DEFAULT_METRICS_FILE = os.environ.get("DOMAIN_CHECKER_METRICS_FILE")  # Prometheus text export, off by default
+DEFAULT_ADAPTIVE_DNS = os.environ.get("DOMAIN_CHECKER_ADAPTIVE_DNS", "1") != "0"  # learned timeouts, raced resolvers
+# Resolvers to race, e.g. "1.1.1.1,8.8.8.8" (default: the system's)
+DEFAULT_NAMESERVERS = [ns.strip() for ns in os.environ.get("DOMAIN_CHECKER_NAMESERVERS", "").split(",") if ns.strip()]
+
+class TransientLookupError(Exception):
+    """A lookup failed in a way that says nothing about availability (timeout, SERVFAIL, quota)"""
+
+# DNS failures that mean "ask again later", as opposed to NXDOMAIN / NoAnswer
+TRANSIENT_DNS_ERRORS = (dns.exception.Timeout, dns.resolver.NoNameservers)
+
+# Record types whose presence means a domain is in use
+DNS_RECORD_TYPES = ('A', 'AAAA', 'MX')
+
+def dns_outcome(error: Exception) -> str:
+    """Short label for how a DNS query failed"""
+    if isinstance(error, dns.resolver.NXDOMAIN):
+        return 'nxdomain'
+    if isinstance(error, dns.resolver.NoAnswer):
+        return 'noanswer'
+    if isinstance(error, dns.exception.Timeout):
+        return 'timeout'
+    if isinstance(error, dns.resolver.NoNameservers):
+        return 'servfail'
+    return 'error'
+
+def has_whois_data(w) -> bool:
+    """Whether a parsed WHOIS entry describes a registration"""
+    # Check if we got meaningful data
+    return bool(w.domain_name or w.status or w.creation_date or w.registrar)
+
+def whois_text_registered(domain: str, text: str) -> bool:
+    """Parse raw WHOIS text and decide whether the domain is registered"""
+    try:
+        return has_whois_data(WhoisEntry.load(domain, text))
+    except WhoisDomainNotFoundError:
+        return False
+
+def raise_if_transient_dns(domain: str, failures: List[Exception]):
+    """Raise TransientLookupError if every DNS query for a domain failed transiently"""
+    if failures and all(isinstance(e, TRANSIENT_DNS_ERRORS) for e in failures):
+        raise TransientLookupError(f"DNS lookup failed: {type(failures[-1]).__name__}")
+
+class DomainChecker:
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        dns_rate: float = DEFAULT_DNS_RATE,
+        whois_rate: float = DEFAULT_WHOIS_RATE,
+        nameservers: Optional[List[str]] = None,
+        dns_port: int = 53,
+        cache_dir: Optional[Path] = None,
+        cache_backend: Optional[CacheBackend] = None,
+        ttl_policy: Optional[TTLPolicy] = None,
+        memory_cache_size: int = DEFAULT_MEMORY_CACHE_SIZE,
+        memory_cache_max_age: float = DEFAULT_MEMORY_CACHE_MAX_AGE,
+        parallel_dns: bool = DEFAULT_PARALLEL_DNS,
+        delegation: Optional[DelegationChecker] = None,
+        delegation_check: bool = DEFAULT_DELEGATION_CHECK,
+        rdap: Optional[RDAPClient] = None,
+        rdap_lookup: bool = DEFAULT_RDAP_LOOKUP,
+        whois_transport: Optional[WhoisTransport] = None,
+        metrics_file: Optional[str] = DEFAULT_METRICS_FILE,
+        adaptive_dns: bool = DEFAULT_ADAPTIVE_DNS,
+    ):
+        # Per-stage latency histograms and counters (see checker_stats)
+        self.metrics = Metrics()
+        self.metrics_file = Path(metrics_file).expanduser() if metrics_file else None
+        # WHOIS rotation with per-server health and token buckets
+        self.whois_transport = whois_transport or WhoisTransport(
+            WHOIS_SERVERS, WHOIS_SERVER_TLDS, rate=DEFAULT_WHOIS_SERVER_RATE)
+        self.resolver = dns.resolver.Resolver()
+        self.resolver.timeout = 5  # 5 second timeout
+        self.resolver.lifetime = 5
+        
+        nameservers = nameservers or DEFAULT_NAMESERVERS
+        if nameservers:
+            self.resolver.nameservers = nameservers
+            self.resolver.port = dns_port
+        
+        # Non-blocking resolver used by the batch engine: per-nameserver
+        # timeouts learned from observed RTTs, each query raced to two resolvers
+        if adaptive_dns:
+            self.async_resolver = AdaptiveResolver(nameservers or None, port=dns_port)
+        else:
+            self.async_resolver = dns.asyncresolver.Resolver()
+            self.async_resolver.timeout = 5
+            self.async_resolver.lifetime = 5
+            if nameservers:
+                self.async_resolver.nameservers = nameservers
+                self.async_resolver.port = dns_port
+        self.parallel_dns = parallel_dns
+        
+        # Concurrency and rate limiting
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        # Concurrent checks of the same domain share one lookup
+        self.inflight = SingleFlight()
+        self.dns_limiter = RateLimiter(dns_rate)
+        self.whois_limiter = RateLimiter(whois_rate)
+        # Blocking WHOIS work (python-whois, parsing) runs on its own pool instead of the event loop
+        self.whois_executor = ThreadPoolExecutor(max_workers=max(4, min(max_concurrency, 32)),
+                                                 thread_name_prefix="whois")
+        
+        # Cache setup
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.cache_dir.mkdir(exist_ok=True)
+        self.ttl_policy = ttl_policy or TTLPolicy()
+        self.negative_cache = NegativeCache(self.ttl_policy.negative)
+        # Small LRU of hot entries in front of the on-disk store, filled lazily
+        # An empty backend is falsy (__len__), so compare with None
+        if cache_backend is None:
+            cache_backend = open_cache_backend(self.cache_dir, DEFAULT_CACHE_BACKEND)
+        self.cache = TieredCache(cache_backend,
+                                 maxsize=memory_cache_size, max_age=memory_cache_max_age)
+        self.compactor = CacheCompactor(self.cache).start()
+        
+        # Optional NS delegation stage between DNS and WHOIS
+        if delegation is None and delegation_check:
+            delegation = DelegationChecker(self.async_resolver, self.cache_dir / "tld_nameservers.json",
+                                           limiter=self.dns_limiter)
+        self.delegation = delegation
+        
+        # RDAP replaces WHOIS for every TLD listed in the IANA bootstrap registry.
+        # Registry lookups (RDAP or WHOIS) share the per-TLD rate limit.
+        if rdap is None and rdap_lookup:
+            rdap = RDAPClient(self.cache_dir / "rdap_bootstrap.json", limiter=self.whois_limiter)
+        self.rdap = rdap
+        
+    def get_next_whois_server(self, tld: Optional[str] = None) -> Optional[str]:
+        """Get next healthy WHOIS server (for a TLD, if given) in round-robin fashion"""
+        return self.whois_transport.next_server(tld)
+    
+    def get_cached_result(self, domain: str) -> Tuple[str, str, str, float] | None:
+        """Get cached result if valid, as (domain, status, method, seconds of TTL remaining)"""
+        with self.metrics.timer('cache_load_seconds'):
+            cache_entry = self.cache.get(domain)
+        if cache_entry:
+            remaining = cache_entry['expires_at'] - time.time()
+            if remaining > 0:
+                self.metrics.inc('cache_lookups_total', result='hit')
+                return (domain, cache_entry['status'], cache_entry['method'], remaining)
+        self.metrics.inc('cache_lookups_total', result='miss')
+        return None
+    
+    def cache_result(self, domain: str, status: str, method: str):
+        """Cache domain check result with a TTL chosen by status and method"""
+        now = datetime.now()
+        with self.metrics.timer('cache_save_seconds'):
+            self.cache.set(domain, {
+                'status': status,
+                'method': method,
+                'timestamp': now.isoformat(),
+                'expires_at': (now + self.ttl_policy.ttl_for(status, method)).timestamp()
+            })
+    
+    def cache_hit_ratio(self) -> Optional[float]:
+        """Share of cache lookups that found a fresh entry, or None before the first lookup"""
+        hits = self.metrics.counter('cache_lookups_total', result='hit')
+        total = hits + self.metrics.counter('cache_lookups_total', result='miss')
+        return hits / total if total else None
+    
+    def export_metrics(self):
+        """Write metrics as Prometheus text to metrics_file, if one is configured"""
+        if not self.metrics_file:
+            return
+        try:
+            self.metrics.write_prometheus(self.metrics_file)
+        except Exception as e:
+            logger.error(f"Failed to write metrics to {self.metrics_file}: {e}")
+    
+    def check_dns(self, domain: str) -> bool:
+        """
+        Check if domain has DNS records
+        Raises TransientLookupError if every query failed with a timeout or SERVFAIL
+        """
+        failures = []
+        for rdtype in DNS_RECORD_TYPES:
+            try:
+                self.resolver.resolve(domain, rdtype)
+                return True
+            except dns.resolver.NXDOMAIN:
+                # The name doesn't exist, so no other record type will either
+                return False
+            except Exception as e:
+                failures.append(e)
+        raise_if_transient_dns(domain, failures)
+        return False
+    
+    async def query_dns(self, domain: str, rdtype: str) -> Tuple[str, Optional[Exception], float]:
+        """Run one rate-limited DNS query. Returns (outcome, exception, seconds)"""
+        await self.dns_limiter.acquire(str(self.async_resolver.nameservers[0]))
+        start = time.perf_counter()
+        try:
+            await self.async_resolver.resolve(domain, rdtype)
+            outcome, error = 'answer', None
+        except asyncio.CancelledError:
+            # Lost the race to another record type; not a DNS latency sample
+            raise
+        except Exception as e:
+            outcome, error = dns_outcome(e), e
+        elapsed = time.perf_counter() - start
+        self.metrics.observe('dns_query_seconds', elapsed, rdtype=rdtype)
+        self.metrics.inc('dns_queries_total', rdtype=rdtype, result=outcome)
+        return outcome, error, elapsed
+    
+    async def check_dns_async(self, domain: str, timings: Optional[Dict[str, Dict[str, Any]]] = None) -> bool:
+        """
+        Check if domain has DNS records without blocking the event loop
+        
+        In parallel mode all record types are queried at once and the first
+        answer wins; in either mode an NXDOMAIN for any type settles it.
+        Per-type timings are written to `timings` if given.
+        Raises TransientLookupError if every query failed with a timeout or SERVFAIL
+        """
+        timings = timings if timings is not None else {}
+        failures = []
+        
+        if not self.parallel_dns:
+            for rdtype in DNS_RECORD_TYPES:
+                outcome, error, elapsed = await self.query_dns(domain, rdtype)
+                timings[rdtype] = {'seconds': elapsed, 'result': outcome}
+                if outcome == 'answer':
+                    return True
+                if outcome == 'nxdomain':
+                    return False
+                failures.append(error)
+            raise_if_transient_dns(domain, failures)
+            return False
+        
+        tasks = {asyncio.create_task(self.query_dns(domain, rdtype)): rdtype for rdtype in DNS_RECORD_TYPES}
+        pending = set(tasks)
+        start = time.perf_counter()
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    outcome, error, elapsed = task.result()
+                    timings[tasks[task]] = {'seconds': elapsed, 'result': outcome}
+                    if outcome == 'answer':
+                        return True
+                    if outcome == 'nxdomain':
+                        return False
+                    failures.append(error)
+        finally:
+            # Anything still in flight is no longer needed
+            for task in pending:
+                task.cancel()
+                timings[tasks[task]] = {'seconds': time.perf_counter() - start, 'result': 'cancelled'}
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        raise_if_transient_dns(domain, failures)
+        return False
+    
+    def check_whois(self, domain: str) -> bool:
+        """
+        Check if domain exists in WHOIS, through the same server rotation as the batch engine
+        Raises TransientLookupError when the WHOIS server could not give an answer
+        """
+        try:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return asyncio.run(self.check_whois_async(domain))
+            # Called from inside an event loop: run the lookup on a private loop in a worker thread
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="whois-sync") as pool:
+                return pool.submit(asyncio.run, self.check_whois_async(domain)).result()
+        except TransientLookupError:
+            # Quota errors, timeouts and empty responses say nothing about availability
+            raise
+        except Exception as e:
+            # An unexpected failure (parser bug, library change) is no evidence the domain is free
+            logger.debug(f"WHOIS lookup failed for {domain}: {e}")
+            raise TransientLookupError(f"WHOIS lookup failed: {e}") from e
+    
+    def check_domain(self, domain: str) -> Tuple[str, str, str]:
+        """
+        Check domain availability
+        Returns: (domain, status, method)
+        status: 'available' or 'unavailable'
+        method: 'dns' or 'whois' or 'error' or 'cached'
+        (the NS delegation stage only runs on the async path)
+        """
+        # Canonical registrable domain (scheme/path/www stripped, IDNA-encoded)
+        try:
+            domain = normalize_domain(domain)
+        except InvalidDomainError as e:
+            return (domain, 'error', str(e))
+        
+        # Check cache first
+        cached_result = self.get_cached_result(domain)
+        if cached_result:
+            domain_name, status, method, _ = cached_result
+            return (domain_name, status, f"{method}_cached")
+        negative = self.negative_cache.get(domain)
+        if negative:
+            return (domain, 'error', f"{negative[0]}_cached")
+        
+        try:
+            # First check DNS
+            if self.check_dns(domain):
+                self.cache_result(domain, 'unavailable', 'dns')
+                return (domain, 'unavailable', 'dns')
+            
+            # If no DNS, check WHOIS
+            if self.check_whois(domain):
+                self.cache_result(domain, 'unavailable', 'whois')
+                return (domain, 'unavailable', 'whois')
+            
+            # If neither DNS nor WHOIS, domain is available
+            self.cache_result(domain, 'available', 'none')
+            return (domain, 'available', 'none')
+            
+        except TransientLookupError as e:
+            self.negative_cache.add(domain, str(e))
+            return (domain, 'error', str(e))
+        except Exception as e:
+            logger.error(f"Error checking domain {domain}: {e}")
+            return (domain, 'error', str(e))
+    
+    async def check_whois_async(self, domain: str) -> bool:
+        """
+        WHOIS lookup through the server rotation, rate limited per TLD
+        Raises TransientLookupError if no server could answer
+        """
+        await self.whois_limiter.acquire(get_tld(domain))
+        try:
+            text = await self.whois_transport.lookup(domain)
+        except WhoisTransportError as e:
+            raise TransientLookupError(str(e)) from e
+        # Free-text parsing is regex heavy, keep it off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.whois_executor, whois_text_registered, domain, text)
+    
+    async def check_registration_async(self, domain: str) -> Tuple[bool, str]:
+        """
+        Ask the registry whether a domain is registered
+        Uses RDAP where the TLD has it and WHOIS otherwise. Returns (registered, method)
+        """
+        if self.rdap:
+            try:
+                with self.metrics.timer('rdap_seconds'):
+                    registered = await self.rdap.is_registered(domain)
+            except RDAPPayloadError as e:
+                # The server answered, but not with a domain object: ask WHOIS instead
+                logger.debug(f"RDAP for {domain}: {e}, falling back to WHOIS")
+                registered = None
+            except RDAPError as e:
+                raise TransientLookupError(str(e)) from e
+            if registered is not None:
+                return registered, 'rdap'
+        with self.metrics.timer('whois_seconds'):
+            return await self.check_whois_async(domain), 'whois'
+    
+    async def timed_delegation(self, domain: str) -> Optional[bool]:
+        with self.metrics.timer('delegation_seconds'):
+            return await self.delegation.is_delegated(domain)
+    
+    async def check_domain_detailed(self, domain: str, refresh: bool = False,
+                                    cache_checked: bool = False) -> Dict[str, Any]:
+        """
+        Check a domain, bounded by the global concurrency cap
+        Returns a dict with domain, status, method, cached and ttl_remaining
+        (plus error for status 'error', and dns_timings when DNS was queried)
+        refresh=True skips the cache and stores the fresh answer in it
+        cache_checked=True means the caller already missed the cache for this name
+        """
+        # Canonical registrable domain (scheme/path/www stripped, IDNA-encoded)
+        try:
+            domain = normalize_domain(domain)
+        except InvalidDomainError as e:
+            return {'domain': domain, 'status': 'error', 'method': 'invalid', 'error': str(e),
+                    'cached': False, 'ttl_remaining': None}
+        
+        # Check cache first
+        cached_result = None if refresh or cache_checked else self.get_cached_result(domain)
+        if cached_result:
+            domain_name, status, method, remaining = cached_result
+            return {'domain': domain_name, 'status': status, 'method': method,
+                    'cached': True, 'ttl_remaining': remaining}
+        negative = None if refresh else self.negative_cache.get(domain)
+        if negative:
+            reason, remaining = negative
+            return {'domain': domain, 'status': 'error', 'method': 'error', 'error': reason,
+                    'cached': True, 'ttl_remaining': remaining}
+        
+        # Not cached yet, but maybe being looked up for another caller right now
+        if domain in self.inflight.inflight:
+            self.metrics.inc('lookups_shared_total')
+        else:
+            self.metrics.inc('lookups_started_total')
+        result = await self.inflight.do(domain, lambda: self.lookup_domain(domain))
+        # Each caller gets its own copy (bulk checks annotate results in place)
+        return dict(result)
+    
+    async def lookup_domain(self, domain: str) -> Dict[str, Any]:
+        """Look up a normalized domain over the network and cache the answer"""
+        dns_timings: Dict[str, Dict[str, Any]] = {}
+        queued = time.perf_counter()
+        async with self.semaphore:
+            started = time.perf_counter()
+            self.metrics.observe('queue_wait_seconds', started - queued)
+            try:
+                # First check DNS
+                try:
+                    has_dns = await self.check_dns_async(domain, dns_timings)
+                    dns_error = None
+                except TransientLookupError as e:
+                    has_dns, dns_error = False, e
+                nxdomain = any(t['result'] == 'nxdomain' for t in dns_timings.values())
+                
+                if has_dns:
+                    status, method = 'unavailable', 'dns'
+                # No usable records, but the registry may still delegate the name
+                # (parked or lame domains). An NXDOMAIN already came from the registry.
+                elif self.delegation and not nxdomain and await self.timed_delegation(domain):
+                    status, method = 'unavailable', 'ns'
+                elif dns_error:
+                    raise dns_error
+                else:
+                    # If no DNS, ask the registry (RDAP, or WHOIS where there is no RDAP)
+                    registered, registry_method = await self.check_registration_async(domain)
+                    if registered:
+                        status, method = 'unavailable', registry_method
+                    # If neither DNS nor the registry knows it, domain is available
+                    else:
+                        status, method = 'available', 'none'
+                self.cache_result(domain, status, method)
+                self.metrics.observe('check_seconds', time.perf_counter() - started, status=status)
+                return {'domain': domain, 'status': status, 'method': method, 'cached': False,
+                        'ttl_remaining': self.ttl_policy.ttl_for(status, method).total_seconds(),
+                        'dns_timings': dns_timings}
+                
+            except TransientLookupError as e:
+                self.negative_cache.add(domain, str(e))
+                self.metrics.observe('check_seconds', time.perf_counter() - started, status='error')
+                return {'domain': domain, 'status': 'error', 'method': 'error', 'error': str(e),
+                        'cached': False, 'ttl_remaining': self.negative_cache.ttl.total_seconds(),
+                        'dns_timings': dns_timings}
+            except Exception as e:
+                logger.error(f"Error checking domain {domain}: {e}")
+                return {'domain': domain, 'status': 'error', 'method': 'error', 'error': str(e),
+                        'cached': False, 'ttl_remaining': None, 'dns_timings': dns_timings}
+    
+    async def check_domain_async(self, domain: str) -> Tuple[str, str, str]:
+        """
+        Async version of check_domain
+        Returns: (domain, status, method)
+        """
+        result = await self.check_domain_detailed(domain)
+        method = result['error'] if result['status'] == 'error' else result['method']
+        if result['cached']:
+            method = f"{method}_cached"
+        return (result['domain'], result['status'], method)
+    
+    async def check_domains_batch(
+        self,
+        domains: List[str],
+        on_result: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        batch: Optional[NormalizedBatch] = None,
+    ) -> Dict[str, List[Dict[str, str]]]:
+        """
+        Check multiple domains concurrently and return categorized results
+        
+        Inputs are normalized first, so spellings of the same name (URL, www.,
+        trailing dot, Unicode) are checked once; 'normalized' maps every input
+        that was rewritten to the canonical name its result is listed under.
+        on_result, if given, is awaited with each check_domain_detailed result as soon as it is ready
+        batch, if given, is normalize_domains(domains) already computed by the caller
+        """
+        if batch is None:
+            batch = normalize_domains(domains)
+        async def check_and_report(domain: str) -> Dict[str, Any]:
+            detail = await self.check_domain_detailed(domain)
+            if on_result:
+                try:
+                    await on_result(detail)
+                except Exception as e:
+                    logger.warning(f"Result callback failed for {domain}: {e}")
+            return detail
+        
+        # Results come back in input order; concurrency is capped by self.semaphore
+        checked = await asyncio.gather(*(check_and_report(domain) for domain in batch.unique))
+        self.export_metrics()
+        
+        results = self.summarize_results(checked)
+        for raw, reason in batch.invalid.items():
+            results['errors'].append({'domain': raw, 'method': 'invalid', 'timestamp': datetime.now().isoformat(),
+                                      'cached': False, 'error': reason})
+        results['normalized'] = {raw: name for raw, name in batch.canonical.items() if raw != name}
+        summary = results['summary']
+        summary['error_count'] = len(results['errors'])
+        summary['inputs'] = len(domains)
+        summary['duplicates_merged'] = len(domains) - len(batch.unique) - len(batch.invalid)
+        return results
+    
+    def summarize_results(self, checked: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Sort check_domain_detailed results into available/unavailable/errors with a summary"""
+        available = []
+        unavailable = []
+        errors = []
+        cache_hits = 0
+        negative_hits = 0
+        
+        for detail in checked:
+            
+            result = {
+                'domain': detail['domain'],
+                'method': detail['method'],
+                'timestamp': datetime.now().isoformat(),
+                'cached': detail['cached']
+            }
+            if detail['cached']:
+                result['ttl_remaining'] = round(detail['ttl_remaining'])
+                if detail['status'] == 'error':
+                    negative_hits += 1
+                else:
+                    cache_hits += 1
+            
+            if detail['status'] == 'available':
+                available.append(result)
+            elif detail['status'] == 'unavailable':
+                unavailable.append(result)
+            else:
+                result['error'] = detail['error']
+                errors.append(result)
+        
+        return {
+            'available': available,
+            'unavailable': unavailable,
+            'errors': errors,
+            'summary': {
+                'total_checked': len(checked),
+                'available_count': len(available),
+                'unavailable_count': len(unavailable),
+                'error_count': len(errors),
+                'cache_hits': cache_hits,
+                'negative_cache_hits': negative_hits,
+                'cache_hit_rate': round((cache_hits + negative_hits) / len(checked), 3) if checked else 0.0
+            }
+        }
+    
+    async def check_candidates(
+        self,
+        candidates: Iterable[str],
+        max_available: Optional[int] = None,
+        on_result: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Check a (possibly huge, lazily generated) stream of names
+        
+        Names with a cached answer are reported without a lookup; the rest are
+        pulled from the iterator by max_concurrency workers. Once
+        max_available available names are found no new names are started.
+        """
+        checked: List[Dict[str, Any]] = []
+        candidates = iter(candidates)
+        state = {'available': 0, 'from_cache': 0, 'network': 0}
+        
+        async def record(detail: Dict[str, Any]):
+            checked.append(detail)
+            if detail['status'] == 'available':
+                state['available'] += 1
+            if on_result:
+                try:
+                    await on_result(detail)
+                except Exception as e:
+                    logger.warning(f"Result callback failed for {detail['domain']}: {e}")
+        
+        def done() -> bool:
+            return max_available is not None and state['available'] >= max_available
+        
+        async def worker():
+            # Workers share one iterator, so the generator only runs as fast as names are consumed
+            for domain in candidates:
+                cached = self.get_cached_result(domain)
+                if cached:
+                    domain_name, status, method, remaining = cached
+                    state['from_cache'] += 1
+                    await record({'domain': domain_name, 'status': status, 'method': method,
+                                  'cached': True, 'ttl_remaining': remaining})
+                else:
+                    state['network'] += 1
+                    await record(await self.check_domain_detailed(domain, cache_checked=True))
+                if done():
+                    return
+        
+        await asyncio.gather(*(worker() for _ in range(self.max_concurrency)))
+        
+        self.export_metrics()
+        results = self.summarize_results(checked)
+        results['summary'].update({
+            'from_cache': state['from_cache'],
+            'network_checked': state['network'],
+            'stopped_early': done(),
+        })
+        return results
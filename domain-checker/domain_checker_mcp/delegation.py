@@ -0,0 +1,119 @@
+"""
+Delegation check for Domain Checker
+
+Asks a TLD's authoritative nameservers directly for the NS records of a
+name. A referral means the name is delegated, and therefore registered,
+even if it serves no A/AAAA/MX records (parked domains, lame delegations).
+"""
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import dns.asyncquery
+import dns.asyncresolver
+import dns.message
+import dns.rcode
+import dns.rdatatype
+
+from .normalize import get_tld
+from .ratelimit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# TLD nameserver sets change very rarely
+TLD_SERVERS_TTL = 7 * 24 * 3600
+
+
+class DelegationChecker:
+    def __init__(
+        self,
+        resolver: Optional[dns.asyncresolver.Resolver] = None,
+        cache_file: Optional[Path] = None,
+        tld_servers: Optional[Dict[str, List[str]]] = None,
+        port: int = 53,
+        timeout: float = 2.0,
+        limiter: Optional[RateLimiter] = None,
+    ):
+        self.resolver = resolver or dns.asyncresolver.Resolver()
+        self.cache_file = cache_file
+        self.port = port
+        self.timeout = timeout
+        self.limiter = limiter or RateLimiter(0)
+        # tld -> {'servers': [ip, ...], 'expires_at': epoch}
+        self.tld_map: Dict[str, Dict] = self.load_tld_map()
+        for tld, servers in (tld_servers or {}).items():
+            self.tld_map[tld] = {'servers': servers, 'expires_at': float('inf')}
+
+    def load_tld_map(self) -> Dict[str, Dict]:
+        """Load the TLD-to-nameserver map from disk"""
+        if self.cache_file and self.cache_file.exists():
+            try:
+                with open(self.cache_file, 'r') as f:
+                    return json.load(f)
+            except Exception:
+                return {}
+        return {}
+
+    def save_tld_map(self):
+        """Save the TLD-to-nameserver map to disk (only entries that can expire)"""
+        if not self.cache_file:
+            return
+        try:
+            data = {tld: e for tld, e in self.tld_map.items() if e['expires_at'] != float('inf')}
+            with open(self.cache_file, 'w') as f:
+                json.dump(data, f, indent=2)
+        except Exception as e:
+            logger.error(f"Failed to save TLD nameserver map: {e}")
+
+    async def tld_nameservers(self, tld: str) -> List[str]:
+        """IP addresses of the authoritative nameservers for a TLD"""
+        entry = self.tld_map.get(tld)
+        if entry and entry['expires_at'] > time.time():
+            return entry['servers']
+
+        servers = []
+        try:
+            ns_answer = await self.resolver.resolve(f"{tld}.", 'NS')
+            for ns in sorted(str(r.target) for r in ns_answer)[:4]:
+                try:
+                    servers.extend(str(a) for a in await self.resolver.resolve(ns, 'A'))
+                except Exception as e:
+                    logger.debug(f"Could not resolve TLD nameserver {ns}: {e}")
+        except Exception as e:
+            logger.debug(f"Could not find nameservers for .{tld}: {e}")
+
+        if servers:
+            self.tld_map[tld] = {'servers': servers, 'expires_at': time.time() + TLD_SERVERS_TTL}
+            self.save_tld_map()
+        return servers
+
+    async def is_delegated(self, domain: str) -> Optional[bool]:
+        """
+        Ask the TLD's nameservers about a name
+        Returns True if it is delegated, False on NXDOMAIN, None if no server gave a clear answer
+        """
+        tld = get_tld(domain)
+        query = dns.message.make_query(domain, dns.rdatatype.NS)
+        name = query.question[0].name
+        for server in await self.tld_nameservers(tld):
+            await self.limiter.acquire(server)
+            try:
+                response = await dns.asyncquery.udp(query, server, timeout=self.timeout, port=self.port)
+            except Exception as e:
+                logger.debug(f"Delegation query for {domain} to {server} failed: {e}")
+                continue
+
+            if response.rcode() == dns.rcode.NXDOMAIN:
+                return False
+            if response.rcode() != dns.rcode.NOERROR:
+                continue
+            # A referral carries the NS set in the authority section; some
+            # servers answer it directly
+            for rrset in response.authority + response.answer:
+                if rrset.rdtype == dns.rdatatype.NS and rrset.name == name:
+                    return True
+            return None
+        return None
@@ -0,0 +1,155 @@
+"""
+Input normalization for Domain Checker
+
+Turns whatever users paste ("https://www.Example.com/pricing", "bücher.de.",
+"shop.example.co.uk") into the registrable domain in ASCII form
+("example.com", "xn--bcher-kva.de", "example.co.uk"), so that spellings of
+the same name share one lookup and one cache key.
+
+Public suffixes come from tldextract's bundled Public Suffix List when it is
+installed; otherwise a built-in list of common multi-label suffixes is used.
+"""
+
+import logging
+import re
+from typing import Dict, Iterable, List, NamedTuple
+from urllib.parse import urlsplit
+
+try:
+    import idna
+except ImportError:  # fall back to the stdlib IDNA 2003 codec
+    idna = None
+
+try:
+    import tldextract
+    # Bundled snapshot only: never fetch the list over the network
+    _extract = tldextract.TLDExtract(suffix_list_urls=())
+except ImportError:
+    tldextract = None
+    _extract = None
+
+logger = logging.getLogger(__name__)
+
+# Common public suffixes with more than one label, used when tldextract is
+# not installed. Anything not listed is treated as a single-label suffix.
+MULTI_LABEL_SUFFIXES = {
+    'co.uk', 'org.uk', 'me.uk', 'ltd.uk', 'plc.uk', 'net.uk', 'ac.uk', 'gov.uk',
+    'com.au', 'net.au', 'org.au', 'edu.au', 'gov.au', 'id.au',
+    'co.nz', 'org.nz', 'net.nz', 'ac.nz',
+    'co.jp', 'ne.jp', 'or.jp', 'ac.jp', 'go.jp',
+    'co.kr', 'or.kr', 'co.in', 'net.in', 'org.in', 'firm.in', 'gen.in', 'ind.in',
+    'com.br', 'net.br', 'org.br', 'com.mx', 'org.mx', 'com.ar', 'com.co', 'com.pe',
+    'com.cn', 'net.cn', 'org.cn', 'com.hk', 'com.tw', 'com.sg', 'com.my', 'com.ph',
+    'co.za', 'org.za', 'co.il', 'org.il', 'com.tr', 'com.ua', 'co.id', 'or.id',
+    'com.pl', 'net.pl', 'co.at', 'or.at', 'com.es', 'com.pt', 'com.gr', 'com.ru',
+}
+
+
+# Letters, digits and hyphens, 1-63 characters, no leading/trailing hyphen
+LABEL_RE = re.compile(r'^(?!-)[a-z0-9-]{1,63}(?<!-)$')
+
+
+def is_valid_label(label: str) -> bool:
+    """Whether a label is a registrable LDH label (ASCII or punycode)"""
+    if not LABEL_RE.match(label):
+        return False
+    # Hyphens in positions 3-4 are reserved for encodings like xn--
+    return label[2:4] != '--' or label.startswith('xn--')
+
+
+class InvalidDomainError(ValueError):
+    """Input that cannot be turned into a registrable domain name"""
+
+
+def to_ascii(name: str) -> str:
+    """IDNA-encode a (possibly Unicode) host name, label by label"""
+    try:
+        if idna is not None:
+            return idna.encode(name, uts46=True).decode('ascii')
+        return name.encode('idna').decode('ascii')
+    except (UnicodeError, ValueError) as e:
+        # idna.IDNAError is a UnicodeError
+        raise InvalidDomainError(f"Invalid domain {name!r}: {e}") from e
+
+
+def get_tld(domain: str) -> str:
+    """The last label of a domain name: lowercased, without trailing dots, IDNA-encoded"""
+    tld = domain.rstrip('.').rsplit('.', 1)[-1].lower()
+    if not tld.isascii():
+        try:
+            tld = to_ascii(tld)
+        except InvalidDomainError:
+            pass
+    return tld
+
+
+def extract_host(raw: str) -> str:
+    """The host part of a URL, "host/path" string or bare name, lowercased, without trailing dots"""
+    text = raw.strip()
+    if '://' not in text:
+        text = '//' + text
+    try:
+        host = urlsplit(text).hostname or ''
+    except ValueError as e:
+        raise InvalidDomainError(f"Invalid domain {raw!r}: {e}") from e
+    return host.strip().rstrip('.').lower()
+
+
+def registrable_domain(host: str) -> str:
+    """The registrable part of an ASCII host name: one label below its public suffix"""
+    labels = host.split('.')
+    if _extract is not None:
+        result = _extract(host)
+        if not result.suffix or not result.domain:
+            raise InvalidDomainError(f"Not a registrable domain: {host!r}")
+        return f"{result.domain}.{result.suffix}"
+    if len(labels) < 2:
+        raise InvalidDomainError(f"Not a registrable domain: {host!r}")
+    suffix_len = 2 if '.'.join(labels[-2:]) in MULTI_LABEL_SUFFIXES else 1
+    if len(labels) <= suffix_len:
+        raise InvalidDomainError(f"Not a registrable domain: {host!r}")
+    return '.'.join(labels[-suffix_len - 1:])
+
+
+def normalize_domain(raw: str) -> str:
+    """
+    Canonical form of a domain input
+    Raises InvalidDomainError for input that has no registrable domain
+    """
+    host = extract_host(raw)
+    if not host:
+        raise InvalidDomainError(f"Invalid domain {raw!r}: no host name")
+    ascii_host = to_ascii(host)
+    domain = registrable_domain(ascii_host)
+    for label in domain.split('.'):
+        if not is_valid_label(label):
+            raise InvalidDomainError(f"Invalid domain {raw!r}: bad label {label!r}")
+    return domain
+
+
+class NormalizedBatch(NamedTuple):
+    """A batch of inputs reduced to unique canonical names"""
+    unique: List[str]  # canonical names, first-seen order
+    canonical: Dict[str, str]  # original input -> canonical name
+    invalid: Dict[str, str]  # original input -> reason
+
+
+def normalize_domains(inputs: Iterable[str]) -> NormalizedBatch:
+    """Normalize a batch in one pass; repeated inputs are only parsed once"""
+    unique: List[str] = []
+    seen = set()
+    canonical: Dict[str, str] = {}
+    invalid: Dict[str, str] = {}
+    for raw in inputs:
+        if raw in canonical or raw in invalid:
+            continue
+        try:
+            domain = normalize_domain(raw)
+        except InvalidDomainError as e:
+            invalid[raw] = str(e)
+            continue
+        canonical[raw] = domain
+        if domain not in seen:
+            seen.add(domain)
+            unique.append(domain)
+    return NormalizedBatch(unique, canonical, invalid)
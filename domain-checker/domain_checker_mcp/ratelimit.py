@@ -0,0 +1,62 @@
+"""
+Rate limiting helpers for Domain Checker
+
+Token buckets keyed by an arbitrary string (a TLD, a nameserver, a WHOIS
+server) so that large batches don't hammer any single upstream.
+"""
+
+import asyncio
+import time
+from typing import Dict
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, up to `burst` stored"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> float:
+        """Take a token if possible. Returns 0 on success, else seconds to wait"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
+
+
+class RateLimiter:
+    """A set of token buckets, one per key, sharing the same settings"""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def bucket(self, key: str) -> TokenBucket:
+        """Get (or create) the bucket for a key"""
+        if key not in self.buckets:
+            self.buckets[key] = TokenBucket(self.rate, self.burst)
+        return self.buckets[key]
+
+    async def acquire(self, key: str):
+        """Wait for a token from the bucket for `key`. A rate <= 0 disables limiting"""
+        if self.rate <= 0:
+            return
+        await self.bucket(key).acquire()
@@ -0,0 +1,182 @@
+"""
+RDAP client for Domain Checker
+
+RDAP is the JSON-over-HTTPS successor to WHOIS. One pooled keep-alive HTTP
+client is shared by all lookups, and the IANA bootstrap registry tells us
+which RDAP server is responsible for each TLD.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import httpx
+
+from .normalize import get_tld
+from .ratelimit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+IANA_RDAP_BOOTSTRAP = "https://data.iana.org/rdap/dns.json"
+BOOTSTRAP_TTL = 7 * 24 * 3600
+BOOTSTRAP_RETRY = 3600  # after a failed bootstrap fetch, fall back to WHOIS for this long
+
+
+class RDAPError(Exception):
+    """An RDAP server could not answer (rate limited, server error, network failure)"""
+
+
+class RDAPPayloadError(RDAPError):
+    """An RDAP server answered 200 with something other than a domain object"""
+
+
+def parse_bootstrap(data: Dict) -> Dict[str, str]:
+    """Turn an RFC 9224 bootstrap document into a TLD -> base URL map"""
+    base_urls = {}
+    for tlds, urls in data.get('services', []):
+        # Prefer HTTPS when a service lists several URLs
+        urls = sorted(urls, key=lambda u: not u.startswith('https://'))
+        if not urls:
+            continue
+        base = urls[0] if urls[0].endswith('/') else urls[0] + '/'
+        for tld in tlds:
+            base_urls[tld.lower()] = base
+    return base_urls
+
+
+class RDAPClient:
+    def __init__(
+        self,
+        bootstrap_file: Optional[Path] = None,
+        bootstrap_url: str = IANA_RDAP_BOOTSTRAP,
+        base_urls: Optional[Dict[str, str]] = None,
+        timeout: float = 10.0,
+        max_connections: int = 20,
+        limiter: Optional[RateLimiter] = None,
+    ):
+        self.bootstrap_file = bootstrap_file
+        self.bootstrap_url = bootstrap_url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.limiter = limiter or RateLimiter(0)
+        # An explicit map skips the bootstrap registry entirely
+        self.base_urls: Optional[Dict[str, str]] = dict(base_urls) if base_urls is not None else None
+        self.bootstrap_expires = float('inf') if base_urls is not None else 0.0
+        self.bootstrap_lock: Optional[asyncio.Lock] = None
+        self.client: Optional[httpx.AsyncClient] = None
+        self.client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.closer: Optional[asyncio.Task] = None
+
+    def get_client(self) -> httpx.AsyncClient:
+        """The shared keep-alive client for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self.client is None or self.client_loop is not loop:
+            self.client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                headers={'Accept': 'application/rdap+json'},
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+            self.client_loop = loop
+            self.bootstrap_lock = asyncio.Lock()
+            # Pooled sockets belong to this loop and can't be closed from another one,
+            # so the client is closed when its loop shuts down (asyncio.run cancels
+            # leftover tasks first), before a later loop replaces it
+            self.closer = loop.create_task(self.close_with_loop(self.client))
+        return self.client
+
+    async def close_with_loop(self, client: httpx.AsyncClient):
+        """Wait until cancelled, then close the client's pooled connections"""
+        try:
+            await asyncio.get_running_loop().create_future()
+        finally:
+            await client.aclose()
+            if self.client is client:
+                self.client = None
+
+    def load_bootstrap_file(self) -> Optional[Dict[str, str]]:
+        """Load the cached bootstrap map from disk if it is still fresh"""
+        if not self.bootstrap_file or not self.bootstrap_file.exists():
+            return None
+        try:
+            with open(self.bootstrap_file, 'r') as f:
+                cached = json.load(f)
+            if cached['fetched_at'] + BOOTSTRAP_TTL > time.time():
+                self.bootstrap_expires = cached['fetched_at'] + BOOTSTRAP_TTL
+                return cached['base_urls']
+        except Exception as e:
+            logger.debug(f"Ignoring unreadable RDAP bootstrap cache: {e}")
+        return None
+
+    async def ensure_bootstrap(self):
+        """Make sure the TLD -> RDAP base URL map is loaded and fresh"""
+        if self.base_urls is not None and self.bootstrap_expires > time.time():
+            return
+        client = self.get_client()
+        async with self.bootstrap_lock:
+            if self.base_urls is not None and self.bootstrap_expires > time.time():
+                return
+            base_urls = self.load_bootstrap_file()
+            if base_urls is None:
+                try:
+                    response = await client.get(self.bootstrap_url)
+                    response.raise_for_status()
+                    base_urls = parse_bootstrap(response.json())
+                    self.bootstrap_expires = time.time() + BOOTSTRAP_TTL
+                    if self.bootstrap_file:
+                        with open(self.bootstrap_file, 'w') as f:
+                            json.dump({'fetched_at': time.time(), 'base_urls': base_urls}, f)
+                    logger.info(f"Loaded RDAP bootstrap for {len(base_urls)} TLDs")
+                except Exception as e:
+                    logger.warning(f"Failed to load RDAP bootstrap, using WHOIS only: {e}")
+                    base_urls = self.base_urls or {}
+                    self.bootstrap_expires = time.time() + BOOTSTRAP_RETRY
+            self.base_urls = base_urls
+
+    async def base_url(self, tld: str) -> Optional[str]:
+        """RDAP base URL for a TLD, or None if the TLD has no RDAP service"""
+        await self.ensure_bootstrap()
+        return self.base_urls.get(tld.lower())
+
+    async def is_registered(self, domain: str) -> Optional[bool]:
+        """
+        Look a domain up over RDAP
+        Returns True/False, or None if the TLD has no RDAP service
+        Raises RDAPError when the server could not give an answer
+        """
+        tld = get_tld(domain)
+        base = await self.base_url(tld)
+        if base is None:
+            return None
+
+        await self.limiter.acquire(tld)
+        try:
+            response = await self.get_client().get(f"{base}domain/{domain}")
+        except httpx.HTTPError as e:
+            raise RDAPError(f"RDAP lookup failed: {type(e).__name__}") from e
+
+        if response.status_code == 404:
+            return False
+        if response.status_code != 200:
+            raise RDAPError(f"RDAP lookup failed: HTTP {response.status_code}")
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise RDAPError("RDAP lookup failed: invalid JSON") from e
+        # Anything but a domain object (an error page, a search result, an entity
+        # we were redirected to) says nothing about whether the name is free
+        if not isinstance(data, dict) or data.get('objectClassName') != 'domain':
+            raise RDAPPayloadError("unexpected RDAP payload")
+        return True
+
+    async def close(self):
+        """Close pooled connections"""
+        # A finished closer already closed its client when its loop shut down
+        if self.closer is not None and not self.closer.done():
+            self.closer.cancel()
+            await asyncio.gather(self.closer, return_exceptions=True)
+        self.closer = None
@@ -0,0 +1,212 @@
+"""
+Adaptive DNS resolver for Domain Checker
+
+Instead of a fixed 5 second timeout per nameserver, each nameserver's
+round-trip times are tracked and its timeout is derived from their recent
+99th percentile. Every query is raced to the two best-looking nameservers
+and the first definitive answer (records, no records, or NXDOMAIN) wins, so
+one slow or lossy upstream no longer stalls a batch.
+
+resolve() raises the same exceptions as dns.asyncresolver.Resolver
+(NXDOMAIN, NoAnswer, Timeout, NoNameservers) and returns a
+dns.resolver.Answer, so it is a drop-in replacement.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import dns.asyncquery
+import dns.exception
+import dns.message
+import dns.name
+import dns.rcode
+import dns.rdataclass
+import dns.rdatatype
+import dns.resolver
+
+logger = logging.getLogger(__name__)
+
+RTT_SAMPLES = 128  # recent round trips kept per nameserver
+MIN_SAMPLES = 8  # below this, the initial timeout is used
+TIMEOUT_FACTOR = 2.0  # timeout = p99 RTT x this
+LOSS_DECAY = 0.9  # weight of history in the loss rate average
+
+
+class NameserverStats:
+    """Recent RTTs and loss rate for one nameserver"""
+
+    def __init__(self, initial_timeout: float, min_timeout: float, max_timeout: float):
+        self.rtts: Deque[float] = deque(maxlen=RTT_SAMPLES)
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.queries = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.wins = 0
+        self.loss_rate = 0.0
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.rtts:
+            return None
+        ordered = sorted(self.rtts)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def timeout(self) -> float:
+        """Per-attempt timeout from the observed RTT distribution"""
+        if len(self.rtts) < MIN_SAMPLES:
+            return self.initial_timeout
+        return min(self.max_timeout, max(self.min_timeout, self.percentile(0.99) * TIMEOUT_FACTOR))
+
+    def score(self) -> float:
+        """Lower is better: typical RTT, inflated by recent losses. Unmeasured servers go first"""
+        if not self.rtts:
+            return 0.0
+        return self.percentile(0.5) * (1 + 10 * self.loss_rate)
+
+    def record_answer(self, rtt: float):
+        self.queries += 1
+        self.rtts.append(rtt)
+        self.loss_rate *= LOSS_DECAY
+
+    def record_timeout(self):
+        self.queries += 1
+        self.timeouts += 1
+        self.loss_rate = self.loss_rate * LOSS_DECAY + (1 - LOSS_DECAY)
+
+    def record_failure(self):
+        self.queries += 1
+        self.failures += 1
+
+    def to_dict(self) -> Dict:
+        ms = lambda s: round(s * 1000, 1) if s is not None else None
+        return {
+            'queries': self.queries,
+            'timeouts': self.timeouts,
+            'failures': self.failures,
+            'wins': self.wins,
+            'loss_rate': round(self.loss_rate, 3),
+            'rtt_p50_ms': ms(self.percentile(0.5)),
+            'rtt_p99_ms': ms(self.percentile(0.99)),
+            'timeout_ms': ms(self.timeout()),
+        }
+
+
+class AdaptiveResolver:
+    def __init__(
+        self,
+        nameservers: Optional[List[str]] = None,
+        port: int = 53,
+        race: int = 2,
+        initial_timeout: float = 2.0,
+        min_timeout: float = 0.1,
+        max_timeout: float = 5.0,
+        lifetime: float = 10.0,
+        attempts: int = 3,
+    ):
+        """
+        nameservers: resolvers to use (default: the system's, from resolv.conf)
+        race: how many nameservers each query is sent to at once
+        lifetime: overall limit for one resolve(), across all attempts
+        """
+        if not nameservers:
+            nameservers = [str(ns) for ns in dns.resolver.Resolver().nameservers]
+        self.nameservers = list(nameservers)
+        self.port = port
+        self.race = max(1, race)
+        self.lifetime = lifetime
+        self.attempts = attempts
+        self.stats: Dict[str, NameserverStats] = {
+            ns: NameserverStats(initial_timeout, min_timeout, max_timeout) for ns in self.nameservers}
+
+    def pick(self, exclude: Tuple[str, ...] = ()) -> List[str]:
+        """The nameservers to race, best first"""
+        candidates = [ns for ns in self.nameservers if ns not in exclude] or self.nameservers
+        return sorted(candidates, key=lambda ns: self.stats[ns].score())[:self.race]
+
+    async def query_one(self, query: dns.message.Message, nameserver: str,
+                        timeout: float) -> Tuple[str, Optional[dns.message.Message]]:
+        """
+        Send a query to one nameserver
+        Returns (result, response): 'answer' for a definitive response, 'timeout', or 'failed'
+        """
+        stats = self.stats[nameserver]
+        start = time.perf_counter()
+        try:
+            response, _ = await dns.asyncquery.udp_with_fallback(
+                query, nameserver, timeout=timeout, port=self.port)
+        except dns.exception.Timeout:
+            stats.record_timeout()
+            return 'timeout', None
+        except Exception as e:
+            logger.debug(f"DNS query to {nameserver} failed: {e}")
+            stats.record_failure()
+            return 'failed', None
+        # SERVFAIL/REFUSED say nothing about the name; the other racer may do better
+        if response.rcode() not in (dns.rcode.NOERROR, dns.rcode.NXDOMAIN):
+            stats.record_failure()
+            return 'failed', response
+        stats.record_answer(time.perf_counter() - start)
+        return 'answer', response
+
+    async def race_once(self, query: dns.message.Message, nameservers: List[str],
+                        scale: float, deadline: float) -> Tuple[Optional[str], Optional[dns.message.Message], List[str]]:
+        """Race a query to several nameservers. Returns (winner, response, outcomes of the losers)"""
+        tasks = {}
+        for ns in nameservers:
+            timeout = min(self.stats[ns].timeout() * scale, max(0.0, deadline - time.monotonic()))
+            tasks[asyncio.create_task(self.query_one(query, ns, timeout))] = ns
+        outcomes = []
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result, response = task.result()
+                    if result == 'answer':
+                        self.stats[tasks[task]].wins += 1
+                        return tasks[task], response, outcomes
+                    outcomes.append(result)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        return None, None, outcomes
+
+    async def resolve(self, qname, rdtype='A', rdclass='IN') -> dns.resolver.Answer:
+        """Resolve a name; raises NXDOMAIN, NoAnswer, Timeout or NoNameservers like dnspython"""
+        name = dns.name.from_text(qname) if isinstance(qname, str) else qname
+        rdtype = dns.rdatatype.RdataType.make(rdtype)
+        rdclass = dns.rdataclass.RdataClass.make(rdclass)
+        query = dns.message.make_query(name, rdtype, rdclass)
+        deadline = time.monotonic() + self.lifetime
+        timed_out = False
+        tried: Tuple[str, ...] = ()
+
+        for attempt in range(self.attempts):
+            if time.monotonic() >= deadline:
+                break
+            nameservers = self.pick(exclude=tried)
+            tried += tuple(nameservers)
+            # Each retry round allows twice as long, like a TCP retransmission timer
+            winner, response, outcomes = await self.race_once(query, nameservers, 2 ** attempt, deadline)
+            if winner is not None:
+                if response.rcode() == dns.rcode.NXDOMAIN:
+                    raise dns.resolver.NXDOMAIN(qnames=[name], responses={name: response})
+                # Raises NoAnswer if there are no records of this type
+                return dns.resolver.Answer(name, rdtype, rdclass, response, winner, self.port)
+            timed_out = timed_out or 'timeout' in outcomes
+            if len(tried) >= len(self.nameservers):
+                tried = ()
+
+        if timed_out:
+            raise dns.exception.Timeout(timeout=self.lifetime)
+        raise dns.resolver.NoNameservers(request=query, errors=[])
+
+    def nameserver_stats(self) -> Dict[str, Dict]:
+        """Per-nameserver RTT percentiles, current timeout, loss rate and race wins"""
+        return {ns: stats.to_dict() for ns, stats in self.stats.items()}
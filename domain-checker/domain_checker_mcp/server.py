@@ -1,219 +1,191 @@
 """
 Domain Checker MCP Server
 
-Checks domain availability by:
-1. DNS lookup - if domain resolves, it's taken
-2. WHOIS lookup - if no DNS but WHOIS exists, it's taken
-3. Otherwise - domain is available
+Answers the MCP handshake and tool listing straight away: the checker
+(dnspython, python-whois, the on-disk caches) and the watchlist are only
+loaded when the first tool call needs them. See checker.py for how domains
+are checked.
 """
 
 import asyncio
 import json
 import logging
-import socket
-import random
-from typing import Any, Dict, List, Tuple
-from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from datetime import datetime
 import os
+import time
 from pathlib import Path
 
-import dns.resolver
-import whois
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 from mcp.server.stdio import stdio_server
 
+from .bulk import check_domains_file
+from .cache import DEFAULT_CACHE_DIR
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# httpx logs every RDAP request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
-# Public WHOIS servers to round-robin through
-WHOIS_SERVERS = [
-    "whois.iana.org",
-    "whois.internic.net",
-    "whois.verisign-grs.com",
-    "whois.publicdomainregistry.com",
-]
+DEFAULT_WATCH_RATE = float(os.environ.get("DOMAIN_CHECKER_WATCH_RATE", "0.5"))  # watchlist re-checks/sec
+DEFAULT_WATCH_NOTIFY = os.environ.get("DOMAIN_CHECKER_WATCH_NOTIFY")  # command run when a watched name frees up
+# After startup, wait this long before loading a non-empty watchlist, so the
+# client's first requests are not competing with it
+WATCHLIST_RESUME_DELAY = 5.0
 
-class DomainChecker:
-    def __init__(self):
-        self.whois_index = 0
-        self.resolver = dns.resolver.Resolver()
-        self.resolver.timeout = 5  # 5 second timeout
-        self.resolver.lifetime = 5
-        
-        # Cache setup
-        self.cache_dir = Path.home() / ".domain_checker_cache"
-        self.cache_dir.mkdir(exist_ok=True)
-        self.cache_file = self.cache_dir / "domain_cache.json"
-        self.cache_duration = timedelta(hours=24)  # Cache for 24 hours
-        self.cache = self.load_cache()
-        
-    def get_next_whois_server(self) -> str:
-        """Get next WHOIS server in round-robin fashion"""
-        server = WHOIS_SERVERS[self.whois_index]
-        self.whois_index = (self.whois_index + 1) % len(WHOIS_SERVERS)
-        return server
+# Create server instance
+app = Server("domain-checker")
+# Created on first use by load_checker() / get_scheduler()
+checker = None
+# The worker-thread build of the checker, while the first tool calls wait for it
+checker_loading = None
+watchlist = None
+scheduler = None
+# Session of the most recent tool call, for watchlist notifications
+notify_session = None
+
+def __getattr__(name: str):
+    """DomainChecker and its helpers now live in .checker; keep importing them from here working"""
+    if name in ('DomainChecker', 'whois_text_registered', 'TransientLookupError'):
+        from . import checker as checker_module
+        return getattr(checker_module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_checker():
+    """The shared DomainChecker, created (with its imports and caches) on first use; blocks, see load_checker"""
+    global checker
+    if checker is None:
+        start = time.perf_counter()
+        from .checker import DomainChecker
+        checker = DomainChecker()
+        logger.info(f"Domain checker loaded in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return checker
+
+async def load_checker():
+    """
+    The shared DomainChecker for tool calls
+    The first call builds it on a worker thread (imports, SQLite, cache
+    import), so the event loop keeps answering pings and other requests;
+    concurrent first calls wait for the same build.
+    """
+    global checker_loading
+    if checker is not None:
+        return checker
+    if checker_loading is None:
+        checker_loading = asyncio.get_running_loop().run_in_executor(None, get_checker)
+    try:
+        return await asyncio.shield(checker_loading)
+    except Exception:
+        # Let the next call try again
+        checker_loading = None
+        raise
+
+def get_scheduler():
+    """The watchlist scheduler, created and started on first use"""
+    global watchlist, scheduler
+    if scheduler is None:
+        from .watchlist import Watchlist, WatchlistScheduler, command_listener
+        domain_checker = get_checker()
+        watchlist = Watchlist(domain_checker.cache_dir / "watchlist.sqlite3")
+        scheduler = WatchlistScheduler(domain_checker, watchlist, rate=DEFAULT_WATCH_RATE)
+        if DEFAULT_WATCH_NOTIFY:
+            scheduler.listeners.append(command_listener(DEFAULT_WATCH_NOTIFY))
+        scheduler.listeners.append(notify_client)
+        scheduler.start()
+    return scheduler
+
+async def resume_watchlist(cache_dir: Path = DEFAULT_CACHE_DIR):
+    """Shortly after startup, resume background re-checks if earlier sessions watched anything"""
+    await asyncio.sleep(WATCHLIST_RESUME_DELAY)
+    path = cache_dir / "watchlist.sqlite3"
+    if scheduler is not None or not path.exists():
+        return
+    from .watchlist import Watchlist
+    saved = Watchlist(path)
+    try:
+        watched = len(saved)
+    finally:
+        saved.close()
+    if watched:
+        logger.info(f"Resuming watchlist ({watched} domains)")
+        await load_checker()
+        get_scheduler()
+
+async def notify_client(event: Dict[str, Any]):
+    """Tell the connected client that a watched domain became available"""
+    if notify_session is not None:
+        await notify_session.send_log_message("warning", {'event': 'domain_available', **event},
+                                              logger="domain-checker.watchlist")
+
+def progress_reporter(total: Optional[int] = None) -> Optional[Callable[[Dict[str, Any]], Awaitable[None]]]:
+    """Per-result callback streaming progress to the client, if the request carries a progress token"""
+    ctx = app.request_context
+    progress_token = ctx.meta.progressToken if ctx.meta else None
+    if progress_token is None:
+        return None
+    done = 0
     
-    def load_cache(self) -> Dict[str, Dict[str, Any]]:
-        """Load cache from disk"""
-        if self.cache_file.exists():
-            try:
-                with open(self.cache_file, 'r') as f:
-                    return json.load(f)
-            except Exception:
-                return {}
-        return {}
+    async def on_result(detail: Dict[str, Any]):
+        nonlocal done
+        done += 1
+        await ctx.session.send_progress_notification(progress_token, done, total)
+        await ctx.session.send_log_message(
+            "info",
+            {key: detail.get(key) for key in ('domain', 'status', 'method', 'cached', 'error')
+             if detail.get(key) is not None},
+            logger="domain-checker",
+        )
     
-    def save_cache(self):
-        """Save cache to disk"""
-        try:
-            with open(self.cache_file, 'w') as f:
-                json.dump(self.cache, f, indent=2)
-        except Exception as e:
-            logger.error(f"Failed to save cache: {e}")
+    return on_result
+
+def format_results(results: Dict[str, Any], include_json: bool = True, extra_summary: List[str] = ()) -> List[str]:
+    """Human-readable lines for a check_domains_batch/check_candidates result"""
+    output = []
     
-    def get_cached_result(self, domain: str) -> Tuple[str, str, str] | None:
-        """Get cached result if valid"""
-        if domain in self.cache:
-            cache_entry = self.cache[domain]
-            cached_time = datetime.fromisoformat(cache_entry['timestamp'])
-            if datetime.now() - cached_time < self.cache_duration:
-                return (domain, cache_entry['status'], cache_entry['method'])
-        return None
+    # Available domains
+    if results['available']:
+        output.append(f"\n✅ AVAILABLE ({len(results['available'])} domains):")
+        for domain in results['available']:
+            output.append(f"  • {domain['domain']}")
     
-    def cache_result(self, domain: str, status: str, method: str):
-        """Cache domain check result"""
-        self.cache[domain] = {
-            'status': status,
-            'method': method,
-            'timestamp': datetime.now().isoformat()
-        }
-        self.save_cache()
+    # Unavailable domains
+    if results['unavailable']:
+        output.append(f"\n❌ UNAVAILABLE ({len(results['unavailable'])} domains):")
+        for domain in results['unavailable']:
+            cached_str = " [cached]" if domain.get('cached', False) else ""
+            output.append(f"  • {domain['domain']} (detected via {domain['method']}){cached_str}")
     
-    def check_dns(self, domain: str) -> bool:
-        """Check if domain has DNS records"""
-        try:
-            # Try to resolve A records
-            self.resolver.resolve(domain, 'A')
-            return True
-        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, Exception):
-            pass
-            
-        try:
-            # Try to resolve AAAA records (IPv6)
-            self.resolver.resolve(domain, 'AAAA')
-            return True
-        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, Exception):
-            pass
-            
-        try:
-            # Try to resolve MX records
-            self.resolver.resolve(domain, 'MX')
-            return True
-        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, Exception):
-            pass
-            
-        return False
+    # Inputs that were rewritten or merged
+    if results.get('normalized'):
+        output.append(f"\n🔁 NORMALIZED ({len(results['normalized'])} inputs):")
+        for raw, name in results['normalized'].items():
+            output.append(f"  • {raw} → {name}")
     
-    def check_whois(self, domain: str) -> bool:
-        """Check if domain exists in WHOIS"""
-        try:
-            # Try with python-whois first
-            w = whois.whois(domain)
-            
-            # Check if we got meaningful data
-            if w.domain_name:
-                return True
-            if w.status:
-                return True
-            if w.creation_date:
-                return True
-            if w.registrar:
-                return True
-                
-            return False
-            
-        except Exception as e:
-            logger.debug(f"WHOIS lookup failed for {domain}: {e}")
-            return False
+    # Errors
+    if results['errors']:
+        output.append(f"\n⚠️  ERRORS ({len(results['errors'])} domains):")
+        for domain in results['errors']:
+            output.append(f"  • {domain['domain']}: {domain.get('error', 'Unknown error')}")
     
-    def check_domain(self, domain: str) -> Tuple[str, str, str]:
-        """
-        Check domain availability
-        Returns: (domain, status, method)
-        status: 'available' or 'unavailable'
-        method: 'dns' or 'whois' or 'error' or 'cached'
-        """
-        # Clean domain
-        domain = domain.lower().strip()
-        if domain.startswith('www.'):
-            domain = domain[4:]
-        
-        # Check cache first
-        cached_result = self.get_cached_result(domain)
-        if cached_result:
-            domain_name, status, method = cached_result
-            return (domain_name, status, f"{method}_cached")
-        
-        try:
-            # First check DNS
-            if self.check_dns(domain):
-                self.cache_result(domain, 'unavailable', 'dns')
-                return (domain, 'unavailable', 'dns')
-            
-            # If no DNS, check WHOIS
-            if self.check_whois(domain):
-                self.cache_result(domain, 'unavailable', 'whois')
-                return (domain, 'unavailable', 'whois')
-            
-            # If neither DNS nor WHOIS, domain is available
-            self.cache_result(domain, 'available', 'none')
-            return (domain, 'available', 'none')
-            
-        except Exception as e:
-            logger.error(f"Error checking domain {domain}: {e}")
-            return (domain, 'error', str(e))
+    # Summary
+    output.append(f"\n📊 Summary:")
+    output.append(f"  Total checked: {results['summary']['total_checked']}")
+    output.append(f"  Available: {results['summary']['available_count']}")
+    output.append(f"  Unavailable: {results['summary']['unavailable_count']}")
+    output.append(f"  Errors: {results['summary']['error_count']}")
+    output.append(f"  Cache hit rate: {results['summary']['cache_hit_rate']:.0%}")
+    if results['summary'].get('duplicates_merged'):
+        output.append(f"  Duplicate inputs merged: {results['summary']['duplicates_merged']}")
+    output.extend(extra_summary)
     
-    async def check_domains_batch(self, domains: List[str]) -> Dict[str, List[Dict[str, str]]]:
-        """Check multiple domains and return categorized results"""
-        available = []
-        unavailable = []
-        errors = []
-        
-        for domain in domains:
-            domain_name, status, method = self.check_domain(domain)
-            
-            result = {
-                'domain': domain_name,
-                'method': method.replace('_cached', '') if '_cached' in method else method,
-                'timestamp': datetime.now().isoformat(),
-                'cached': '_cached' in method
-            }
-            
-            if status == 'available':
-                available.append(result)
-            elif status == 'unavailable':
-                unavailable.append(result)
-            else:
-                result['error'] = method
-                errors.append(result)
-        
-        return {
-            'available': available,
-            'unavailable': unavailable,
-            'errors': errors,
-            'summary': {
-                'total_checked': len(domains),
-                'available_count': len(available),
-                'unavailable_count': len(unavailable),
-                'error_count': len(errors)
-            }
-        }
-
-# Create server instance
-app = Server("domain-checker")
-checker = DomainChecker()
+    # Add JSON results (compact; the text above already lists everything)
+    if include_json:
+        output.append(f"\n📋 Full Results (JSON):")
+        output.append(json.dumps(results, separators=(',', ':')))
+    
+    return output
 
 @app.list_tools()
 async def list_tools() -> list[Tool]:
@@ -221,7 +193,7 @@ async def list_tools() -> list[Tool]:
     return [
         Tool(
             name="check_domains",
-            description="Check availability of multiple domains",
+            description="Check availability of multiple domains. Sends a progress notification per domain when the request carries a progress token",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -231,6 +203,11 @@ async def list_tools() -> list[Tool]:
                             "type": "string"
                         },
                         "description": "List of domain names to check (without http/https)"
+                    },
+                    "include_json": {
+                        "type": "boolean",
+                        "description": "Append the full results as compact JSON after the summary",
+                        "default": True
                     }
                 },
                 "required": ["domains"]
@@ -249,70 +226,209 @@ async def list_tools() -> list[Tool]:
                 },
                 "required": ["domain"]
             }
+        ),
+        Tool(
+            name="generate_and_check",
+            description="Generate candidate names from base words x prefixes/suffixes x TLDs and check them, "
+                        "skipping invalid labels and reporting cached answers without a lookup. "
+                        "Stops early once max_available available names are found",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "words": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Base words, e.g. [\"rocket\", \"nimbus\"]"
+                    },
+                    "tlds": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "TLDs to try, with or without the dot; Unicode TLDs are IDNA-encoded",
+                        "default": ["com"]
+                    },
+                    "prefixes": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Optional prefixes, e.g. [\"get\", \"try\"] (the bare word is always tried)",
+                        "default": []
+                    },
+                    "suffixes": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Optional suffixes, e.g. [\"hq\", \"app\"] (the bare word is always tried)",
+                        "default": []
+                    },
+                    "max_available": {
+                        "type": "integer",
+                        "description": "Stop after this many available names (omit to check everything)",
+                        "minimum": 1
+                    },
+                    "include_json": {
+                        "type": "boolean",
+                        "description": "Append the full results as compact JSON after the summary",
+                        "default": True
+                    }
+                },
+                "required": ["words"]
+            }
+        ),
+        Tool(
+            name="check_domains_file",
+            description="Check every domain in a local file (one per line, or CSV with a 'domain' column), "
+                        "writing results to a JSONL/CSV file as they finish. Resumes from the checkpoint "
+                        "next to the output file if a previous run was interrupted",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "input_path": {
+                        "type": "string",
+                        "description": "Path of the file with domain names"
+                    },
+                    "output_path": {
+                        "type": "string",
+                        "description": "Path of the results file (.jsonl or .csv)"
+                    },
+                    "format": {
+                        "type": "string",
+                        "enum": ["jsonl", "csv"],
+                        "description": "Output format (default: from the output file extension)"
+                    },
+                    "resume": {
+                        "type": "boolean",
+                        "description": "Continue from an existing checkpoint instead of starting over",
+                        "default": True
+                    }
+                },
+                "required": ["input_path", "output_path"]
+            }
+        ),
+        Tool(
+            name="checker_stats",
+            description="Show where checks spend their time: p50/p95/p99 latency per stage "
+                        "(DNS per record type, delegation, RDAP, WHOIS, cache load/save, queueing) "
+                        "and the cache hit ratio",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "include_json": {
+                        "type": "boolean",
+                        "description": "Append the raw histograms and counters as JSON",
+                        "default": False
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="watch_domains",
+            description="Add domains to the watchlist. Watched domains are re-checked in the background "
+                        "before their cached answer expires, and a notification is sent when one becomes available",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "domains": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Domain names to watch"
+                    }
+                },
+                "required": ["domains"]
+            }
+        ),
+        Tool(
+            name="unwatch_domains",
+            description="Remove domains from the watchlist",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "domains": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Domain names to stop watching"
+                    }
+                },
+                "required": ["domains"]
+            }
+        ),
+        Tool(
+            name="watchlist_status",
+            description="Show watched domains with their last status and next re-check, and recent status changes",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "limit": {
+                        "type": "integer",
+                        "description": "Show at most this many domains and events",
+                        "default": 100
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="whois_server_stats",
+            description="Show per-server WHOIS latency, error rate, throttling and backoff",
+            inputSchema={
+                "type": "object",
+                "properties": {}
+            }
         )
     ]
 
 @app.call_tool()
 async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
     """Handle tool calls"""
+    global notify_session
+    notify_session = app.request_context.session
+    if name not in {tool.name for tool in await list_tools()}:
+        return [TextContent(type="text", text=f"Error: Unknown tool: {name}")]
+    
+    # Every tool needs the checker; the first call loads it
+    try:
+        checker = await load_checker()
+    except Exception as e:
+        logger.error(f"Error loading the domain checker: {e}")
+        return [TextContent(type="text", text=f"Error: could not start the domain checker: {str(e)}")]
     
     if name == "check_domains":
         try:
             domains = arguments.get("domains", [])
             if not domains:
-                return [TextContent(text="Error: No domains provided")]
+                return [TextContent(type="text", text="Error: No domains provided")]
             
-            # Check domains
-            results = await checker.check_domains_batch(domains)
+            include_json = arguments.get("include_json", True)
             
-            # Format results
-            output = []
-            output.append("=== Domain Availability Check Results ===\n")
-            
-            # Available domains
-            if results['available']:
-                output.append(f"\n✅ AVAILABLE ({len(results['available'])} domains):")
-                for domain in results['available']:
-                    output.append(f"  • {domain['domain']}")
+            from .normalize import normalize_domains
             
-            # Unavailable domains
-            if results['unavailable']:
-                output.append(f"\n❌ UNAVAILABLE ({len(results['unavailable'])} domains):")
-                for domain in results['unavailable']:
-                    cached_str = " [cached]" if domain.get('cached', False) else ""
-                    output.append(f"  • {domain['domain']} (detected via {domain['method']}){cached_str}")
+            # Normalize once: the progress total is the number of unique names actually checked
+            batch = normalize_domains(domains)
             
-            # Errors
-            if results['errors']:
-                output.append(f"\n⚠️  ERRORS ({len(results['errors'])} domains):")
-                for domain in results['errors']:
-                    output.append(f"  • {domain['domain']}: {domain.get('error', 'Unknown error')}")
+            # Stream each result to the client as it arrives, if it asked for progress
+            on_result = progress_reporter(len(batch.unique))
             
-            # Summary
-            output.append(f"\n📊 Summary:")
-            output.append(f"  Total checked: {results['summary']['total_checked']}")
-            output.append(f"  Available: {results['summary']['available_count']}")
-            output.append(f"  Unavailable: {results['summary']['unavailable_count']}")
-            output.append(f"  Errors: {results['summary']['error_count']}")
+            # Check domains
+            results = await checker.check_domains_batch(domains, on_result=on_result, batch=batch)
             
-            # Add JSON results
-            output.append(f"\n📋 Full Results (JSON):")
-            output.append(json.dumps(results, indent=2))
+            # Format results
+            output = ["=== Domain Availability Check Results ===\n"]
+            output.extend(format_results(results, include_json))
             
-            return [TextContent(text="\n".join(output))]
+            return [TextContent(type="text", text="\n".join(output))]
             
         except Exception as e:
             logger.error(f"Error in check_domains: {e}")
-            return [TextContent(text=f"Error checking domains: {str(e)}")]
+            return [TextContent(type="text", text=f"Error checking domains: {str(e)}")]
     
     elif name == "check_single_domain":
         try:
             domain = arguments.get("domain", "").strip()
             if not domain:
-                return [TextContent(text="Error: No domain provided")]
+                return [TextContent(type="text", text="Error: No domain provided")]
             
             # Check single domain with detailed info
-            domain_name, status, method = checker.check_domain(domain)
+            result = await checker.check_domain_detailed(domain)
+            domain_name, status = result['domain'], result['status']
+            method = result['error'] if status == 'error' else result['method']
+            if result['cached']:
+                method = f"{method}_cached"
             
             output = []
             output.append(f"=== Domain Check: {domain_name} ===\n")
@@ -334,7 +450,7 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
                         # Try to get IP addresses
                         ips = []
                         try:
-                            for answer in checker.resolver.resolve(domain_name, 'A'):
+                            for answer in await checker.async_resolver.resolve(domain_name, 'A'):
                                 ips.append(str(answer))
                         except:
                             pass
@@ -342,6 +458,12 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
                             output.append(f"• IP addresses: {', '.join(ips)}")
                     except:
                         pass
+                elif method == 'ns':
+                    output.append("• Domain is delegated by its registry (NS records)")
+                    output.append("• No active A/AAAA/MX records")
+                elif method == 'rdap':
+                    output.append("• Domain found in the registry's RDAP service")
+                    output.append("• No active DNS records")
                 elif method == 'whois':
                     output.append("• Domain found in WHOIS database")
                     output.append("• No active DNS records")
@@ -349,21 +471,231 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
                 output.append(f"⚠️  Status: ERROR")
                 output.append(f"• Error: {method}")
             
+            # Where the time went, per DNS record type
+            if result.get('dns_timings'):
+                output.append("\n⏱️  DNS timing:")
+                for rdtype, timing in result['dns_timings'].items():
+                    output.append(f"  • {rdtype}: {timing['seconds'] * 1000:.0f} ms ({timing['result']})")
+            
             output.append(f"\n• Check timestamp: {datetime.now().isoformat()}")
             
-            return [TextContent(text="\n".join(output))]
+            return [TextContent(type="text", text="\n".join(output))]
             
         except Exception as e:
             logger.error(f"Error in check_single_domain: {e}")
-            return [TextContent(text=f"Error checking domain: {str(e)}")]
+            return [TextContent(type="text", text=f"Error checking domain: {str(e)}")]
+    
+    elif name == "generate_and_check":
+        try:
+            words = arguments.get("words", [])
+            if not words:
+                return [TextContent(type="text", text="Error: No words provided")]
+            
+            from .candidates import CandidateGenerator
+            
+            candidates = CandidateGenerator(
+                words,
+                arguments.get("tlds") or ["com"],
+                prefixes=arguments.get("prefixes", []),
+                suffixes=arguments.get("suffixes", []),
+            )
+            if not candidates.tlds:
+                reasons = "; ".join(candidates.invalid_tlds.values())
+                return [TextContent(type="text", text=f"Error: No valid TLDs provided ({reasons})")]
+            # The number of names to check is unknown up front, so progress has no total
+            results = await checker.check_candidates(
+                candidates,
+                max_available=arguments.get("max_available"),
+                on_result=progress_reporter(),
+            )
+            results['summary']['generated'] = candidates.generated
+            results['summary']['invalid_skipped'] = candidates.invalid
+            results['summary']['invalid_tlds'] = candidates.invalid_tlds
+            
+            summary = results['summary']
+            extra = [
+                f"  Names generated: {summary['generated']} ({summary['invalid_skipped']} invalid skipped)",
+                f"  Answered from cache: {summary['from_cache']}",
+                f"  Looked up: {summary['network_checked']}",
+            ]
+            if candidates.invalid_tlds:
+                extra.append(f"  Invalid TLDs skipped: {', '.join(candidates.invalid_tlds)}")
+            if summary['stopped_early']:
+                extra.append("  Stopped early: reached max_available")
+            
+            output = ["=== Generated Domain Check Results ===\n"]
+            output.extend(format_results(results, arguments.get("include_json", True), extra))
+            
+            return [TextContent(type="text", text="\n".join(output))]
+            
+        except Exception as e:
+            logger.error(f"Error in generate_and_check: {e}")
+            return [TextContent(type="text", text=f"Error generating domains: {str(e)}")]
+    
+    elif name == "check_domains_file":
+        try:
+            input_path = Path(arguments.get("input_path", "")).expanduser()
+            output_path = Path(arguments.get("output_path", "")).expanduser()
+            if not input_path.is_file():
+                return [TextContent(type="text", text=f"Error: Input file not found: {input_path}")]
+            
+            summary = await check_domains_file(
+                checker, input_path, output_path,
+                fmt=arguments.get("format"),
+                resume=arguments.get("resume", True),
+                on_result=progress_reporter(),
+            )
+            
+            output = []
+            output.append("=== Bulk Domain Check ===\n")
+            if summary['resumed_from']:
+                output.append(f"Resumed after {summary['resumed_from']} already-checked domains")
+            output.append(f"Results written to: {summary['output']} ({summary['format']})")
+            output.append("\n📊 Summary:")
+            output.append(f"  Checked this run: {summary['checked_this_run']}")
+            output.append(f"  Total processed: {summary['total_processed']}")
+            output.append(f"  Available: {summary['available_count']}")
+            output.append(f"  Unavailable: {summary['unavailable_count']}")
+            output.append(f"  Errors: {summary['error_count']}")
+            output.append(f"  Throughput: {summary['domains_per_second']} domains/s")
+            return [TextContent(type="text", text="\n".join(output))]
+            
+        except Exception as e:
+            logger.error(f"Error in check_domains_file: {e}")
+            return [TextContent(type="text", text=f"Error checking domain file: {str(e)}")]
+    
+    elif name == "checker_stats":
+        from .resolver import AdaptiveResolver
+        
+        snapshot = checker.metrics.snapshot()
+        checker.export_metrics()
+        
+        output = []
+        output.append("=== Checker Stats ===\n")
+        histograms = [h for h in snapshot['histograms'] if h['count']]
+        if not histograms:
+            output.append("No checks run yet.")
+        else:
+            output.append("⏱️  Latency by stage (ms):")
+            for h in histograms:
+                labels = ",".join(f"{k}={v}" for k, v in h['labels'].items())
+                stage = h['name'].removesuffix('_seconds') + (f" [{labels}]" if labels else "")
+                output.append(f"  • {stage}: n={h['count']}  p50 {h['p50_ms']}  p95 {h['p95_ms']}  "
+                              f"p99 {h['p99_ms']}  max {h['max_ms']}")
+        
+        hit_ratio = checker.cache_hit_ratio()
+        memory = checker.cache.stats()
+        output.append("\n📊 Cache:")
+        output.append(f"  Hit ratio: {hit_ratio:.0%}" if hit_ratio is not None else "  Hit ratio: n/a")
+        output.append(f"  In-memory tier: {memory['size']}/{memory['maxsize']} entries, "
+                      f"{memory['hits']} hits, {memory['store_hits']} loaded from disk, "
+                      f"{memory['evictions']} evictions")
+        inflight = checker.inflight.stats()
+        output.append(f"  In-flight dedupe: {inflight['shared']} checks joined a lookup already running "
+                      f"({inflight['started']} lookups started, {inflight['in_flight']} running now)")
+        if isinstance(checker.async_resolver, AdaptiveResolver):
+            output.append("\n🌐 Nameservers:")
+            for ns, s in checker.async_resolver.nameserver_stats().items():
+                output.append(f"  • {ns}: {s['queries']} queries, {s['wins']} races won, "
+                              f"rtt p50 {s['rtt_p50_ms']} ms / p99 {s['rtt_p99_ms']} ms, "
+                              f"timeout {s['timeout_ms']} ms, loss {s['loss_rate']:.0%}")
+        if checker.metrics_file:
+            output.append(f"\nPrometheus metrics written to {checker.metrics_file}")
+        
+        if arguments.get("include_json", False):
+            output.append("\n📋 Full Stats (JSON):")
+            output.append(json.dumps(snapshot, separators=(',', ':')))
+        return [TextContent(type="text", text="\n".join(output))]
+    
+    elif name == "watch_domains":
+        scheduler = get_scheduler()
+        domains = arguments.get("domains", [])
+        if not domains:
+            return [TextContent(type="text", text="Error: No domains provided")]
+        result = scheduler.add(domains)
+        
+        output = []
+        output.append("=== Watchlist ===\n")
+        output.append(f"Added {len(result['added'])} domains ({len(scheduler.watchlist)} watched in total)")
+        if result['existing']:
+            output.append(f"Already watched: {', '.join(result['existing'])}")
+        if result['invalid']:
+            output.append(f"⚠️  Not valid domains: {', '.join(result['invalid'])}")
+        if result['added'] and scheduler.rate > 0:
+            output.append(f"First checks are paced at {scheduler.rate:g}/s "
+                          f"(~{len(result['added']) / scheduler.rate:.0f}s for this batch)")
+        return [TextContent(type="text", text="\n".join(output))]
+    
+    elif name == "unwatch_domains":
+        scheduler = get_scheduler()
+        removed = scheduler.watchlist.remove(arguments.get("domains", []))
+        return [TextContent(type="text", text=f"Removed {removed} domains from the watchlist ({len(scheduler.watchlist)} left)")]
+    
+    elif name == "watchlist_status":
+        scheduler = get_scheduler()
+        limit = arguments.get("limit", 100)
+        entries = scheduler.watchlist.entries()
+        now = time.time()
+        
+        output = []
+        output.append(f"=== Watchlist ({len(entries)} domains) ===\n")
+        if not entries:
+            output.append("No domains watched. Add some with watch_domains.")
+        for entry in entries[:limit]:
+            status = entry['last_status'] or 'not checked yet'
+            icon = {'available': '✅', 'unavailable': '❌'}.get(entry['last_status'], '⏳')
+            due = entry['next_check'] - now
+            when = "due now" if due <= 0 else f"next check in {due / 60:.0f} min"
+            output.append(f"  {icon} {entry['domain']}: {status} ({when})")
+        if len(entries) > limit:
+            output.append(f"  ... and {len(entries) - limit} more")
+        
+        events = scheduler.watchlist.events(limit)
+        if events:
+            output.append("\n🔔 Recent changes:")
+            for event in events:
+                at = datetime.fromtimestamp(event['at']).isoformat(timespec='seconds')
+                output.append(f"  • {at} {event['domain']}: {event['old_status']} → {event['new_status']}")
+        output.append(f"\n📊 Background checks this session: {scheduler.checks} "
+                      f"({scheduler.notifications} became available)")
+        return [TextContent(type="text", text="\n".join(output))]
+    
+    elif name == "whois_server_stats":
+        stats = checker.whois_transport.stats()
+        
+        output = []
+        output.append("=== WHOIS Server Stats ===\n")
+        if not stats:
+            output.append("No WHOIS queries sent yet.")
+        for server, s in stats.items():
+            latency = f"{s['latency_ms']:.0f} ms" if s['latency_ms'] is not None else "n/a"
+            state = f"resting {s['backoff_remaining']:.0f}s" if s['backoff_remaining'] else "healthy"
+            output.append(f"• {server}: {s['requests']} requests, {s['error_rate']:.0%} errors, "
+                          f"{s['throttled']} throttled, latency {latency} ({state})")
+        
+        output.append("\n📋 Full Stats (JSON):")
+        output.append(json.dumps(stats, indent=2))
+        return [TextContent(type="text", text="\n".join(output))]
     
     else:
-        return [TextContent(text=f"Error: Unknown tool: {name}")]
+        return [TextContent(type="text", text=f"Error: Unknown tool: {name}")]
+
+async def run_server():
+    """Serve MCP over stdio"""
+    async with stdio_server() as (read_stream, write_stream):
+        resume = asyncio.create_task(resume_watchlist())
+        try:
+            await app.run(read_stream, write_stream, app.create_initialization_options())
+        finally:
+            resume.cancel()
+            await asyncio.gather(resume, return_exceptions=True)
+            if scheduler is not None:
+                await scheduler.stop()
 
 def main():
     """Main entry point"""
     logger.info("Starting Domain Checker MCP server...")
-    asyncio.run(stdio_server(app).run())
+    asyncio.run(run_server())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
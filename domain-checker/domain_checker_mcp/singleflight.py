@@ -0,0 +1,57 @@
+"""
+Single-flight lookups for Domain Checker
+
+Results are only cached once a lookup finishes, so two overlapping tool
+calls (an agent retrying, or fanning out) would otherwise check the same
+domain twice. SingleFlight lets every caller asking for a key while a
+lookup for it is in flight wait on that lookup instead of starting another.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    At most one in-flight call per key; concurrent callers share its result
+
+    The shared lookup runs as its own task, so a caller that is cancelled
+    doesn't cancel it for the others. It is only cancelled once every caller
+    waiting on it has gone away.
+    """
+
+    def __init__(self):
+        self.inflight: Dict[str, asyncio.Task] = {}
+        self.waiters: Dict[str, int] = {}
+        self.started = 0  # lookups actually run
+        self.shared = 0  # callers that joined a lookup already in flight
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() for key, or wait for the run already in progress"""
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self.inflight[key] = task
+            self.waiters[key] = 0
+            self.started += 1
+            task.add_done_callback(lambda _, key=key, task=task: self._forget(key, task))
+        else:
+            self.shared += 1
+        self.waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self.waiters.get(key) == 1:
+                task.cancel()
+            raise
+        finally:
+            if self.inflight.get(key) is task:
+                self.waiters[key] -= 1
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+            del self.waiters[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {'started': self.started, 'shared': self.shared, 'in_flight': len(self.inflight)}
@@ -0,0 +1,297 @@
+"""
+Watchlist for Domain Checker
+
+A persistent list of domains to keep an eye on, and a background scheduler
+that re-checks each one before its cached answer expires. Re-checks are
+spread out over time and paced by a token bucket, so a few thousand watched
+names cost a steady trickle of lookups instead of periodic bursts, and
+interactive checks of watched names are always answered from a warm cache.
+
+When a watched name goes from unavailable to available, listeners are
+notified (MCP log message, optional shell command).
+"""
+
+import asyncio
+import logging
+import random
+import shlex
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from .normalize import InvalidDomainError, normalize_domain
+from .ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+REFRESH_FRACTION = 0.8  # re-check once this much of the cached answer's TTL has passed
+REFRESH_JITTER = 0.1  # +/- fraction of the interval, so entries checked together drift apart
+ERROR_RETRY = 300.0  # seconds before retrying a check that failed
+CLAIM_LEASE = 300.0  # a claimed entry is not handed to another scheduler for this long
+IDLE_POLL = 60.0  # longest sleep when nothing is due
+
+Listener = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class Watchlist:
+    """
+    Watched domains and their status history, in SQLite (WAL)
+
+    Several processes can share the file: due entries are claimed with a
+    conditional update, so two schedulers never re-check the same name at once.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS watchlist (
+            domain TEXT PRIMARY KEY,
+            added_at REAL NOT NULL,
+            last_status TEXT,
+            last_method TEXT,
+            last_checked REAL,
+            next_check REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS watchlist_next_check ON watchlist (next_check);
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            domain TEXT NOT NULL,
+            old_status TEXT,
+            new_status TEXT NOT NULL,
+            at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def add(self, domains: Iterable[str], spacing: float = 0.0, now: Optional[float] = None) -> Dict[str, List[str]]:
+        """
+        Watch domains; the first checks are `spacing` seconds apart
+        Returns {'added': [...], 'existing': [...], 'invalid': [...]}
+        """
+        now = now if now is not None else time.time()
+        result = {'added': [], 'existing': [], 'invalid': []}
+        with self.lock, self.conn:
+            # Queue new names behind anything already waiting for a first check
+            row = self.conn.execute(
+                "SELECT MAX(next_check) FROM watchlist WHERE last_checked IS NULL").fetchone()
+            start = max(now, row[0] or now)
+            for raw in domains:
+                try:
+                    domain = normalize_domain(raw)
+                except InvalidDomainError:
+                    result['invalid'].append(raw)
+                    continue
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO watchlist (domain, added_at, next_check) VALUES (?, ?, ?)",
+                    (domain, now, start + len(result['added']) * spacing))
+                result['added' if cursor.rowcount else 'existing'].append(domain)
+        return result
+
+    def remove(self, domains: Iterable[str]) -> int:
+        """Stop watching domains. Returns how many were removed"""
+        removed = 0
+        with self.lock, self.conn:
+            for raw in domains:
+                try:
+                    domain = normalize_domain(raw)
+                except InvalidDomainError:
+                    continue
+                removed += self.conn.execute("DELETE FROM watchlist WHERE domain = ?", (domain,)).rowcount
+        return removed
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """All watched domains, soonest re-check first"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT domain, added_at, last_status, last_method, last_checked, next_check "
+                "FROM watchlist ORDER BY next_check").fetchall()
+        keys = ('domain', 'added_at', 'last_status', 'last_method', 'last_checked', 'next_check')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def claim_due(self, now: Optional[float] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Take up to `limit` entries whose re-check is due, leasing them to this caller"""
+        now = now if now is not None else time.time()
+        claimed = []
+        with self.lock, self.conn:
+            rows = self.conn.execute(
+                "SELECT domain, last_status, next_check FROM watchlist WHERE next_check <= ? "
+                "ORDER BY next_check LIMIT ?", (now, limit)).fetchall()
+            for domain, last_status, next_check in rows:
+                cursor = self.conn.execute(
+                    "UPDATE watchlist SET next_check = ? WHERE domain = ? AND next_check = ?",
+                    (now + CLAIM_LEASE, domain, next_check))
+                if cursor.rowcount:
+                    claimed.append({'domain': domain, 'last_status': last_status})
+        return claimed
+
+    def next_due(self) -> Optional[float]:
+        """When the soonest re-check is due, or None if nothing is watched"""
+        with self.lock:
+            return self.conn.execute("SELECT MIN(next_check) FROM watchlist").fetchone()[0]
+
+    def record(self, domain: str, status: str, method: str, next_check: float,
+               now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Store a check result and schedule the next one
+        Returns the status-change event, if the status changed
+        """
+        now = now if now is not None else time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT last_status FROM watchlist WHERE domain = ?", (domain,)).fetchone()
+            if row is None:
+                return None  # removed while it was being checked
+            old_status = row[0]
+            if status == 'error':
+                # Keep the last real answer; just try again later
+                self.conn.execute("UPDATE watchlist SET next_check = ? WHERE domain = ?", (next_check, domain))
+                return None
+            self.conn.execute(
+                "UPDATE watchlist SET last_status = ?, last_method = ?, last_checked = ?, next_check = ? "
+                "WHERE domain = ?", (status, method, now, next_check, domain))
+            if old_status is None or old_status == status:
+                return None
+            self.conn.execute(
+                "INSERT INTO events (domain, old_status, new_status, at) VALUES (?, ?, ?, ?)",
+                (domain, old_status, status, now))
+        return {'domain': domain, 'old_status': old_status, 'new_status': status, 'at': now}
+
+    def events(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent status changes, newest first"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT domain, old_status, new_status, at FROM events ORDER BY id DESC LIMIT ?",
+                (limit,)).fetchall()
+        return [{'domain': d, 'old_status': o, 'new_status': n, 'at': at} for d, o, n, at in rows]
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM watchlist").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def command_listener(command: str) -> Listener:
+    """Listener that runs a shell command with the domain and new status appended as arguments"""
+    argv = shlex.split(command)
+
+    async def notify(event: Dict[str, Any]):
+        process = await asyncio.create_subprocess_exec(*argv, event['domain'], event['new_status'])
+        await process.wait()
+
+    return notify
+
+
+class WatchlistScheduler:
+    """
+    Background re-checking of watched domains
+
+    Each answer is refreshed after REFRESH_FRACTION of its cache TTL (with
+    jitter), so watched names never fall out of the cache. Checks are paced
+    by a token bucket of `rate` checks per second.
+    """
+
+    def __init__(self, checker, watchlist: Watchlist, rate: float = 0.5,
+                 listeners: Optional[List[Listener]] = None):
+        self.checker = checker
+        self.watchlist = watchlist
+        self.rate = rate
+        self.bucket = TokenBucket(rate, 1) if rate > 0 else None
+        self.listeners: List[Listener] = list(listeners or [])
+        self.random = random.Random()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.checks = 0
+        self.notifications = 0
+
+    def spacing(self) -> float:
+        """Seconds between first checks of newly added names, to stay inside the rate budget"""
+        return 1 / self.rate if self.rate > 0 else 0.0
+
+    def add(self, domains: Iterable[str]) -> Dict[str, List[str]]:
+        """Watch domains and wake the scheduler"""
+        result = self.watchlist.add(domains, spacing=self.spacing())
+        self.wakeup.set()
+        return result
+
+    def next_interval(self, ttl: Optional[float]) -> float:
+        if not ttl:
+            return ERROR_RETRY
+        interval = ttl * REFRESH_FRACTION
+        return interval * (1 + self.random.uniform(-REFRESH_JITTER, REFRESH_JITTER))
+
+    async def check(self, domain: str):
+        """Re-check one domain, bypassing the cache, and record the result"""
+        detail = await self.checker.check_domain_detailed(domain, refresh=True)
+        self.checks += 1
+        ttl = detail.get('ttl_remaining') if detail['status'] != 'error' else ERROR_RETRY
+        event = self.watchlist.record(domain, detail['status'], detail['method'],
+                                      time.time() + self.next_interval(ttl))
+        if event and event['old_status'] == 'unavailable' and event['new_status'] == 'available':
+            logger.warning(f"Watched domain {domain} is now available")
+            self.notifications += 1
+            for listener in self.listeners:
+                try:
+                    await listener(event)
+                except Exception as e:
+                    logger.warning(f"Watchlist notification for {domain} failed: {e}")
+
+    def claim_limit(self, limit: int) -> int:
+        """
+        How many entries to claim at once: no more than the bucket can start
+        within half a lease, so none of them is still waiting when its lease
+        runs out and another scheduler claims it too
+        """
+        if not self.bucket:
+            return limit
+        return max(1, min(limit, int(self.rate * CLAIM_LEASE / 2)))
+
+    async def run_due(self, now: Optional[float] = None, limit: int = 100) -> int:
+        """Re-check what is due (up to `limit`, fewer at low rates). Returns the number checked"""
+        due = self.watchlist.claim_due(now, self.claim_limit(limit))
+        tasks = []
+        for entry in due:
+            if self.bucket:
+                await self.bucket.acquire()
+            tasks.append(asyncio.create_task(self.check(entry['domain'])))
+        for entry, result in zip(due, await asyncio.gather(*tasks, return_exceptions=True)):
+            if isinstance(result, Exception):
+                logger.error(f"Watchlist re-check of {entry['domain']} failed: {result}")
+        return len(due)
+
+    async def run(self):
+        """Loop forever: re-check what is due, then sleep until the next entry is"""
+        while True:
+            try:
+                if await self.run_due():
+                    continue
+                next_due = self.watchlist.next_due()
+                delay = IDLE_POLL if next_due is None else min(IDLE_POLL, max(0.0, next_due - time.time()))
+            except Exception as e:
+                logger.error(f"Watchlist scheduler error: {e}")
+                delay = IDLE_POLL
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> asyncio.Task:
+        """Run the scheduler as a task on the current event loop"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return self.task
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
@@ -0,0 +1,212 @@
+"""
+WHOIS transport for Domain Checker
+
+Speaks the WHOIS protocol (RFC 3912) directly so that lookups actually go to
+the server picked by the rotation. Each server gets its own token bucket and
+health record; servers that are slow, failing or throttling us are rested
+and the rotation routes around them.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from .normalize import get_tld
+from .ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Phrases registries use when they refuse to answer because of rate limits
+THROTTLE_MARKERS = (
+    "limit exceeded",
+    "quota exceeded",
+    "rate limit",
+    "too many",
+    "try again later",
+    "access denied",
+)
+
+# Backoff after failures: doubles per consecutive error, capped
+ERROR_BACKOFF_BASE = 2.0
+ERROR_BACKOFF_MAX = 300.0
+THROTTLE_BACKOFF = 60.0
+
+
+class WhoisTransportError(Exception):
+    """No WHOIS server could answer"""
+
+
+def split_server(server: str) -> Tuple[str, int]:
+    """'host' or 'host:port' -> (host, port)"""
+    host, _, port = server.partition(':')
+    return host, int(port) if port else 43
+
+
+class ServerHealth:
+    """Latency, error and throttle bookkeeping for one WHOIS server"""
+
+    def __init__(self, rate: float, burst: float):
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.consecutive_errors = 0
+        self.latency_ewma: Optional[float] = None
+        self.backoff_until = 0.0
+
+    def record_success(self, latency: float):
+        self.requests += 1
+        self.consecutive_errors = 0
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+
+    def record_error(self, throttled: bool = False):
+        self.requests += 1
+        self.errors += 1
+        self.consecutive_errors += 1
+        if throttled:
+            self.throttled += 1
+            backoff = THROTTLE_BACKOFF
+        else:
+            backoff = min(ERROR_BACKOFF_MAX, ERROR_BACKOFF_BASE ** self.consecutive_errors)
+        self.backoff_until = time.monotonic() + backoff
+
+    def available(self, slow_threshold: float) -> bool:
+        """Not resting after errors, and not consistently slow"""
+        if self.backoff_until > time.monotonic():
+            return False
+        return self.latency_ewma is None or self.latency_ewma < slow_threshold
+
+    def to_dict(self) -> Dict:
+        now = time.monotonic()
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'throttled': self.throttled,
+            'error_rate': round(self.errors / self.requests, 3) if self.requests else 0.0,
+            'latency_ms': round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            'backoff_remaining': round(max(0.0, self.backoff_until - now), 1),
+        }
+
+
+class WhoisTransport:
+    def __init__(
+        self,
+        servers: List[str],
+        server_tlds: Optional[Dict[str, Optional[Set[str]]]] = None,
+        rate: float = 1.0,
+        burst: float = 3.0,
+        timeout: float = 10.0,
+        slow_threshold: float = 5.0,
+        max_attempts: int = 2,
+    ):
+        """
+        servers: rotation order, as 'host' or 'host:port'
+        server_tlds: TLDs each server is authoritative for; None means any TLD
+        (a referral server like whois.iana.org). Servers missing from the map
+        answer for any TLD.
+        """
+        self.servers = list(servers)
+        self.server_tlds = server_tlds or {}
+        self.rate = rate
+        self.burst = burst
+        self.timeout = timeout
+        self.slow_threshold = slow_threshold
+        self.max_attempts = max_attempts
+        self.index = 0
+        self.health: Dict[str, ServerHealth] = {}
+
+    def get_health(self, server: str) -> ServerHealth:
+        if server not in self.health:
+            self.health[server] = ServerHealth(self.rate, self.burst)
+        return self.health[server]
+
+    def eligible(self, tld: Optional[str]) -> List[str]:
+        """Servers in the rotation that can answer for a TLD"""
+        if tld is None:
+            return self.servers
+        result = []
+        for server in self.servers:
+            tlds = self.server_tlds.get(server)
+            if tlds is None or tld in tlds:
+                result.append(server)
+        return result
+
+    def next_server(self, tld: Optional[str] = None, exclude: Set[str] = frozenset()) -> Optional[str]:
+        """
+        Next server in round-robin order that can answer for `tld` and is healthy.
+        If every candidate is resting, the one that recovers soonest is used.
+        """
+        candidates = [s for s in self.eligible(tld) if s not in exclude]
+        if not candidates:
+            return None
+        for _ in range(len(self.servers)):
+            server = self.servers[self.index]
+            self.index = (self.index + 1) % len(self.servers)
+            if server in candidates and self.get_health(server).available(self.slow_threshold):
+                return server
+        return min(candidates, key=lambda s: self.get_health(s).backoff_until)
+
+    async def query_server(self, server: str, domain: str) -> str:
+        """Send one WHOIS query and return the raw text, updating the server's health"""
+        health = self.get_health(server)
+        if health.bucket:
+            await health.bucket.acquire()
+        host, port = split_server(server)
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.timeout)
+            try:
+                writer.write(f"{domain}\r\n".encode())
+                await writer.drain()
+                data = await asyncio.wait_for(reader.read(), self.timeout)
+            finally:
+                writer.close()
+        except (OSError, asyncio.TimeoutError) as e:
+            health.record_error()
+            raise WhoisTransportError(f"{server}: {type(e).__name__}") from e
+
+        text = data.decode('utf-8', errors='replace')
+        lowered = text.lower()
+        if not text.strip() or any(marker in lowered for marker in THROTTLE_MARKERS):
+            health.record_error(throttled=True)
+            raise WhoisTransportError(f"{server}: throttled")
+        health.record_success(time.perf_counter() - start)
+        return text
+
+    async def lookup(self, domain: str) -> str:
+        """
+        WHOIS text for a domain from the rotation, following one referral
+        (e.g. IANA -> registry). Tries up to max_attempts servers.
+        """
+        tld = get_tld(domain)
+        tried: Set[str] = set()
+        last_error: Optional[Exception] = None
+        for _ in range(self.max_attempts):
+            server = self.next_server(tld, exclude=tried)
+            if server is None:
+                break
+            tried.add(server)
+            try:
+                text = await self.query_server(server, domain)
+                referral = find_referral(text)
+                if referral and referral != server:
+                    text = await self.query_server(referral, domain)
+                return text
+            except WhoisTransportError as e:
+                logger.debug(f"WHOIS lookup for {domain} failed: {e}")
+                last_error = e
+        raise WhoisTransportError(f"WHOIS lookup failed: {last_error or 'no server for .' + tld}")
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-server request, error, throttle and latency figures"""
+        return {server: health.to_dict() for server, health in self.health.items()}
+
+
+def find_referral(text: str) -> Optional[str]:
+    """The server a WHOIS answer refers us to (IANA 'refer:' / 'whois:' lines)"""
+    for line in text.splitlines():
+        key, _, value = line.strip().partition(':')
+        if key.lower() in ('refer', 'whois') and value.strip():
+            return value.strip()
+    return None
@@ -5,10 +5,679 @@ Test script for Domain Checker MCP
 
 import asyncio
 import json
-from domain_checker_mcp.server import DomainChecker
+import os
+import tempfile
+import time
+from pathlib import Path
 
-async def test_domain_checker():
-    """Test the domain checker functionality"""
+import pytest
+
+from benchmarks.bench_load import build_parser, run_load
+from benchmarks.stubs import StubDNSServer, StubRDAPServer, StubTLDServer, StubWhoisServer
+from domain_checker_mcp.bulk import check_domains_file, checkpoint_path, read_domains
+from domain_checker_mcp.cache import SQLiteCacheBackend, TieredCache, open_cache_backend
+from domain_checker_mcp.candidates import CandidateGenerator
+from domain_checker_mcp.delegation import DelegationChecker
+from domain_checker_mcp.normalize import get_tld, normalize_domain
+from domain_checker_mcp.rdap import RDAPClient
+from domain_checker_mcp.resolver import AdaptiveResolver
+from domain_checker_mcp.checker import DomainChecker, whois_text_registered
+from domain_checker_mcp.watchlist import Watchlist, WatchlistScheduler
+from domain_checker_mcp.whois_transport import WhoisTransport
+
+def make_offline_checker(stub: StubDNSServer, cache_dir: str, **kwargs) -> DomainChecker:
+    """DomainChecker pointed at a local stub DNS server with a throwaway cache"""
+    kwargs.setdefault('rdap_lookup', False)
+    checker = DomainChecker(nameservers=["127.0.0.1"], dns_port=stub.port,
+                            cache_dir=Path(cache_dir), **kwargs)
+    # No network WHOIS in offline tests: unknown names are treated as unregistered
+    checker.check_whois_async = fake_whois([])
+    return checker
+
+def fake_whois(calls: list):
+    """Stand-in for check_whois_async that records the domains asked about"""
+    async def check_whois_async(domain: str) -> bool:
+        calls.append(domain)
+        return False
+    return check_whois_async
+
+def test_batch_is_concurrent_and_ordered():
+    """Batch runs concurrently against the stub and keeps the result shape"""
+    registered = {f"taken{i}.com" for i in range(20)}
+    domains = sorted(registered) + [f"free{i}.com" for i in range(10)]
+    with StubDNSServer(latency=0.1, registered=registered) as stub, tempfile.TemporaryDirectory() as tmp:
+        checker = make_offline_checker(stub, tmp, max_concurrency=30, whois_rate=0)
+        loop = asyncio.new_event_loop()
+        start = loop.time()
+        results = loop.run_until_complete(checker.check_domains_batch(domains))
+        elapsed = loop.time() - start
+        loop.close()
+    
+    assert [r['domain'] for r in results['unavailable']] == sorted(registered)
+    assert len(results['available']) == 10
+    assert results['summary']['total_checked'] == 30
+    # 30 domains x up to 3 record types at 100ms each would take >3s serially
+    assert elapsed < 2
+
+def test_ttl_policy_and_negative_cache():
+    """TTLs depend on status; SERVFAIL goes to the short negative cache, never 'available'"""
+    with StubDNSServer(registered={"taken.com"}, servfail={"flaky.com"}) as stub, \
+            tempfile.TemporaryDirectory() as tmp:
+        checker = make_offline_checker(stub, tmp, whois_rate=0)
+        first = asyncio.run(checker.check_domains_batch(["taken.com", "free.com", "flaky.com"]))
+        assert [r['domain'] for r in first['errors']] == ["flaky.com"]
+        assert first['summary']['cache_hit_rate'] == 0
+        
+        # "unavailable via dns" outlives "available"
+        _, _, _, taken_ttl = checker.get_cached_result("taken.com")
+        _, _, _, free_ttl = checker.get_cached_result("free.com")
+        assert taken_ttl > 7 * 86400 > free_ttl > 0
+        assert checker.get_cached_result("flaky.com") is None
+        
+        queries = stub.queries
+        second = asyncio.run(checker.check_domains_batch(["taken.com", "free.com", "flaky.com"]))
+        assert stub.queries == queries
+        assert second['summary']['cache_hits'] == 2
+        assert second['summary']['negative_cache_hits'] == 1
+        assert second['summary']['cache_hit_rate'] == 1.0
+
+def test_unexpected_whois_failure_is_not_available(monkeypatch):
+    """A WHOIS parser crash on the sync path reports an error, never 'available'"""
+    import domain_checker_mcp.checker as checker_module
+
+    def broken_parser(domain, text):
+        raise ValueError("unexpected response layout")
+
+    with StubDNSServer(registered=set()) as stub, StubWhoisServer(registered=set()) as whois_stub, \
+            tempfile.TemporaryDirectory() as tmp:
+        transport = WhoisTransport([f"127.0.0.1:{whois_stub.port}"], rate=0)
+        checker = make_offline_checker(stub, tmp, whois_rate=0, whois_transport=transport)
+        del checker.check_whois_async  # the real lookup, against the stub
+        monkeypatch.setattr(checker_module, "whois_text_registered", broken_parser)
+        domain, status, detail = checker.check_domain("unparsed.com")
+        assert (domain, status) == ("unparsed.com", 'error')
+        assert "unexpected response layout" in detail
+        assert checker.get_cached_result("unparsed.com") is None
+
+def test_sync_whois_goes_through_the_rotation():
+    """check_domain's WHOIS stage uses the transport, so its health and backoff apply"""
+    with StubDNSServer(registered=set()) as stub, StubWhoisServer(registered={"taken.com"}) as whois_stub, \
+            tempfile.TemporaryDirectory() as tmp:
+        server = f"127.0.0.1:{whois_stub.port}"
+        checker = make_offline_checker(stub, tmp, whois_rate=0, whois_transport=WhoisTransport([server], rate=0))
+        del checker.check_whois_async
+        assert checker.check_domain("taken.com") == ("taken.com", 'unavailable', 'whois')
+        assert checker.check_domain("free.com") == ("free.com", 'available', 'none')
+        assert whois_stub.queries == 2
+        assert checker.whois_transport.stats()[server]['requests'] == 2
+
+def test_sync_check_domain_works_inside_a_running_loop():
+    """Sync check_domain can still reach WHOIS when called from async code"""
+    with StubDNSServer(registered=set()) as stub, StubWhoisServer(registered={"taken.com"}) as whois_stub, \
+            tempfile.TemporaryDirectory() as tmp:
+        checker = make_offline_checker(stub, tmp, whois_rate=0,
+                                       whois_transport=WhoisTransport([f"127.0.0.1:{whois_stub.port}"], rate=0))
+        del checker.check_whois_async
+        
+        async def run():
+            return checker.check_domain("taken.com"), checker.check_domain("free.com")
+        
+        taken, free = asyncio.run(run())
+        assert taken == ("taken.com", 'unavailable', 'whois')
+        assert free == ("free.com", 'available', 'none')
+        assert whois_stub.queries == 2
+
+def test_parallel_dns_stops_on_nxdomain():
+    """All record types go out at once, and a fast NXDOMAIN cancels the slow ones"""
+    with StubDNSServer(registered=set(), type_latency={'A': 1.0, 'AAAA': 1.0}) as stub, \
+            tempfile.TemporaryDirectory() as tmp:
+        checker = make_offline_checker(stub, tmp, whois_rate=0)
+        timings = {}
+        start = time.perf_counter()
+        assert asyncio.run(checker.check_dns_async("nothing.com", timings)) is False
+        assert time.perf_counter() - start < 0.5
+        assert timings['MX']['result'] == 'nxdomain'
+        assert timings['A']['result'] == timings['AAAA']['result'] == 'cancelled'
+
+def test_delegation_check_skips_whois_for_parked_domains():
+    """A name with NS at the registry but no working records is unavailable without WHOIS"""
+    with StubDNSServer(registered={"taken.com"}, servfail={"parked.com"}) as stub, \
+            StubTLDServer(delegated={"taken.com", "parked.com"}) as tld, \
+            tempfile.TemporaryDirectory() as tmp:
+        delegation = DelegationChecker(tld_servers={"com": ["127.0.0.1"]}, port=tld.port)
+        checker = make_offline_checker(stub, tmp, whois_rate=0, delegation=delegation)
+        whois_calls = []
+        checker.check_whois_async = fake_whois(whois_calls)
+        
+        results = asyncio.run(checker.check_domains_batch(["taken.com", "parked.com", "free.com"]))
+        assert [(r['domain'], r['method']) for r in results['unavailable']] == \
+            [("taken.com", "dns"), ("parked.com", "ns")]
+        assert [r['domain'] for r in results['available']] == ["free.com"]
+        # free.com got NXDOMAIN from the resolver, so only WHOIS was left to ask
+        assert whois_calls == ["free.com"]
+        assert tld.queries == 1
+
+def test_rdap_stage_with_whois_fallback():
+    """RDAP answers for TLDs it serves over one pooled connection; other TLDs use WHOIS"""
+    with StubDNSServer(registered=set()) as stub, \
+            StubRDAPServer(registered={"taken.com"}, throttled={"busy.com"},
+                           unexpected={"odd.com"}) as rdap_stub, \
+            tempfile.TemporaryDirectory() as tmp:
+        rdap = RDAPClient(base_urls={"com": rdap_stub.base_url})
+        checker = make_offline_checker(stub, tmp, whois_rate=0, max_concurrency=1,
+                                       rdap=rdap, delegation_check=False)
+        whois_calls = []
+        checker.check_whois_async = fake_whois(whois_calls)
+        
+        domains = ["taken.com", "free.com", "busy.com", "odd.com", "other.xyz"]
+        results = asyncio.run(checker.check_domains_batch(domains))
+        assert [(r['domain'], r['method']) for r in results['unavailable']] == [("taken.com", "rdap")]
+        assert [r['domain'] for r in results['available']] == ["free.com", "odd.com", "other.xyz"]
+        assert [r['domain'] for r in results['errors']] == ["busy.com"]
+        # A 200 that isn't a domain object is not taken as "available": WHOIS is asked instead
+        assert whois_calls == ["odd.com", "other.xyz"]
+        assert rdap_stub.requests == 4
+        assert rdap_stub.connections == 1
+        
+        # The pool is closed with the loop that owns it, not leaked when a new loop takes over
+        assert rdap.client is None
+        asyncio.run(checker.check_domains_batch(["another.com"]))
+        assert rdap_stub.connections == 2
+        asyncio.run(rdap.close())
+
+def test_whois_rotation_routes_around_throttled_server():
+    """Lookups go to the rotation's servers; a throttling server is rested"""
+    with StubWhoisServer(registered={"taken.com"}, throttle=True) as bad, \
+            StubWhoisServer(registered={"taken.com"}) as good:
+        bad_name, good_name = f"127.0.0.1:{bad.port}", f"127.0.0.1:{good.port}"
+        transport = WhoisTransport([bad_name, good_name], rate=0)
+        
+        async def lookups():
+            return [whois_text_registered(d, await transport.lookup(d))
+                    for d in ["taken.com", "free.com", "taken.com", "free.com"]]
+        
+        assert asyncio.run(lookups()) == [True, False, True, False]
+        assert bad.queries == 1
+        assert good.queries == 4
+        stats = transport.stats()
+        assert stats[bad_name]['throttled'] == 1 and stats[bad_name]['backoff_remaining'] > 0
+        assert stats[good_name]['errors'] == 0 and stats[good_name]['latency_ms'] is not None
+
+def test_check_domains_streams_progress():
+    """check_domains sends one progress notification per domain and can skip the JSON section"""
+    from mcp.shared.memory import create_connected_server_and_client_session
+    from domain_checker_mcp import server
+    
+    domains = [f"d{i}.com" for i in range(5)]
+    with StubDNSServer(registered=set(domains[:3])) as stub, tempfile.TemporaryDirectory() as tmp:
+        original, server.checker = server.checker, make_offline_checker(stub, tmp, whois_rate=0)
+        progress, logged = [], []
+        
+        async def on_progress(done, total, message):
+            progress.append((done, total))
+        
+        async def on_log(params):
+            logged.append(params.data['domain'])
+        
+        async def call():
+            async with create_connected_server_and_client_session(server.app, logging_callback=on_log) as client:
+                return await client.call_tool("check_domains", {"domains": domains, "include_json": False},
+                                              progress_callback=on_progress)
+        try:
+            result = asyncio.run(call())
+        finally:
+            server.checker = original
+    
+    text = result.content[0].text
+    assert "AVAILABLE (2 domains)" in text and "Full Results (JSON)" not in text
+    assert progress == [(i, 5) for i in range(1, 6)]
+    assert sorted(logged) == domains
+
+def test_generate_and_check_skips_cached_and_stops_early():
+    """Candidates are generated lazily, invalid labels dropped, cached names not looked up"""
+    generator = CandidateGenerator(["rocket", "-bad", "Rocket"], ["com", "io"], suffixes=["hq", "x" * 63])
+    names = list(generator)
+    assert names == ["rocket.com", "rocket.io", "rockethq.com", "rockethq.io"]
+    assert generator.invalid == 10 and generator.duplicates == 4
+    
+    # TLDs are cleaned up and IDNA-encoded; ones that can't be a TLD are reported, not used
+    generator = CandidateGenerator(["rocket"], [".IO", "рф", "c_m", "123", "Co.UK.", "io", "a..b"])
+    assert list(generator) == ["rocket.io", "rocket.xn--p1ai", "rocket.co.uk"]
+    assert sorted(generator.invalid_tlds) == ["123", "a..b", "c_m"]
+    
+    with StubDNSServer(registered={"rocket.com"}) as stub, tempfile.TemporaryDirectory() as tmp:
+        checker = make_offline_checker(stub, tmp, whois_rate=0, max_concurrency=1)
+        checker.cache_result("rocket.io", "unavailable", "whois")
+        
+        generator = CandidateGenerator(["rocket", "nimbus"], ["com", "io"], suffixes=["hq"])
+        results = asyncio.run(checker.check_candidates(generator, max_available=2))
+        summary = results['summary']
+        assert [r['domain'] for r in results['available']] == ["rockethq.com", "rockethq.io"]
+        assert summary['stopped_early'] and summary['from_cache'] == 1
+        assert summary['network_checked'] == 3
+        # Each candidate is looked up in the cache once
+        assert checker.metrics.counter('cache_lookups_total', result='hit') == 1
+        assert checker.metrics.counter('cache_lookups_total', result='miss') == 3
+        # Nothing from "nimbus" was generated once two names were found
+        assert generator.generated == 4
+
+def test_check_domains_file_resumes_after_interruption():
+    """Results stream to disk in input order; an interrupted run resumes from its checkpoint"""
+    domains = [f"d{i}.com" for i in range(50)]
+    with StubDNSServer(registered=set(domains[::2])) as stub, tempfile.TemporaryDirectory() as tmp:
+        input_path, output_path = Path(tmp) / "domains.csv", Path(tmp) / "results.jsonl"
+        input_path.write_text("id,domain\n" + "".join(f"{i},{d}\n" for i, d in enumerate(domains)))
+        assert list(read_domains(input_path)) == domains
+        
+        async def interrupted():
+            checker = make_offline_checker(stub, tmp, whois_rate=0, max_concurrency=4)
+            seen = asyncio.Event()
+            
+            async def on_result(detail):
+                if detail['domain'] == "d25.com":
+                    seen.set()
+            
+            task = asyncio.create_task(check_domains_file(checker, input_path, output_path,
+                                                          checkpoint_every=10, on_result=on_result))
+            await seen.wait()
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        
+        asyncio.run(interrupted())
+        assert json.loads(checkpoint_path(output_path).read_text())['processed'] == 20
+        
+        # Fresh cache so the resumed run really looks names up again
+        checker = make_offline_checker(stub, Path(tmp) / "second", whois_rate=0, max_concurrency=4)
+        summary = asyncio.run(check_domains_file(checker, input_path, output_path, checkpoint_every=10))
+        assert summary['resumed_from'] == 20 and summary['checked_this_run'] == 30
+        assert summary['available_count'] == 25 and summary['unavailable_count'] == 25
+        assert not checkpoint_path(output_path).exists()
+        
+        records = [json.loads(line) for line in output_path.read_text().splitlines()]
+        assert [r['domain'] for r in records] == domains
+
+def check_in_process(port: int, cache_dir: str, kind: str, domains: list) -> int:
+    """Run one checker process against a shared cache; returns how many names it had to look up"""
+    backend = open_cache_backend(Path(cache_dir), kind)
+    stub = type("Stub", (), {"port": port})()
+    checker = make_offline_checker(stub, cache_dir, whois_rate=0, cache_backend=backend,
+                                   delegation_check=False)
+    results = asyncio.run(checker.check_domains_batch(domains))
+    return results['summary']['total_checked'] - results['summary']['cache_hits']
+
+def test_cache_is_shared_between_processes():
+    """Concurrent processes on overlapping domains lose no writes and see each other's results"""
+    import multiprocessing
+    
+    domains = [f"shared{i}.com" for i in range(120)]
+    registered = set(domains[::3])
+    # Four processes, each overlapping half of its range with the next
+    chunks = [domains[i * 30:i * 30 + 60] for i in range(4)]
+    context = multiprocessing.get_context("spawn")
+    for kind in ("sqlite", "json"):
+        with StubDNSServer(registered=registered) as stub, tempfile.TemporaryDirectory() as tmp:
+            with context.Pool(4) as pool:
+                pool.starmap(check_in_process, [(stub.port, tmp, kind, chunk) for chunk in chunks])
+            
+            backend = open_cache_backend(Path(tmp), kind)
+            assert len(backend) == len(domains), kind
+            for domain in domains:
+                expected = "unavailable" if domain in registered else "available"
+                assert backend.get(domain)['status'] == expected, (kind, domain)
+            backend.close()
+            
+            # Everything one process found is an instant hit in another
+            queries = stub.queries
+            with context.Pool(1) as pool:
+                assert pool.apply(check_in_process, (stub.port, tmp, kind, domains)) == 0
+            assert stub.queries == queries
+
+def test_checker_stats_reports_stage_latencies():
+    """Per-stage histograms, hit ratio and the Prometheus export are filled in by a batch"""
+    from mcp.shared.memory import create_connected_server_and_client_session
+    from domain_checker_mcp import server
+    
+    domains = [f"m{i}.com" for i in range(20)]
+    with StubDNSServer(registered=set(domains[:10]), latency=0.01) as stub, tempfile.TemporaryDirectory() as tmp:
+        metrics_file = Path(tmp) / "domain_checker.prom"
+        checker = make_offline_checker(stub, tmp, whois_rate=0, delegation_check=False,
+                                       metrics_file=str(metrics_file))
+        asyncio.run(checker.check_domains_batch(domains))
+        asyncio.run(checker.check_domains_batch(domains))
+        
+        stages = {(h['name'], h['labels'].get('rdtype')): h for h in checker.metrics.snapshot()['histograms']}
+        assert stages[('dns_query_seconds', 'A')]['count'] >= 10
+        assert stages[('dns_query_seconds', 'A')]['p50_ms'] >= 10
+        assert stages[('whois_seconds', None)]['count'] == 10
+        assert stages[('cache_save_seconds', None)]['count'] == 20
+        assert checker.cache_hit_ratio() == 0.5
+        
+        prom = metrics_file.read_text()
+        assert 'domain_checker_dns_query_seconds_bucket{rdtype="A",le="+Inf"}' in prom
+        assert 'domain_checker_cache_lookups_total{result="hit"} 20' in prom
+        
+        original, server.checker = server.checker, checker
+        
+        async def call():
+            async with create_connected_server_and_client_session(server.app) as client:
+                return await client.call_tool("checker_stats", {})
+        try:
+            text = asyncio.run(call()).content[0].text
+        finally:
+            server.checker = original
+    assert "dns_query [rdtype=A]" in text and "p99" in text
+    assert "Hit ratio: 50%" in text
+
+LAZY_START_SCRIPT = """
+import asyncio, sys
+from mcp.shared.memory import create_connected_server_and_client_session
+from domain_checker_mcp import server
+
+async def handshake():
+    async with create_connected_server_and_client_session(server.app) as client:
+        return len((await client.list_tools()).tools)
+
+assert asyncio.run(handshake()) > 0
+heavy = [m for m in ('dns.resolver', 'whois', 'domain_checker_mcp.checker') if m in sys.modules]
+assert not heavy and server.checker is None, heavy
+print("ok")
+"""
+
+def test_server_lists_tools_without_loading_checker():
+    """The handshake and tool listing don't import dnspython/python-whois or open the cache"""
+    import subprocess
+    import sys
+
+    with tempfile.TemporaryDirectory() as home:
+        result = subprocess.run([sys.executable, "-c", LAZY_START_SCRIPT], capture_output=True, text=True,
+                                cwd=Path(__file__).parent, env=dict(os.environ, HOME=home), timeout=60)
+        assert result.stdout.strip() == "ok", result.stderr
+        assert not (Path(home) / ".domain_checker_cache").exists()
+
+def test_first_call_builds_checker_off_the_event_loop(monkeypatch):
+    """While the first tool calls wait for the checker to load, the event loop keeps running"""
+    from mcp.shared.memory import create_connected_server_and_client_session
+    from domain_checker_mcp import server
+    import domain_checker_mcp.checker as checker_module
+    
+    with StubDNSServer(registered=set()) as stub, tempfile.TemporaryDirectory() as tmp:
+        built = []
+        
+        def slow_checker():
+            time.sleep(0.5)  # stands in for imports, SQLite and a large cache import
+            built.append(make_offline_checker(stub, tmp, whois_rate=0))
+            return built[-1]
+        
+        monkeypatch.setattr(checker_module, "DomainChecker", slow_checker)
+        monkeypatch.setattr(server, "checker", None)
+        monkeypatch.setattr(server, "checker_loading", None)
+        
+        async def call():
+            gaps, ticking = [], True
+            
+            async def ticker():
+                last = time.perf_counter()
+                while ticking:
+                    await asyncio.sleep(0.01)
+                    now = time.perf_counter()
+                    gaps.append(now - last)
+                    last = now
+            
+            tick = asyncio.create_task(ticker())
+            async with create_connected_server_and_client_session(server.app) as client:
+                results = await asyncio.gather(*(client.call_tool("whois_server_stats", {}) for _ in range(2)))
+            ticking = False
+            await tick
+            return results, max(gaps)
+        
+        results, longest_gap = asyncio.run(call())
+    assert all(not result.isError for result in results)
+    assert len(built) == 1 and server.checker is built[0]
+    assert longest_gap < 0.25
+
+def test_failed_checker_build_is_reported_and_retried(monkeypatch):
+    """A checker that fails to build comes back as a tool error, and unknown tools don't build it"""
+    from mcp.shared.memory import create_connected_server_and_client_session
+    from domain_checker_mcp import server
+    import domain_checker_mcp.checker as checker_module
+    
+    with StubDNSServer(registered=set()) as stub, tempfile.TemporaryDirectory() as tmp:
+        attempts = []
+        
+        def flaky_checker():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OSError("cache file is corrupt")
+            return make_offline_checker(stub, tmp, whois_rate=0)
+        
+        monkeypatch.setattr(checker_module, "DomainChecker", flaky_checker)
+        monkeypatch.setattr(server, "checker", None)
+        monkeypatch.setattr(server, "checker_loading", None)
+        
+        async def call():
+            async with create_connected_server_and_client_session(server.app) as client:
+                unknown = await client.call_tool("no_such_tool", {})
+                failed = await client.call_tool("whois_server_stats", {})
+                retried = await client.call_tool("whois_server_stats", {})
+            return unknown, failed, retried
+        
+        unknown, failed, retried = asyncio.run(call())
+    assert "Unknown tool: no_such_tool" in unknown.content[0].text
+    assert "cache file is corrupt" in failed.content[0].text
+    assert "WHOIS Server Stats" in retried.content[0].text
+    assert len(attempts) == 2
+
+def test_adaptive_resolver_races_and_learns_timeouts():
+    """A lossy fast resolver raced against a slow one: answers stay fast and timeouts shrink"""
+    import dns.resolver
+    
+    with StubDNSServer(latency=0.25, registered={f"r{i}.com" for i in range(40)}) as slow:
+        with StubDNSServer(host="127.0.0.2", port=slow.port, latency=0.002, loss=0.2, seed=1,
+                           registered=slow.registered) as fast:
+            resolver = AdaptiveResolver(["127.0.0.1", "127.0.0.2"], port=slow.port, initial_timeout=1.0)
+            
+            async def run():
+                elapsed = []
+                for i in range(40):
+                    start = time.perf_counter()
+                    answer = await resolver.resolve(f"r{i}.com", 'A')
+                    elapsed.append(time.perf_counter() - start)
+                    assert str(answer[0]) == "127.0.0.1"
+                try:
+                    await resolver.resolve("missing.com", 'A')
+                    raise AssertionError("expected NXDOMAIN")
+                except dns.resolver.NXDOMAIN:
+                    pass
+                return elapsed
+            
+            elapsed = asyncio.run(run())
+            stats = resolver.nameserver_stats()
+    
+    assert fast.dropped > 0
+    # A dropped packet costs at most the slow resolver's answer, never a fixed 5s timeout
+    assert max(elapsed) < 0.5
+    assert stats["127.0.0.2"]['wins'] > stats["127.0.0.1"]['wins']
+    assert stats["127.0.0.2"]['timeout_ms'] < 1000
+
+def test_batch_normalizes_and_merges_duplicate_inputs():
+    """URLs, www., trailing dots, case and Unicode spellings of a name share one lookup"""
+    assert normalize_domain("https://www.Example.com/pricing?x=1") == "example.com"
+    assert normalize_domain("shop.example.co.uk.") == "example.co.uk"
+    assert normalize_domain("bücher.de") == "xn--bcher-kva.de"
+    # One TLD helper for the RDAP, WHOIS and delegation stages
+    assert get_tld("Example.COM.") == "com"
+    assert get_tld("пример.рф") == get_tld("example.xn--p1ai") == "xn--p1ai"
+    
+    inputs = ["https://www.Example.com/pricing", "example.com.", "EXAMPLE.COM", "bücher.de",
+              "xn--bcher-kva.de", "co.uk", "bad_name.com"]
+    with StubDNSServer(registered={"example.com"}) as stub, tempfile.TemporaryDirectory() as tmp:
+        checker = make_offline_checker(stub, tmp, whois_rate=0, delegation_check=False)
+        results = asyncio.run(checker.check_domains_batch(inputs))
+    
+    summary = results['summary']
+    assert summary['total_checked'] == 2 and summary['duplicates_merged'] == 3
+    assert [r['domain'] for r in results['unavailable']] == ["example.com"]
+    assert [r['domain'] for r in results['available']] == ["xn--bcher-kva.de"]
+    assert sorted(r['domain'] for r in results['errors']) == ["bad_name.com", "co.uk"]
+    assert results['normalized'] == {"https://www.Example.com/pricing": "example.com",
+                                     "example.com.": "example.com", "EXAMPLE.COM": "example.com",
+                                     "bücher.de": "xn--bcher-kva.de"}
+
+def test_overlapping_batches_share_inflight_lookups():
+    """Two overlapping calls for the same names run one lookup each; cancelling one caller doesn't hurt the other"""
+    domains = [f"dup{i}.com" for i in range(10)]
+    with StubDNSServer(registered=set(domains[:5]), latency=0.05) as stub, tempfile.TemporaryDirectory() as tmp:
+        whois_calls = []
+        checker = make_offline_checker(stub, tmp, whois_rate=0, delegation_check=False)
+        checker.check_whois_async = fake_whois(whois_calls)
+
+        async def overlapping():
+            first = asyncio.create_task(checker.check_domains_batch(domains))
+            await asyncio.sleep(0.01)
+            second = asyncio.create_task(checker.check_domains_batch([d.upper() for d in domains]))
+            return await first, await second
+
+        first, second = asyncio.run(overlapping())
+        single_run_queries = stub.queries
+        assert sorted(whois_calls) == domains[5:]
+        for results in (first, second):
+            assert sorted(r['domain'] for r in results['unavailable']) == domains[:5]
+            assert results['summary']['error_count'] == 0
+        assert checker.inflight.stats() == {'started': 10, 'shared': 10, 'in_flight': 0}
+        assert checker.metrics.counter('lookups_shared_total') == 10
+
+        async def cancel_one():
+            leader = asyncio.create_task(checker.check_domain_detailed("solo.com", refresh=True))
+            follower = asyncio.create_task(checker.check_domain_detailed("solo.com", refresh=True))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await follower
+
+        assert asyncio.run(cancel_one())['status'] == 'available'
+        assert checker.inflight.stats()['started'] == 11
+    assert single_run_queries <= 10 * 3
+
+def test_watchlist_refreshes_and_notifies_when_available():
+    """Watched names are re-checked before their TTL runs out and freed names raise a notification"""
+    registered = {"w0.com", "w1.com"}
+    with StubDNSServer(registered=registered) as stub, tempfile.TemporaryDirectory() as tmp:
+        checker = make_offline_checker(stub, tmp, whois_rate=0, delegation_check=False)
+        watchlist = Watchlist(Path(tmp) / "watchlist.sqlite3")
+        notified = []
+        
+        async def listener(event):
+            notified.append(event)
+        
+        scheduler = WatchlistScheduler(checker, watchlist, rate=0, listeners=[listener])
+        
+        async def run():
+            result = scheduler.add(["https://w0.com/", "w1.com", "w2.com", "w1.com", "not a domain"])
+            assert result['added'] == ["w0.com", "w1.com", "w2.com"] and result['existing'] == ["w1.com"]
+            assert await scheduler.run_due() == 3
+            # Nothing is due again until most of the TTL has passed
+            assert await scheduler.run_due() == 0
+            
+            entries = {e['domain']: e for e in watchlist.entries()}
+            assert entries["w0.com"]['last_status'] == "unavailable"
+            assert entries["w2.com"]['last_status'] == "available"
+            # "available" answers live for an hour: re-checked after ~48 minutes
+            assert 0.7 * 3600 < entries["w2.com"]['next_check'] - time.time() < 0.9 * 3600
+            # Interactive checks of watched names are served from the cache
+            assert (await checker.check_domain_detailed("w0.com"))['cached']
+            
+            registered.discard("w0.com")
+            assert await scheduler.run_due(now=time.time() + 30 * 24 * 3600) == 3
+        
+        asyncio.run(run())
+        assert [(e['domain'], e['new_status']) for e in notified] == [("w0.com", "available")]
+        assert watchlist.events()[0]['domain'] == "w0.com"
+        assert checker.get_cached_result("w0.com")[1] == "available"
+        # Slow buckets claim only what they can start before the lease expires
+        assert [WatchlistScheduler(checker, watchlist, rate=r).claim_limit(100) for r in (0, 0.1, 0.001)] == [100, 15, 1]
+        watchlist.close()
+
+def test_sqlite_cache_imports_json_and_compacts():
+    """Legacy JSON cache is imported once, and expired rows are compacted away"""
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = Path(tmp) / "domain_cache.json"
+        json_path.write_text(json.dumps({
+            "old.com": {"status": "unavailable", "method": "dns", "timestamp": "2020-01-01T00:00:00"},
+            "fresh.com": {"status": "available", "method": "none", "timestamp": "2999-01-01T00:00:00"},
+        }))
+        backend = SQLiteCacheBackend(Path(tmp) / "cache.sqlite3", import_json=json_path)
+        assert len(backend) == 2
+        assert backend.get("fresh.com")['status'] == "available"
+        
+        # A second start does not re-import
+        json_path.write_text(json.dumps({"other.com": {"status": "available", "method": "none",
+                                                        "timestamp": "2999-01-01T00:00:00"}}))
+        assert backend.import_json(json_path) == 0
+        
+        assert backend.compact() == 1
+        assert backend.get("old.com") is None
+        backend.close()
+
+def test_tiered_cache_lru_counters():
+    """The in-memory tier is bounded, filled on demand, and counts hits/misses/evictions"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteCacheBackend(Path(tmp) / "cache.sqlite3")
+        entry = {'status': 'unavailable', 'method': 'dns', 'timestamp': '2999-01-01T00:00:00',
+                 'expires_at': 32503680000.0}
+        for i in range(5):
+            store.set(f"d{i}.com", entry)
+        
+        cache = TieredCache(store, maxsize=2)
+        assert cache.stats()['size'] == 0
+        cache.get("d0.com")
+        cache.get("d1.com")
+        cache.get("d0.com")
+        cache.get("d2.com")  # evicts d1.com, the least recently used
+        assert cache.get("missing.com") is None
+        stats = cache.stats()
+        # Each lookup is counted once, by the tier that answered it
+        assert stats == {'size': 2, 'maxsize': 2, 'hits': 1, 'misses': 1, 'store_hits': 3, 'evictions': 1}
+        assert list(cache.memory) == ["d0.com", "d2.com"]
+        store.close()
+
+def test_tiered_cache_rereads_store_after_max_age():
+    """A result another process writes to the shared store replaces the in-memory copy within max_age"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cache.sqlite3"
+        store, other = SQLiteCacheBackend(path), SQLiteCacheBackend(path)
+        available = {'status': 'available', 'method': 'none', 'timestamp': '2999-01-01T00:00:00',
+                     'expires_at': time.time() + 3600}
+        store.set("fresh.com", available)
+        
+        cache = TieredCache(store, maxsize=10, max_age=0.05)
+        assert cache.get("fresh.com")['status'] == 'available'
+        other.set("fresh.com", dict(available, status='unavailable', method='dns'))
+        assert cache.get("fresh.com")['status'] == 'available'  # still within max_age
+        time.sleep(0.06)
+        assert cache.get("fresh.com")['status'] == 'unavailable'
+        assert (cache.stats()['hits'], cache.stats()['store_hits']) == (1, 2)
+        store.close()
+        other.close()
+
+def test_load_harness_answers_correctly_and_warms_cache():
+    args = build_parser().parse_args(["--dns-latency", "0.001", "--rdap-latency", "0.001",
+                                      "--whois-latency", "0.001", "--concurrency", "50"])
+    (report,) = run_load([300], args)
+
+    assert report['cold']['wrong'] == 0 and report['cold']['errors'] == 0
+    assert report['cold']['cache_hit_rate'] == 0
+    # Every stage was exercised
+    assert all(stage['count'] for stage in report['cold']['latency'].values())
+    # The second pass is served entirely from the cache
+    assert report['warm']['cache_hit_rate'] == 1.0
+    assert report['warm']['wrong'] == 0 and report['warm']['errors'] == 0
+
+@pytest.mark.skipif(os.environ.get("DOMAIN_CHECKER_LIVE_TESTS") != "1",
+                    reason="queries real DNS/WHOIS; set DOMAIN_CHECKER_LIVE_TESTS=1")
+def test_domain_checker_live():
+    asyncio.run(live_domain_checker())
+
+async def live_domain_checker():
+    """Test the domain checker functionality against real DNS and WHOIS"""
     print("=== Domain Checker Test ===\n")
     
     checker = DomainChecker()
@@ -83,4 +752,4 @@ async def test_domain_checker():
     print("\n\n✅ Full results saved to test_results.json")
 
 if __name__ == "__main__":
-    asyncio.run(test_domain_checker())
\ No newline at end of file
+    asyncio.run(live_domain_checker())
\ No newline at end of file
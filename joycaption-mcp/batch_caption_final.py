@@ -5,6 +5,7 @@ Final batch caption generator for JoyCaption
 - Avatar name support
 - Multiple caption modes
 - Reliable and fast
+- Images are decoded and preprocessed on worker threads ahead of the model
 """
 
 import os
@@ -18,6 +19,8 @@ from tqdm import tqdm
 import argparse
 import time
 
+from joycaption_mcp.pipeline import prefetch
+
 # Supported image extensions
 IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tiff', '.tif'}
 
@@ -59,6 +62,10 @@ class JoyCaptionBatch:
         
     def generate_caption(self, image_path, mode="training", avatar_name=None, extra_options=None):
         """Generate caption for a single image"""
+        return self.generate_from_inputs(self.prepare_inputs(image_path, mode, avatar_name, extra_options))
+    
+    def prepare_inputs(self, image_path, mode="training", avatar_name=None, extra_options=None):
+        """Load an image and build the model inputs for it (CPU tensors; safe to run on worker threads)"""
         # Load image
         image = Image.open(image_path).convert("RGB")
         
@@ -111,13 +118,17 @@ class JoyCaptionBatch:
             add_generation_prompt=True
         )
         
-        # Process inputs
-        inputs = self.processor(
+        # Process inputs (no padding or truncation, so the tokenizer is never reconfigured
+        # and several threads can do this at once)
+        return self.processor(
             text=[convo_string],
             images=[image],
             return_tensors="pt"
-        ).to(self.device)
-        
+        )
+    
+    def generate_from_inputs(self, inputs):
+        """Run the model on inputs from prepare_inputs"""
+        inputs = inputs.to(self.device)
         if self.device == "cuda":
             inputs['pixel_values'] = inputs['pixel_values'].to(torch.bfloat16)
         
@@ -179,6 +190,10 @@ def main():
     parser.add_argument("--dry-run", action="store_true", help="Show what would be processed without actually doing it")
     parser.add_argument("--skip-existing", action="store_true", default=True, help="Skip images that already have JSON files (default: True)")
     parser.add_argument("--overwrite", action="store_true", help="Overwrite existing JSON files")
+    parser.add_argument("--prefetch", type=int, default=4,
+                       help="Images to decode and preprocess ahead of the model (default: 4, 0 to disable)")
+    parser.add_argument("--workers", type=int, default=2,
+                       help="Threads for decoding and preprocessing (default: 2)")
     
     args = parser.parse_args()
     
@@ -245,21 +260,29 @@ def main():
     print(f"\nProcessing {len(images)} images...")
     successful = 0
     failed = 0
+    model_time = 0.0
+    run_start = time.time()
+    
+    # Decode and preprocess upcoming images while the model captions the current one
+    prepared = prefetch(
+        lambda path: captioner.prepare_inputs(path, mode=args.mode, avatar_name=avatar_name,
+                                              extra_options=args.extra_options),
+        images, workers=args.workers, lookahead=args.prefetch
+    )
     
-    with tqdm(images, desc="Generating captions") as pbar:
-        for img_path in pbar:
+    with tqdm(prepared, total=len(images), desc="Generating captions") as pbar:
+        for img_path, inputs, error in pbar:
             pbar.set_description(f"Processing {img_path.name}")
             
             try:
+                if error is not None:
+                    raise error
+                
                 # Generate caption
                 start_time = time.time()
-                caption = captioner.generate_caption(
-                    img_path, 
-                    mode=args.mode, 
-                    avatar_name=avatar_name,
-                    extra_options=args.extra_options
-                )
+                caption = captioner.generate_from_inputs(inputs)
                 elapsed = time.time() - start_time
+                model_time += elapsed
                 
                 # Save to JSON
                 json_path = img_path.with_suffix('.json')
@@ -298,7 +321,10 @@ def main():
         print(f"✗ Failed: {failed} images")
     print(f"Avatar name used: {avatar_name or 'None (generic descriptions)'}")
     print(f"Caption mode: {args.mode}")
-    print(f"Total time: {time.strftime('%H:%M:%S', time.gmtime(time.time()))}")
+    total_time = time.time() - run_start
+    print(f"Total time: {time.strftime('%H:%M:%S', time.gmtime(total_time))}")
+    if total_time > 0:
+        print(f"Model busy: {100 * model_time / total_time:.0f}% of the time")
     print(f"{'='*60}")
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark caption throughput and latency with and without batching
+
+Fires --requests concurrent caption requests at the server's inference
+worker, as an agent captioning a folder in parallel would, and repeats the
+run for each --batch-sizes value (JOYCAPTION_MAX_BATCH). By default the
+model is a small randomly initialised BLIP built in a temporary directory,
+so the benchmark needs no download; pass --model to use a real one:
+
+    python benchmarks/bench_batching.py
+    python benchmarks/bench_batching.py --batch-sizes 1 8 --requests 32 --max-tokens 30
+    python benchmarks/bench_batching.py --model git:microsoft/git-base --json batching.json
+
+A random model never emits its end token, so every caption runs to
+--max-tokens and runs are comparable.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image
+
+from joycaption_mcp.inference import CaptionJob, InferenceWorker
+from joycaption_mcp.model import ModelManager, parse_model_spec
+from joycaption_mcp.server import CAPTION_MODES, JoyCaptionServer
+
+WORDS = ("a an the image of with in on describe this detail what is be concise and factual "
+         "photo red blue green circle square house sky tree art pattern").split()
+
+
+def build_blip(path: Path, hidden: int, layers: int, image_size: int):
+    """Save a randomly initialised BLIP captioning model and processor to `path`"""
+    from transformers import (BertTokenizer, BlipConfig, BlipForConditionalGeneration,
+                              BlipImageProcessor, BlipProcessor)
+
+    path.mkdir(parents=True, exist_ok=True)
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS + [chr(c) for c in range(97, 123)]
+    (path / "vocab.txt").write_text("\n".join(vocab))
+    processor = BlipProcessor(BlipImageProcessor(size={"height": image_size, "width": image_size}),
+                              BertTokenizer(str(path / "vocab.txt")))
+    heads = max(1, hidden // 64)
+    config = BlipConfig(
+        text_config=dict(vocab_size=len(vocab), hidden_size=hidden, num_hidden_layers=layers,
+                         num_attention_heads=heads, intermediate_size=hidden * 4,
+                         bos_token_id=2, sep_token_id=3, pad_token_id=0),
+        vision_config=dict(hidden_size=hidden, num_hidden_layers=layers, num_attention_heads=heads,
+                           intermediate_size=hidden * 4, image_size=image_size, patch_size=16),
+        projection_dim=hidden,
+    )
+    processor.save_pretrained(path)
+    BlipForConditionalGeneration(config).save_pretrained(path)
+
+
+def make_images(count: int, size: int) -> List[Image.Image]:
+    colors = ["red", "green", "blue", "yellow", "purple", "orange", "white", "gray"]
+    return [Image.new("RGB", (size, size), colors[i % len(colors)]) for i in range(count)]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+async def run_once(server: JoyCaptionServer, models: ModelManager, images: List[Image.Image],
+                   max_batch: int, args) -> Dict[str, float]:
+    """Submit every image at once and time each caption from submit to result"""
+    worker = InferenceWorker(models, server.generate_captions, max_queue=len(images),
+                             max_batch=max_batch, batch_window=args.window / 1000)
+    prompt = CAPTION_MODES[args.mode]
+    latencies = []
+
+    async def one(image):
+        job = CaptionJob(image, prompt, args.mode, 0.6, 0.9, args.max_tokens)
+        start = time.perf_counter()
+        await worker.submit(job)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(image) for image in images))
+    elapsed = time.perf_counter() - start
+    status = worker.status()
+    await worker.stop()
+    return {
+        'max_batch': max_batch,
+        'captions_per_second': round(len(images) / elapsed, 2),
+        'latency_p50_ms': round(statistics.median(latencies) * 1000),
+        'latency_p95_ms': round(percentile(latencies, 0.95) * 1000),
+        'average_batch_size': status['average_batch_size'],
+        'seconds': round(elapsed, 2),
+    }
+
+
+async def bench(args) -> List[Dict[str, float]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.model:
+            candidate = parse_model_spec(args.model)
+        else:
+            path = Path(tmp) / "blip"
+            build_blip(path, args.hidden, args.layers, args.image_size)
+            candidate = ("blip", str(path))
+        models = ModelManager(candidates=[candidate], pinned=True)
+        async with models.use():
+            print(f"Model: {models.model_name} ({models.model_type}) on {models.device}")
+        server = JoyCaptionServer()
+        images = make_images(args.requests, args.image_size)
+
+        # Warm up allocations and kernels so the first measured run isn't penalised
+        await run_once(server, models, images[:2], 2, args)
+        results = []
+        for max_batch in args.batch_sizes:
+            runs = [await run_once(server, models, images, max_batch, args) for _ in range(args.runs)]
+            result = min(runs, key=lambda r: r['seconds'])
+            results.append(result)
+            print(f"max_batch={max_batch:<3} {result['captions_per_second']:>7} captions/s   "
+                  f"p50 {result['latency_p50_ms']:>6}ms   p95 {result['latency_p95_ms']:>6}ms   "
+                  f"avg batch {result['average_batch_size']}")
+        return results
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=16, help="concurrent caption requests per run")
+    parser.add_argument("--runs", type=int, default=3, help="runs per batch size (best is reported)")
+    parser.add_argument("--max-tokens", type=int, default=20)
+    parser.add_argument("--mode", choices=sorted(CAPTION_MODES), default="descriptive")
+    parser.add_argument("--window", type=float, default=20, help="batch window in milliseconds")
+    parser.add_argument("--model", help="type:name of a real model instead of the random one")
+    parser.add_argument("--hidden", type=int, default=256, help="random model hidden size")
+    parser.add_argument("--layers", type=int, default=4, help="random model layers (vision and text)")
+    parser.add_argument("--image-size", type=int, default=224)
+    parser.add_argument("--json", help="write results to this file")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    results = asyncio.run(bench(args))
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark how busy the model stays while captioning a folder of large images
+
+Writes --images large PNGs (random noise, so they compress badly and are
+slow to decode, like big photos), then captions them with caption_directory
+twice:
+
+- inline: images are decoded off the event loop, but the processor (resize
+  and normalise) runs on the inference thread, so the model waits for it
+  (the behaviour before the prefetch pipeline)
+- prefetch: decode and processor both run on the decode threads while the
+  model works on earlier images
+
+and reports throughput, the share of wall time the model spent generating,
+and process CPU use. The model is the random BLIP from bench_batching.py
+unless --model is given:
+
+    python benchmarks/bench_prefetch.py
+    python benchmarks/bench_prefetch.py --images 32 --width 6000 --height 4000 --decode-workers 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import numpy as np
+from PIL import Image
+
+from bench_batching import build_blip
+from joycaption_mcp import server as server_module
+from joycaption_mcp.model import ModelManager, parse_model_spec
+from joycaption_mcp.server import JoyCaptionServer, decode_image
+
+
+def write_images(directory: Path, count: int, width: int, height: int):
+    rng = np.random.default_rng(0)
+    for i in range(count):
+        pixels = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        Image.fromarray(pixels).save(directory / f"large_{i:03d}.png", compress_level=1)
+
+
+async def run_once(candidate, directory: Path, prefetch: bool, args) -> Dict[str, float]:
+    server_module.DEFAULT_DECODE_WORKERS = args.decode_workers
+    server = JoyCaptionServer()
+    server.models = server.worker.models = ModelManager(candidates=[candidate], pinned=True)
+    if not prefetch:
+        server.prepare_image = lambda data, prompt, mode: (decode_image(data), None, None)
+    async with server.models.use():
+        pass
+
+    # Time model.generate itself: the worker's busy time would count preprocessing too
+    model, generate_seconds = server.models.model, [0.0]
+    generate = model.generate
+
+    def timed_generate(*a, **kw):
+        started = time.perf_counter()
+        try:
+            return generate(*a, **kw)
+        finally:
+            generate_seconds[0] += time.perf_counter() - started
+
+    model.generate = timed_generate
+    cpu_start, start = time.process_time(), time.perf_counter()
+    await server.caption_directory({"directory": str(directory), "overwrite": True, "use_cache": False,
+                                    "max_tokens": args.max_tokens})
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    busy = generate_seconds[0]
+    await server.worker.stop()
+    server.decode_pool.shutdown()
+    return {
+        'pipeline': 'prefetch' if prefetch else 'inline',
+        'images_per_second': round(args.images / elapsed, 2),
+        'model_busy': round(busy / elapsed, 3),
+        'cpu_utilization': round(cpu / elapsed / (os.cpu_count() or 1), 3),
+        'seconds': round(elapsed, 2),
+    }
+
+
+async def bench(args) -> List[Dict[str, float]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp) / "images"
+        directory.mkdir()
+        print(f"Writing {args.images} {args.width}x{args.height} PNGs...")
+        write_images(directory, args.images, args.width, args.height)
+        if args.model:
+            candidate = parse_model_spec(args.model)
+        else:
+            path = Path(tmp) / "blip"
+            build_blip(path, args.hidden, args.layers, args.image_size)
+            candidate = ("blip", str(path))
+
+        results = []
+        for prefetch in (False, True):
+            result = await run_once(candidate, directory, prefetch, args)
+            results.append(result)
+            print(f"{result['pipeline']:<9} {result['images_per_second']:>6} images/s   "
+                  f"model busy {100 * result['model_busy']:>4.0f}%   "
+                  f"CPU {100 * result['cpu_utilization']:>4.0f}% of {os.cpu_count()} cores   "
+                  f"({result['seconds']}s)")
+        return results
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=24)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--decode-workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--max-tokens", type=int, default=20)
+    parser.add_argument("--model", help="type:name of a real model instead of the random one")
+    parser.add_argument("--hidden", type=int, default=256, help="random model hidden size")
+    parser.add_argument("--layers", type=int, default=4, help="random model layers (vision and text)")
+    parser.add_argument("--image-size", type=int, default=224)
+    parser.add_argument("--json", help="write results to this file")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    results = asyncio.run(bench(args))
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
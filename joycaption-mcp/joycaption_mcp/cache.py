@@ -0,0 +1,162 @@
+"""
+Persistent caption cache for the JoyCaption MCP server
+
+Captions are stored under a hash of the image bytes plus everything that
+affects the output: model, mode, prompt, sampling parameters and max_tokens.
+A duplicate or renamed file therefore hits the cache, while an edited image
+or a different setting misses it. The cache is an SQLite file that is kept
+under a size limit by evicting the least recently used captions.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path(os.environ.get("JOYCAPTION_CACHE_DIR", Path.home() / ".joycaption_cache"))
+# Size limit for stored captions, in MB (0 disables the cache)
+DEFAULT_CACHE_MB = float(os.environ.get("JOYCAPTION_CACHE_MB", "64"))
+# Bump when a change to the generation code changes what the same settings produce
+CACHE_VERSION = 1
+EVICT_TO = 0.9  # after going over the limit, evict down to this fraction of it
+
+
+def image_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def caption_key(digest: str, model_type: str, model_name: str, mode: str, prompt: str,
+                temperature: float, top_p: float, max_tokens: int) -> str:
+    """Cache key for one image captioned with one set of settings"""
+    params = json.dumps([CACHE_VERSION, model_type, model_name, mode, prompt, temperature, top_p, max_tokens],
+                        separators=(",", ":"))
+    return hashlib.sha256(f"{digest}:{params}".encode()).hexdigest()
+
+
+class CaptionCache:
+    """
+    SQLite caption store with size-based LRU eviction
+
+    Every hit refreshes the entry's last_used time. When the stored captions
+    grow past max_bytes, the least recently used ones are deleted until the
+    total is back under EVICT_TO of the limit.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS captions (
+            key TEXT PRIMARY KEY,
+            caption TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created REAL NOT NULL,
+            last_used REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS captions_last_used ON captions (last_used);
+    """
+
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self.total = self.stored_bytes()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stored_bytes(self) -> int:
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM captions").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        return self.get_first([key])
+
+    def get_first(self, keys: List[str]) -> Optional[str]:
+        """The caption stored under the first of keys that has one; counts one hit or miss"""
+        with self.lock:
+            for key in keys:
+                row = self.conn.execute("SELECT caption FROM captions WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    break
+            else:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self.conn:
+                self.conn.execute("UPDATE captions SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def set(self, key: str, caption: str):
+        size = len(key) + len(caption.encode("utf-8"))
+        now = time.time()
+        with self.lock:
+            with self.conn:
+                old = self.conn.execute("SELECT size FROM captions WHERE key = ?", (key,)).fetchone()
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO captions (key, caption, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, caption, size, now, now))
+            self.total += size - (old[0] if old else 0)
+            if self.total > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        """Delete least recently used captions until under EVICT_TO of the limit (caller holds the lock)"""
+        # Other processes may share the file, so recount before deleting
+        self.total = self.stored_bytes()
+        target = self.max_bytes * EVICT_TO
+        evicted = 0
+        with self.conn:
+            while self.total > target:
+                rows = self.conn.execute("SELECT key, size FROM captions ORDER BY last_used LIMIT 256").fetchall()
+                if not rows:
+                    break
+                doomed = []
+                for key, size in rows:
+                    if self.total <= target:
+                        break
+                    doomed.append((key,))
+                    self.total -= size
+                self.conn.executemany("DELETE FROM captions WHERE key = ?", doomed)
+                evicted += len(doomed)
+        self.evictions += evicted
+        logger.info(f"Evicted {evicted} cached captions ({self.total / 1e6:.1f} MB kept)")
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM captions").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self),
+            'stored_mb': round(self.total / 1e6, 2),
+            'limit_mb': round(self.max_bytes / 1e6, 2),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'evictions': self.evictions,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def open_caption_cache(cache_dir: Path = DEFAULT_CACHE_DIR, max_mb: float = DEFAULT_CACHE_MB) -> Optional[CaptionCache]:
+    """Open the cache in cache_dir, or return None if it is disabled or can't be opened"""
+    if max_mb <= 0:
+        return None
+    try:
+        return CaptionCache(Path(cache_dir) / "captions.sqlite", int(max_mb * 1e6))
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Caption cache disabled: could not open it in {cache_dir}: {e}")
+        return None
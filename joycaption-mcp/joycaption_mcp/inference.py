@@ -0,0 +1,285 @@
+"""
+Caption inference worker for the JoyCaption MCP server
+
+model.generate can take tens of seconds on CPU. Running it inside a tool
+handler would freeze the whole server, so requests go through a bounded
+queue to a dedicated inference thread instead:
+
+- the event loop stays free to answer other tool calls and pings
+- when the queue is full, new requests are turned away immediately with an
+  estimate of the wait, rather than piling up
+- a request whose client gave up is dropped from the queue, or stopped
+  between tokens if it is already generating
+- requests that arrive close together with the same generation settings
+  are run as one batch, which keeps the hardware busy when an agent fires
+  many captions in parallel
+"""
+
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+from .model import ModelManager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = int(os.environ.get("JOYCAPTION_QUEUE_SIZE", "32"))  # waiting requests before rejecting
+DEFAULT_MAX_BATCH = int(os.environ.get("JOYCAPTION_MAX_BATCH", "8"))  # images per model.generate call
+# How long the first request of a batch waits for compatible ones to join it
+DEFAULT_BATCH_WINDOW = float(os.environ.get("JOYCAPTION_BATCH_WINDOW_MS", "20")) / 1000
+DURATION_SAMPLES = 20  # recent batch times kept for wait estimates
+
+
+class QueueFullError(Exception):
+    """The inference queue is full; the caller should retry later"""
+
+
+class CaptionJob:
+    """One caption request waiting for, or running on, the inference thread"""
+
+    def __init__(self, image, prompt: str, mode: str, temperature: float, top_p: float, max_tokens: int,
+                 inputs: Optional[Dict[str, Any]] = None, inputs_model: Optional[Tuple[str, str]] = None):
+        self.image = image
+        # Processor output prepared ahead of time, and the (model_type, model_name) it was prepared for
+        self.inputs = inputs
+        self.inputs_model = inputs_model
+        self.prompt = prompt
+        self.mode = mode
+        self.temperature = temperature
+        self.top_p = top_p
+        self.max_tokens = max_tokens
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        # Set from the event loop, read by the stopping criteria on the inference thread
+        self.cancelled = threading.Event()
+        self.enqueued = time.monotonic()
+        self.started: Optional[float] = None
+        # (model_type, model_name) of the model that ran the job, set when it starts
+        self.model: Optional[Tuple[str, str]] = None
+        self.waiting = False  # counted in InferenceWorker.queued()
+
+    def batch_key(self) -> Hashable:
+        """Jobs with equal keys can share one model.generate call"""
+        return (self.mode, self.prompt, self.max_tokens, self.temperature, self.top_p)
+
+
+def cancel_criteria(jobs: List[CaptionJob]):
+    """
+    transformers stopping criteria that ends generation for cancelled jobs
+    Rows are (batch size x beams); each job's rows stop once it is cancelled
+    """
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class StopWhenCancelled(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            flags = torch.tensor([job.cancelled.is_set() for job in jobs], device=input_ids.device)
+            return flags.repeat_interleave(input_ids.shape[0] // len(jobs))
+
+    return StoppingCriteriaList([StopWhenCancelled()])
+
+
+class InferenceWorker:
+    """
+    Runs caption jobs in batches on a dedicated thread
+
+    The first job of a batch waits up to `batch_window` seconds for others
+    with the same batch_key, up to `max_batch` jobs. `generate(models, jobs)`
+    is the blocking model call and returns one caption per job; jobs
+    cancelled while it runs should stop early (see cancel_criteria).
+    """
+
+    def __init__(self, models: ModelManager,
+                 generate: Callable[[ModelManager, List[CaptionJob]], List[Optional[str]]],
+                 max_queue: int = DEFAULT_QUEUE_SIZE, max_batch: int = DEFAULT_MAX_BATCH,
+                 batch_window: float = DEFAULT_BATCH_WINDOW):
+        self.models = models
+        self.generate = generate
+        self.max_queue = max_queue
+        self.max_batch = max(1, max_batch)
+        self.batch_window = batch_window
+        self.queue: Optional[asyncio.Queue] = None
+        # Jobs taken off the queue that didn't fit the batch being built
+        self.deferred: Deque[CaptionJob] = deque()
+        # Live jobs in queue + deferred; jobs whose callers gave up stay there until popped, uncounted
+        self.waiting = 0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self.task: Optional[asyncio.Task] = None
+        self.current: List[CaptionJob] = []
+        self.durations: Deque[float] = deque(maxlen=DURATION_SAMPLES)
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.batches = 0
+        self.busy_seconds = 0.0  # time spent in generate, for utilization
+        self.created = time.monotonic()
+
+    def start(self):
+        """Start consuming the queue on the current event loop"""
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            for job in self.current:
+                job.cancelled.set()
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        self.executor.shutdown(wait=False)
+
+    def queued(self) -> int:
+        return self.waiting
+
+    def unqueue(self, job: CaptionJob):
+        if job.waiting:
+            job.waiting = False
+            self.waiting -= 1
+
+    def estimated_wait(self) -> Optional[float]:
+        """Seconds until a request submitted now would start, from recent batch times"""
+        if not self.durations:
+            return None
+        average = sum(self.durations) / len(self.durations)
+        return average * (math.ceil(self.queued() / self.max_batch) + (1 if self.current else 0))
+
+    async def submit(self, job: CaptionJob) -> str:
+        """Queue a job and wait for its caption. Raises QueueFullError if the queue is full"""
+        self.start()
+        if self.queued() >= self.max_queue:
+            self.rejected += 1
+            wait = self.estimated_wait()
+            estimate = f", estimated wait {wait:.0f}s" if wait is not None else ""
+            raise QueueFullError(f"Server busy: {self.queued()} captions queued (limit {self.max_queue}){estimate}. "
+                                 f"Retry later.")
+        job.waiting = True
+        self.waiting += 1
+        self.queue.put_nowait(job)
+        try:
+            return await job.future
+        except asyncio.CancelledError:
+            # The client gave up: skip the job if it hasn't started, stop it if it has.
+            # A skipped job stops counting against the queue limit straight away.
+            job.cancelled.set()
+            if job.waiting:
+                self.unqueue(job)
+                self.cancelled += 1
+            raise
+
+    async def next_job(self) -> CaptionJob:
+        """The oldest job whose caller is still waiting (deferred ones first)"""
+        while True:
+            job = self.deferred.popleft() if self.deferred else await self.queue.get()
+            if job.waiting:
+                return job
+
+    async def next_batch(self) -> List[CaptionJob]:
+        """Wait for a job, then gather compatible ones arriving within the batch window"""
+        loop = asyncio.get_running_loop()
+        batch = [await self.next_job()]
+        key = batch[0].batch_key()
+        # Earlier arrivals that didn't fit the previous batch go first; drop abandoned ones
+        for job in list(self.deferred):
+            if not job.waiting:
+                self.deferred.remove(job)
+            elif len(batch) < self.max_batch and job.batch_key() == key:
+                self.deferred.remove(job)
+                batch.append(job)
+        deadline = loop.time() + self.batch_window
+        while len(batch) < self.max_batch:
+            if self.queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    job = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                job = self.queue.get_nowait()
+            if not job.waiting:
+                continue
+            if job.batch_key() == key:
+                batch.append(job)
+            else:
+                self.deferred.append(job)
+        # Callers may have given up during the batch window (submit already counted them)
+        batch = [job for job in batch if job.waiting]
+        for job in batch:
+            self.unqueue(job)
+        return batch
+
+    async def run(self):
+        """Take batches of jobs off the queue and run them on the inference thread, one batch at a time"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self.next_batch()
+            jobs = [job for job in batch if not job.cancelled.is_set() and not job.future.done()]
+            self.cancelled += len(batch) - len(jobs)
+            if not jobs:
+                continue
+            self.current = jobs
+            try:
+                async with self.models.use() as models:
+                    # Callers may have given up while the model was loading
+                    jobs = [job for job in jobs if not job.cancelled.is_set()]
+                    self.cancelled += len(self.current) - len(jobs)
+                    if not jobs:
+                        continue
+                    started = time.monotonic()
+                    for job in jobs:
+                        job.started = started
+                        job.model = (models.model_type, models.model_name)
+                    captions = await loop.run_in_executor(self.executor, self.generate, models, jobs)
+            except Exception as e:
+                self.failed += len(jobs)
+                for job in jobs:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+            else:
+                self.batches += 1
+                self.durations.append(time.monotonic() - started)
+                self.busy_seconds += self.durations[-1]
+                for job, caption in zip(jobs, captions):
+                    if job.cancelled.is_set():
+                        self.cancelled += 1
+                        job.future.cancel()
+                    else:
+                        self.completed += 1
+                        if not job.future.done():
+                            job.future.set_result(caption)
+            finally:
+                self.current = []
+
+    def status(self) -> Dict[str, Any]:
+        wait = self.estimated_wait()
+        average = sum(self.durations) / len(self.durations) if self.durations else None
+        running = None
+        if self.current and self.current[0].started is not None:
+            running = round(time.monotonic() - self.current[0].started, 1)
+        return {
+            'queued': self.queued(),
+            'queue_limit': self.max_queue,
+            'running': len(self.current),
+            'running_for_seconds': running,
+            'average_seconds': round(average, 2) if average is not None else None,
+            'estimated_wait_seconds': round(wait, 1) if wait is not None else None,
+            'completed': self.completed,
+            'failed': self.failed,
+            'cancelled': self.cancelled,
+            'rejected': self.rejected,
+            'batches': self.batches,
+            'average_batch_size': round(self.completed / self.batches, 2) if self.batches else None,
+            'max_batch': self.max_batch,
+            'batch_window_ms': round(self.batch_window * 1000),
+            'busy_seconds': round(self.busy_seconds, 1),
+            'utilization': round(self.busy_seconds / max(time.monotonic() - self.created, 1e-9), 3),
+        }
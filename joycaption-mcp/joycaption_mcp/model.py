@@ -0,0 +1,248 @@
+"""
+Model lifecycle for the JoyCaption MCP server
+
+Loading a vision-language model takes anywhere from seconds to minutes, so
+it starts in a background thread as soon as the server does. Tool calls
+that need the model wait for it without blocking the event loop, the
+model_status tool reports how far loading has got, and an idle model can be
+unloaded to free memory unless it is pinned.
+"""
+
+import asyncio
+import gc
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Models to try, in order, as (model_type, Hugging Face model name)
+DEFAULT_CANDIDATES = [
+    ("blip2", "Salesforce/blip2-opt-2.7b"),
+    ("blip", "Salesforce/blip-image-captioning-large"),
+    ("git", "microsoft/git-base"),
+]
+
+# Lifecycle settings, overridable through the environment (see mcp.json "env")
+DEFAULT_PRELOAD = os.environ.get("JOYCAPTION_PRELOAD", "1") != "0"  # start loading when the server starts
+DEFAULT_PIN = os.environ.get("JOYCAPTION_PIN_MODEL", "0") != "0"  # never unload
+DEFAULT_IDLE_UNLOAD = float(os.environ.get("JOYCAPTION_IDLE_UNLOAD", "0"))  # seconds idle before unloading, 0: never
+# Force one model, e.g. "git:microsoft/git-base" (default: try DEFAULT_CANDIDATES in order)
+DEFAULT_MODEL = os.environ.get("JOYCAPTION_MODEL")
+
+
+def parse_model_spec(spec: str) -> Tuple[str, str]:
+    """'type:name' -> (type, name)"""
+    model_type, _, model_name = spec.partition(":")
+    if model_type not in {t for t, _ in DEFAULT_CANDIDATES} or not model_name:
+        raise ValueError(f"Invalid model {spec!r}: expected blip2:<name>, blip:<name> or git:<name>")
+    return model_type, model_name
+
+
+class ModelManager:
+    """
+    Loads, holds and unloads the captioning model
+
+    States: 'not_loaded', 'loading', 'ready', 'failed'. Loading runs in a
+    worker thread; callers wait for it with `async with manager.use()`.
+    """
+
+    def __init__(
+        self,
+        candidates: Optional[List[Tuple[str, str]]] = None,
+        pinned: bool = DEFAULT_PIN,
+        idle_unload: float = DEFAULT_IDLE_UNLOAD,
+    ):
+        if candidates is None:
+            candidates = [parse_model_spec(DEFAULT_MODEL)] if DEFAULT_MODEL else DEFAULT_CANDIDATES
+        self.candidates = list(candidates)
+        self.pinned = pinned
+        self.idle_unload = idle_unload
+
+        self.model = None
+        self.processor = None
+        self.device = None
+        self.model_type = None
+        self.model_name = None
+
+        self.state = 'not_loaded'
+        self.stage = None  # what the loader is doing right now
+        self.errors: List[str] = []  # why earlier candidates failed
+        self.load_started: Optional[float] = None
+        self.load_seconds: Optional[float] = None
+        self.last_used: Optional[float] = None
+        self.loads = 0
+        self.unloads = 0
+        self.in_use = 0
+        self.waiting = 0  # requests queued behind loading
+        self.load_future: Optional[asyncio.Future] = None
+        self.idle_task: Optional[asyncio.Task] = None
+
+    def start_loading(self) -> asyncio.Future:
+        """Begin loading in a worker thread, unless already loading or loaded"""
+        if self.load_future is None or (self.load_future.done() and self.state != 'ready'):
+            self.state = 'loading'
+            self.errors = []
+            self.load_started = time.time()
+            self.load_future = asyncio.get_running_loop().run_in_executor(None, self.load)
+        return self.load_future
+
+    def expected_models(self) -> List[Tuple[str, str]]:
+        """
+        (model_type, model_name) of the models that may answer a request, most
+        preferred first, known without loading: every candidate until one has
+        loaded, then the candidates up to and including the loaded one
+        """
+        if self.model_name is None:
+            return list(self.candidates)
+        loaded = (self.model_type, self.model_name)
+        if loaded in self.candidates:
+            return self.candidates[:self.candidates.index(loaded) + 1]
+        return [loaded]
+
+    def start(self):
+        """Start background loading (if enabled) and the idle-unload watcher"""
+        if DEFAULT_PRELOAD:
+            self.start_loading()
+        if self.idle_unload > 0 and self.idle_task is None:
+            self.idle_task = asyncio.create_task(self.unload_when_idle())
+
+    async def stop(self):
+        if self.idle_task is not None:
+            self.idle_task.cancel()
+            await asyncio.gather(self.idle_task, return_exceptions=True)
+            self.idle_task = None
+
+    @asynccontextmanager
+    async def use(self):
+        """Wait (without blocking the event loop) until the model is ready, and keep it loaded meanwhile"""
+        self.in_use += 1
+        try:
+            if self.state != 'ready':
+                self.waiting += 1
+                try:
+                    await asyncio.shield(self.start_loading())
+                finally:
+                    self.waiting -= 1
+            if self.state != 'ready':
+                raise RuntimeError("Could not load any vision-language model: " + "; ".join(self.errors))
+            yield self
+        finally:
+            self.in_use -= 1
+            self.last_used = time.time()
+
+    def load(self):
+        """Try each candidate model in turn (runs in a worker thread)"""
+        try:
+            self.stage = "importing torch"
+            import torch
+
+            if torch.cuda.is_available():
+                device = "cuda"
+            else:
+                device = "cpu"
+                logger.warning("CUDA not available, using CPU. This will be slower.")
+
+            for model_type, model_name in self.candidates:
+                try:
+                    self.load_candidate(torch, device, model_type, model_name)
+                except Exception as e:
+                    logger.warning(f"Failed to load {model_type} ({model_name}): {e}")
+                    self.errors.append(f"{model_type}: {e}")
+                    continue
+                self.model.eval()
+                self.device = device
+                self.load_seconds = time.time() - self.load_started
+                self.loads += 1
+                self.state = 'ready'
+                logger.info(f"Model {model_name} ready on {device} after {self.load_seconds:.1f}s")
+                return
+            self.state = 'failed'
+            logger.error("Could not load any vision-language model. Please install transformers and torch.")
+        except Exception as e:
+            self.errors.append(str(e))
+            self.state = 'failed'
+            logger.error(f"Model loading failed: {e}")
+        finally:
+            self.stage = None
+
+    def load_candidate(self, torch, device: str, model_type: str, model_name: str):
+        """Load one model and its processor"""
+        dtype = torch.float16 if device == "cuda" else torch.float32
+        logger.info(f"Loading {model_type} model: {model_name}")
+
+        if model_type == "blip2":
+            from transformers import Blip2Processor, Blip2ForConditionalGeneration
+            self.stage = f"loading {model_name} processor"
+            processor = Blip2Processor.from_pretrained(model_name)
+            self.stage = f"loading {model_name} weights"
+            model = Blip2ForConditionalGeneration.from_pretrained(
+                model_name,
+                torch_dtype=dtype,
+                device_map="auto" if device == "cuda" else "cpu"
+            )
+        elif model_type == "blip":
+            from transformers import BlipProcessor, BlipForConditionalGeneration
+            self.stage = f"loading {model_name} processor"
+            processor = BlipProcessor.from_pretrained(model_name)
+            self.stage = f"loading {model_name} weights"
+            model = BlipForConditionalGeneration.from_pretrained(model_name, torch_dtype=dtype)
+            self.stage = f"moving {model_name} to {device}"
+            model = model.to(device)
+        else:
+            from transformers import AutoProcessor, AutoModelForCausalLM
+            self.stage = f"loading {model_name} processor"
+            processor = AutoProcessor.from_pretrained(model_name)
+            self.stage = f"loading {model_name} weights"
+            model = AutoModelForCausalLM.from_pretrained(model_name)
+            self.stage = f"moving {model_name} to {device}"
+            model = model.to(device)
+
+        self.processor, self.model = processor, model
+        self.model_type, self.model_name = model_type, model_name
+
+    def unload(self):
+        """Drop the model and free its memory; the next request loads it again"""
+        if self.state != 'ready':
+            return
+        self.model = None
+        self.processor = None
+        self.state = 'not_loaded'
+        self.load_future = None
+        self.unloads += 1
+        gc.collect()
+        if self.device == "cuda":
+            import torch
+            torch.cuda.empty_cache()
+        logger.info(f"Unloaded {self.model_name} after {self.idle_unload:.0f}s idle")
+
+    async def unload_when_idle(self):
+        """Unload the model once nothing has used it for `idle_unload` seconds (unless pinned)"""
+        while True:
+            await asyncio.sleep(max(1.0, min(self.idle_unload / 4, 30.0)))
+            idle_since = self.last_used or self.load_started
+            if (not self.pinned and self.state == 'ready' and self.in_use == 0
+                    and idle_since and time.time() - idle_since >= self.idle_unload):
+                self.unload()
+
+    def status(self) -> Dict[str, Any]:
+        now = time.time()
+        status = {
+            'state': self.state,
+            'stage': self.stage,
+            'model_type': self.model_type,
+            'model_name': self.model_name,
+            'device': self.device,
+            'pinned': self.pinned,
+            'idle_unload_seconds': self.idle_unload or None,
+            'load_seconds': round(self.load_seconds, 1) if self.load_seconds is not None else None,
+            'loading_for_seconds': round(now - self.load_started, 1) if self.state == 'loading' else None,
+            'idle_seconds': round(now - self.last_used, 1) if self.last_used and not self.in_use else None,
+            'requests_waiting': self.waiting,
+            'loads': self.loads,
+            'unloads': self.unloads,
+            'errors': self.errors,
+        }
+        return status
@@ -0,0 +1,45 @@
+"""
+Ordered read-ahead for batch captioning
+
+Decoding and preprocessing an image is CPU work that can overlap with the
+model running on the previous one. prefetch() runs it on a small thread pool
+a bounded number of items ahead of the consumer and hands results back in
+input order. It only needs the standard library so it can be used and tested
+without the ML stack installed.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+
+def prefetch(fn, items, workers=2, lookahead=4):
+    """
+    Yield (item, result, error) for each item in order, computing fn(item) on
+    `workers` threads up to `lookahead` items ahead of the consumer.
+    lookahead=0 runs fn inline, one item at a time.
+    """
+    if lookahead <= 0:
+        for item in items:
+            try:
+                yield item, fn(item), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch") as pool:
+        items = iter(items)
+        pending = deque((item, pool.submit(fn, item)) for item in islice(items, lookahead))
+        try:
+            while pending:
+                item, future = pending.popleft()
+                # Keep the lookahead full while the consumer works on this item
+                for next_item in islice(items, 1):
+                    pending.append((next_item, pool.submit(fn, next_item)))
+                try:
+                    yield item, future.result(), None
+                except Exception as e:
+                    yield item, None, e
+        finally:
+            for _, future in pending:
+                future.cancel()
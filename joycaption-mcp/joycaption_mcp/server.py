@@ -1,16 +1,23 @@
 import asyncio
+import io
 import json
 import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from mcp.server import Server, NotificationOptions
 from mcp.server.models import InitializationOptions
 import mcp.server.stdio
 import mcp.types as types
 
-import torch
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
+
+from .cache import CaptionCache, caption_key, image_digest, open_caption_cache
+from .inference import CaptionJob, InferenceWorker, QueueFullError, cancel_criteria
+from .model import ModelManager
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -39,13 +46,79 @@ EXTRA_OPTIONS = {
     "important_only": " Focus only on the most important elements."
 }
 
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tiff', '.tif'}
+PROGRESS_INTERVAL = 1.0  # seconds between caption_directory progress notifications
+QUEUE_FULL_RETRY = 0.5  # seconds caption_directory waits for room in a queue other clients filled
+# Model types generate_captions samples with (do_sample=True): the same settings give a new caption each time
+SAMPLING_MODEL_TYPES = {"blip2", "git"}
+# Threads that read, decode and preprocess images ahead of the model
+DEFAULT_DECODE_WORKERS = int(os.environ.get("JOYCAPTION_DECODE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def build_prompt(mode: str, extra_options: List[str]) -> str:
+    """The prompt for a caption mode, with any extra options appended"""
+    prompt = CAPTION_MODES.get(mode, CAPTION_MODES["descriptive"])
+    for option in extra_options:
+        if option in EXTRA_OPTIONS:
+            prompt += EXTRA_OPTIONS[option]
+    return prompt
+
+
+def clean_caption(caption: Optional[str], prompt: str) -> Optional[str]:
+    """Strip the prompt from models that echo it back"""
+    if caption and prompt in caption:
+        caption = caption.replace(prompt, "").strip()
+    return caption
+
+
+class ImageLoadError(Exception):
+    """The image file could not be read or decoded"""
+
+
+def decode_image(data: bytes) -> Image.Image:
+    try:
+        return Image.open(io.BytesIO(data)).convert("RGB")
+    except UnidentifiedImageError:
+        raise ImageLoadError("cannot identify image file: not a supported image format") from None
+
+
+def write_caption_json(image_path: Path, caption_data: Dict[str, Any]) -> Path:
+    """Write the sidecar JSON next to the image, atomically so an interrupted run never leaves half a file"""
+    json_path = image_path.with_suffix('.json')
+    tmp_path = json_path.with_name(json_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(caption_data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, json_path)
+    return json_path
+
+
+def find_images(directory: Path, recursive: bool, overwrite: bool) -> Tuple[List[Path], int]:
+    """Images under directory to caption, and how many were skipped because they already have a sidecar JSON"""
+    pattern = "**/*" if recursive else "*"
+    images, skipped = [], 0
+    for path in sorted(directory.glob(pattern)):
+        if path.suffix.lower() not in IMAGE_EXTENSIONS or not path.is_file():
+            continue
+        if not overwrite and path.with_suffix('.json').exists():
+            skipped += 1
+        else:
+            images.append(path)
+    return images, skipped
+
+
 class JoyCaptionServer:
     def __init__(self):
         self.server = Server("joycaption-mcp")
-        self.model = None
-        self.processor = None
-        self.device = None
-        self.model_type = None
+        # Loads the model in the background as soon as the server starts
+        self.models = ModelManager()
+        # Captions are generated on a dedicated thread, fed by a bounded queue
+        self.worker = InferenceWorker(self.models, self.generate_captions)
+        # Opened on first use, so startup doesn't touch the disk
+        self.cache: Optional[CaptionCache] = None
+        self.cache_opened = False
+        # Decoding and preprocessing run here, so the inference thread only generates
+        self.decode_pool = ThreadPoolExecutor(max_workers=max(1, DEFAULT_DECODE_WORKERS),
+                                              thread_name_prefix="decode")
         
         # Register handlers
         self.setup_handlers()
@@ -103,6 +176,12 @@ class JoyCaptionServer:
                                 "default": 256,
                                 "minimum": 50,
                                 "maximum": 1024
+                            },
+                            "use_cache": {
+                                "type": "boolean",
+                                "description": "Reuse the stored caption for an identical image and settings. By default only "
+                                               "captions from models that don't sample (BLIP) are cached; true also caches "
+                                               "sampled ones (BLIP-2, GIT), false skips the cache"
                             }
                         },
                         "required": ["image_path"]
@@ -123,6 +202,84 @@ class JoyCaptionServer:
                         "type": "object",
                         "properties": {}
                     }
+                ),
+                types.Tool(
+                    name="model_status",
+                    description="Show whether the captioning model is loaded, still loading (and at which step), or failed to load, and the state of the caption queue (queued requests, estimated wait, cancellations)",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {}
+                    }
+                ),
+                types.Tool(
+                    name="caption_directory",
+                    description="Caption every image in a directory in one call, writing a JSON caption file next to each image as it goes. Images that already have a JSON file are skipped, so an interrupted run can simply be repeated. Sends progress notifications while it runs",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "directory": {
+                                "type": "string",
+                                "description": "Path to the directory of images"
+                            },
+                            "recursive": {
+                                "type": "boolean",
+                                "description": "Include images in subdirectories",
+                                "default": False
+                            },
+                            "overwrite": {
+                                "type": "boolean",
+                                "description": "Re-caption images that already have a JSON caption file",
+                                "default": False
+                            },
+                            "limit": {
+                                "type": "integer",
+                                "description": "Caption at most this many images (default: all)",
+                                "minimum": 1
+                            },
+                            "mode": {
+                                "type": "string",
+                                "description": f"Caption mode. Options: {', '.join(CAPTION_MODES.keys())}",
+                                "enum": list(CAPTION_MODES.keys()),
+                                "default": "descriptive"
+                            },
+                            "extra_options": {
+                                "type": "array",
+                                "description": f"Extra options to append to the prompt. Available: {', '.join(EXTRA_OPTIONS.keys())}",
+                                "items": {
+                                    "type": "string",
+                                    "enum": list(EXTRA_OPTIONS.keys())
+                                }
+                            },
+                            "temperature": {
+                                "type": "number",
+                                "description": "Generation temperature (0.1-1.0)",
+                                "default": 0.7,
+                                "minimum": 0.1,
+                                "maximum": 1.0
+                            },
+                            "top_p": {
+                                "type": "number",
+                                "description": "Top-p sampling parameter",
+                                "default": 0.9,
+                                "minimum": 0.1,
+                                "maximum": 1.0
+                            },
+                            "max_tokens": {
+                                "type": "integer",
+                                "description": "Maximum number of tokens to generate",
+                                "default": 256,
+                                "minimum": 50,
+                                "maximum": 1024
+                            },
+                            "use_cache": {
+                                "type": "boolean",
+                                "description": "Reuse the stored caption for an identical image and settings. By default only "
+                                               "captions from models that don't sample (BLIP) are cached; true also caches "
+                                               "sampled ones (BLIP-2, GIT), false skips the cache"
+                            }
+                        },
+                        "required": ["directory"]
+                    }
                 )
             ]
         
@@ -136,93 +293,16 @@ class JoyCaptionServer:
                 return await self.list_caption_modes()
             elif name == "list_extra_options":
                 return await self.list_extra_options()
+            elif name == "model_status":
+                return await self.model_status()
+            elif name == "caption_directory":
+                return await self.caption_directory(arguments)
             else:
                 raise ValueError(f"Unknown tool: {name}")
     
-    async def ensure_model_loaded(self):
-        """Load a vision-language model"""
-        if self.model is None:
-            logger.info("Loading vision-language model...")
-            
-            # Check for CUDA availability
-            if torch.cuda.is_available():
-                self.device = "cuda"
-                device_map = "auto"
-            else:
-                self.device = "cpu"
-                device_map = "cpu"
-                logger.warning("CUDA not available, using CPU. This will be slower.")
-            
-            # Try different model options
-            loaded = False
-            
-            # Option 1: Try BLIP-2 (most compatible)
-            if not loaded:
-                try:
-                    from transformers import Blip2Processor, Blip2ForConditionalGeneration
-                    
-                    model_name = "Salesforce/blip2-opt-2.7b"
-                    logger.info(f"Loading BLIP-2 model: {model_name}")
-                    
-                    self.processor = Blip2Processor.from_pretrained(model_name)
-                    self.model = Blip2ForConditionalGeneration.from_pretrained(
-                        model_name,
-                        torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
-                        device_map=device_map
-                    )
-                    self.model_type = "blip2"
-                    loaded = True
-                    logger.info("✓ BLIP-2 model loaded successfully")
-                except Exception as e:
-                    logger.warning(f"Failed to load BLIP-2: {e}")
-            
-            # Option 2: Try BLIP original
-            if not loaded:
-                try:
-                    from transformers import BlipProcessor, BlipForConditionalGeneration
-                    
-                    model_name = "Salesforce/blip-image-captioning-large"
-                    logger.info(f"Loading BLIP model: {model_name}")
-                    
-                    self.processor = BlipProcessor.from_pretrained(model_name)
-                    self.model = BlipForConditionalGeneration.from_pretrained(
-                        model_name,
-                        torch_dtype=torch.float16 if self.device == "cuda" else torch.float32
-                    ).to(self.device)
-                    self.model_type = "blip"
-                    loaded = True
-                    logger.info("✓ BLIP model loaded successfully")
-                except Exception as e:
-                    logger.warning(f"Failed to load BLIP: {e}")
-            
-            # Option 3: Try GIT
-            if not loaded:
-                try:
-                    from transformers import AutoProcessor, AutoModelForCausalLM
-                    
-                    model_name = "microsoft/git-base"
-                    logger.info(f"Loading GIT model: {model_name}")
-                    
-                    self.processor = AutoProcessor.from_pretrained(model_name)
-                    self.model = AutoModelForCausalLM.from_pretrained(model_name).to(self.device)
-                    self.model_type = "git"
-                    loaded = True
-                    logger.info("✓ GIT model loaded successfully")
-                except Exception as e:
-                    logger.warning(f"Failed to load GIT: {e}")
-            
-            if not loaded:
-                raise RuntimeError("Could not load any vision-language model. Please install transformers and torch.")
-            
-            self.model.eval()
-            logger.info(f"Model ready on {self.device}")
-    
     async def caption_image(self, arguments: Dict[str, Any]) -> List[types.TextContent]:
         """Generate a caption for an image"""
         try:
-            # Ensure model is loaded
-            await self.ensure_model_loaded()
-            
             # Extract arguments
             image_path = Path(arguments["image_path"])
             mode = arguments.get("mode", "descriptive")
@@ -231,6 +311,7 @@ class JoyCaptionServer:
             temperature = arguments.get("temperature", 0.7)
             top_p = arguments.get("top_p", 0.9)
             max_tokens = arguments.get("max_tokens", 256)
+            use_cache = arguments.get("use_cache")
             
             # Validate image exists
             if not image_path.exists():
@@ -239,93 +320,33 @@ class JoyCaptionServer:
                     text=f"Error: Image file not found: {image_path}"
                 )]
             
-            # Load image
+            # Build the prompt
+            prompt = build_prompt(mode, extra_options)
+            
             try:
-                image = Image.open(image_path).convert("RGB")
-            except Exception as e:
+                caption, _ = await self.caption_file(image_path, mode, prompt, temperature, top_p,
+                                                     max_tokens, use_cache)
+            except ImageLoadError as e:
                 return [types.TextContent(
                     type="text",
                     text=f"Error loading image: {str(e)}"
                 )]
-            
-            # Build the prompt
-            prompt = CAPTION_MODES.get(mode, CAPTION_MODES["descriptive"])
-            
-            # Add extra options
-            for option in extra_options:
-                if option in EXTRA_OPTIONS:
-                    prompt += EXTRA_OPTIONS[option]
-            
-            # Generate caption based on model type
-            caption = None
-            
-            if self.model_type == "blip2":
-                inputs = self.processor(image, text=prompt, return_tensors="pt").to(self.device)
-                
-                with torch.no_grad():
-                    outputs = self.model.generate(
-                        **inputs,
-                        max_new_tokens=max_tokens,
-                        do_sample=True,
-                        temperature=temperature,
-                        top_p=top_p
-                    )
-                
-                caption = self.processor.decode(outputs[0], skip_special_tokens=True).strip()
-            
-            elif self.model_type == "blip":
-                # For original BLIP, we can use conditional or unconditional generation
-                if mode == "straightforward":
-                    # Unconditional generation
-                    inputs = self.processor(image, return_tensors="pt").to(self.device)
-                else:
-                    # Conditional generation with prompt
-                    inputs = self.processor(image, text=prompt, return_tensors="pt").to(self.device)
-                
-                with torch.no_grad():
-                    outputs = self.model.generate(
-                        **inputs,
-                        max_length=max_tokens,
-                        num_beams=3,
-                        temperature=temperature,
-                        top_p=top_p
-                    )
-                
-                caption = self.processor.decode(outputs[0], skip_special_tokens=True)
-            
-            elif self.model_type == "git":
-                inputs = self.processor(images=image, return_tensors="pt").to(self.device)
-                
-                with torch.no_grad():
-                    outputs = self.model.generate(
-                        pixel_values=inputs.pixel_values,
-                        max_length=max_tokens,
-                        do_sample=True,
-                        temperature=temperature,
-                        top_p=top_p
-                    )
-                
-                caption = self.processor.batch_decode(outputs, skip_special_tokens=True)[0]
-            
-            # Clean up caption
-            if caption and prompt in caption:
-                caption = caption.replace(prompt, "").strip()
+            except QueueFullError as e:
+                return [types.TextContent(type="text", text=f"Error: {e}")]
+            model_type = self.models.model_type
             
             # Create JSON file if requested
             if create_json:
-                json_path = image_path.with_suffix('.json')
                 caption_data = {
                     "caption": caption,
                     "mode": mode,
                     "extra_options": extra_options,
                     "temperature": temperature,
                     "top_p": top_p,
-                    "model": self.model_type,
+                    "model": model_type,
                     "prompt": prompt
                 }
-                
-                with open(json_path, 'w', encoding='utf-8') as f:
-                    json.dump(caption_data, f, indent=2, ensure_ascii=False)
+                json_path = write_caption_json(image_path, caption_data)
                 
                 return [types.TextContent(
                     type="text",
@@ -344,6 +365,264 @@ class JoyCaptionServer:
                 text=f"Error generating caption: {str(e)}"
             )]
     
+    async def caption_directory(self, arguments: Dict[str, Any]) -> List[types.TextContent]:
+        """Caption every image in a directory, writing each sidecar JSON as soon as its caption is ready"""
+        directory = Path(arguments["directory"]).expanduser()
+        recursive = arguments.get("recursive", False)
+        overwrite = arguments.get("overwrite", False)
+        limit = arguments.get("limit")
+        mode = arguments.get("mode", "descriptive")
+        extra_options = arguments.get("extra_options", [])
+        temperature = arguments.get("temperature", 0.7)
+        top_p = arguments.get("top_p", 0.9)
+        max_tokens = arguments.get("max_tokens", 256)
+        use_cache = arguments.get("use_cache")
+        
+        if not directory.is_dir():
+            return [types.TextContent(type="text", text=f"Error: Directory not found: {directory}")]
+        
+        loop = asyncio.get_running_loop()
+        images, skipped = await loop.run_in_executor(None, find_images, directory, recursive, overwrite)
+        if limit:
+            images = images[:limit]
+        total = len(images)
+        prompt = build_prompt(mode, extra_options)
+        report_progress = self.progress_reporter(total)
+        
+        captioned = 0
+        from_cache = 0
+        failures: List[Tuple[Path, str]] = []
+        started = time.monotonic()
+        # Enough requests in flight to fill batches, while leaving queue room for other clients
+        in_flight = asyncio.Semaphore(max(1, min(2 * self.worker.max_batch, self.worker.max_queue // 2)))
+        
+        async def caption_one(image_path: Path):
+            nonlocal captioned, from_cache
+            try:
+                caption, cached = await self.caption_file(image_path, mode, prompt, temperature, top_p,
+                                                          max_tokens, use_cache, wait_for_room=True)
+                caption_data = {
+                    "caption": caption,
+                    "mode": mode,
+                    "extra_options": extra_options,
+                    "temperature": temperature,
+                    "top_p": top_p,
+                    "model": self.models.model_type,
+                    "prompt": prompt
+                }
+                await loop.run_in_executor(None, write_caption_json, image_path, caption_data)
+                captioned += 1
+                from_cache += cached
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Failed to caption {image_path}: {e}")
+                failures.append((image_path, str(e)))
+            finally:
+                in_flight.release()
+            await report_progress(captioned + len(failures), f"{captioned} captioned, {len(failures)} failed")
+        
+        tasks = set()
+        try:
+            for image_path in images:
+                await in_flight.acquire()
+                task = asyncio.ensure_future(caption_one(image_path))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            # The client cancelled (or we're shutting down): drop whatever is still queued
+            for task in tasks:
+                task.cancel()
+        await report_progress(total, f"{captioned} captioned, {len(failures)} failed", final=True)
+        
+        elapsed = time.monotonic() - started
+        lines = [f"Captioned {captioned} of {total} images in {directory} "
+                 f"({elapsed:.1f}s, {captioned / elapsed if elapsed else 0:.2f} images/s)"]
+        if from_cache:
+            lines.append(f"{from_cache} captions came from the cache")
+        if skipped:
+            lines.append(f"Skipped {skipped} images that already have a JSON caption file")
+        if failures:
+            lines.append(f"Failed: {len(failures)}")
+            for image_path, error in failures[:10]:
+                lines.append(f"  {image_path}: {error}")
+            if len(failures) > 10:
+                lines.append(f"  ... and {len(failures) - 10} more")
+        
+        return [types.TextContent(type="text", text="\n".join(lines))]
+    
+    async def caption_file(self, image_path: Path, mode: str, prompt: str, temperature: float, top_p: float,
+                           max_tokens: int, use_cache: Optional[bool] = None,
+                           wait_for_room: bool = False) -> Tuple[Optional[str], bool]:
+        """
+        Caption one image file, from the cache if possible. Returns (caption, from_cache)
+        
+        With use_cache None, only captions from models that don't sample are cached, so a
+        sampling model still gives a fresh caption each time; True caches those too, False
+        skips the cache.
+        Raises ImageLoadError if the file can't be read or decoded, and QueueFullError if
+        the queue is full, unless wait_for_room is set.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            # Off the event loop: large files take a while to read and decode
+            data = await loop.run_in_executor(self.decode_pool, image_path.read_bytes)
+        except OSError as e:
+            raise ImageLoadError(str(e)) from e
+        
+        cache = self.caption_cache() if use_cache is not False else None
+        if cache is not None:
+            digest = await loop.run_in_executor(None, image_digest, data)
+            # Keys name the model. The configured models are known without loading, so a cold
+            # server answers from the cache straight away
+            keys = [caption_key(digest, model_type, model_name, mode, prompt, temperature, top_p, max_tokens)
+                    for model_type, model_name in self.models.expected_models()
+                    if use_cache or model_type not in SAMPLING_MODEL_TYPES]
+            caption = await loop.run_in_executor(None, cache.get_first, keys) if keys else None
+            if caption is not None:
+                return caption, True
+        
+        image, inputs, inputs_model = await loop.run_in_executor(self.decode_pool, self.prepare_image,
+                                                                 data, prompt, mode)
+        
+        # Queue for the inference thread, where it may share a batch with other requests using
+        # the same settings. If the client cancels, CancelledError propagates and the job is
+        # dropped or stopped.
+        job = CaptionJob(image, prompt, mode, temperature, top_p, max_tokens, inputs, inputs_model)
+        while wait_for_room and self.worker.queued() >= self.worker.max_queue:
+            await asyncio.sleep(QUEUE_FULL_RETRY)
+        caption = clean_caption(await self.worker.submit(job), prompt)
+        
+        # Stored under the model that wrote it, which may since have been unloaded or replaced
+        model_type, model_name = job.model
+        if cache is not None and caption and (use_cache or model_type not in SAMPLING_MODEL_TYPES):
+            key = caption_key(digest, model_type, model_name, mode, prompt, temperature, top_p, max_tokens)
+            await loop.run_in_executor(None, cache.set, key, caption)
+        return caption, False
+    
+    def caption_cache(self) -> Optional[CaptionCache]:
+        """The caption cache, opened on first use (None if disabled)"""
+        if not self.cache_opened:
+            self.cache_opened = True
+            self.cache = open_caption_cache()
+        return self.cache
+    
+    def progress_reporter(self, total: int):
+        """
+        Returns `async report(done, message, final=False)`, which sends progress
+        notifications for the current request at most every PROGRESS_INTERVAL
+        seconds, if the client asked for them
+        """
+        try:
+            context = self.server.request_context
+            token = context.meta.progressToken if context.meta else None
+        except LookupError:  # called outside an MCP request
+            context, token = None, None
+        last_sent = 0.0
+        
+        async def report(done: int, message: str, final: bool = False):
+            nonlocal last_sent
+            now = time.monotonic()
+            if token is None or (not final and now - last_sent < PROGRESS_INTERVAL):
+                return
+            last_sent = now
+            try:
+                await context.session.send_progress_notification(token, done, total, message=message)
+            except Exception as e:
+                logger.debug(f"Could not send progress notification: {e}")
+        
+        return report
+    
+    def prepare_image(self, data: bytes, prompt: str, mode: str):
+        """
+        Decode an image and, if the model is loaded, run its processor on it too (on a decode
+        thread, while the model works on earlier requests). Returns (image, inputs, inputs_model);
+        inputs is None if the model isn't loaded yet, and the inference thread prepares it instead.
+        """
+        try:
+            image = decode_image(data)
+        except ImageLoadError:
+            raise
+        except Exception as e:
+            raise ImageLoadError(str(e)) from e
+        models = self.models
+        processor, model_type, model_name = models.processor, models.model_type, models.model_name
+        if models.state != 'ready' or processor is None:
+            return image, None, None
+        return image, self.preprocess(processor, model_type, image, prompt, mode), (model_type, model_name)
+    
+    @staticmethod
+    def preprocess(processor, model_type: str, image: Image.Image, prompt: str, mode: str) -> Dict[str, Any]:
+        """Processor output for one image, as a batch of one. No padding or truncation, so the tokenizer
+        isn't reconfigured and several threads can call this at once"""
+        if model_type == "blip":
+            # For original BLIP, we can use conditional or unconditional generation
+            if mode == "straightforward":
+                # Unconditional generation
+                return processor(image, return_tensors="pt")
+            # Conditional generation with prompt
+            return processor(image, text=prompt, return_tensors="pt")
+        if model_type == "git":
+            return processor(images=image, return_tensors="pt")
+        return processor(image, text=prompt, return_tensors="pt")
+    
+    def generate_captions(self, models: ModelManager, jobs: List[CaptionJob]) -> List[Optional[str]]:
+        """Run the loaded model on a batch of images sharing one prompt and settings (on the inference thread)"""
+        import torch
+        
+        temperature, top_p, max_tokens = jobs[0].temperature, jobs[0].top_p, jobs[0].max_tokens
+        # Jobs share a prompt and mode, so their rows have the same shapes and stack into one batch
+        identity = (models.model_type, models.model_name)
+        rows = [job.inputs if job.inputs is not None and job.inputs_model == identity
+                else self.preprocess(models.processor, models.model_type, job.image, job.prompt, job.mode)
+                for job in jobs]
+        inputs = {key: torch.cat([row[key] for row in rows]).to(models.device) for key in rows[0].keys()}
+        # Stops generating a row between tokens if its caller goes away
+        stopping_criteria = cancel_criteria(jobs)
+        captions: List[Optional[str]] = [None] * len(jobs)
+        
+        if models.model_type == "blip2":
+            with torch.no_grad():
+                outputs = models.model.generate(
+                    **inputs,
+                    max_new_tokens=max_tokens,
+                    do_sample=True,
+                    temperature=temperature,
+                    top_p=top_p,
+                    stopping_criteria=stopping_criteria
+                )
+            
+            captions = [c.strip() for c in models.processor.batch_decode(outputs, skip_special_tokens=True)]
+        
+        elif models.model_type == "blip":
+            with torch.no_grad():
+                outputs = models.model.generate(
+                    **inputs,
+                    max_length=max_tokens,
+                    num_beams=3,
+                    temperature=temperature,
+                    top_p=top_p,
+                    stopping_criteria=stopping_criteria
+                )
+            
+            captions = models.processor.batch_decode(outputs, skip_special_tokens=True)
+        
+        elif models.model_type == "git":
+            with torch.no_grad():
+                outputs = models.model.generate(
+                    pixel_values=inputs["pixel_values"],
+                    max_length=max_tokens,
+                    do_sample=True,
+                    temperature=temperature,
+                    top_p=top_p,
+                    stopping_criteria=stopping_criteria
+                )
+            
+            captions = models.processor.batch_decode(outputs, skip_special_tokens=True)
+        
+        return captions
+    
     async def list_caption_modes(self) -> List[types.TextContent]:
         """List all available caption modes"""
         modes_text = "Available caption modes:\n\n"
@@ -360,21 +639,74 @@ class JoyCaptionServer:
         
         return [types.TextContent(type="text", text=options_text)]
     
+    async def model_status(self) -> List[types.TextContent]:
+        """Report the model's lifecycle state and the caption queue"""
+        status = self.models.status()
+        lines = [f"Model state: {status['state']}"]
+        if status['stage']:
+            lines.append(f"Current step: {status['stage']}")
+        if status['loading_for_seconds'] is not None:
+            lines.append(f"Loading for: {status['loading_for_seconds']}s")
+        if status['model_name']:
+            lines.append(f"Model: {status['model_name']} ({status['model_type']}) on {status['device']}")
+        if status['load_seconds'] is not None:
+            lines.append(f"Load time: {status['load_seconds']}s")
+        queue = self.worker.status()
+        status['queue'] = queue
+        if queue['running_for_seconds'] is not None:
+            lines.append(f"Captioning now: {queue['running']} image(s), running for {queue['running_for_seconds']}s")
+        lines.append(f"Queued captions: {queue['queued']}/{queue['queue_limit']}"
+                     + (f" (estimated wait {queue['estimated_wait_seconds']}s)"
+                        if queue['estimated_wait_seconds'] is not None else ""))
+        if queue['average_seconds'] is not None:
+            lines.append(f"Average batch time: {queue['average_seconds']}s, "
+                         f"average batch size: {queue['average_batch_size']} (max {queue['max_batch']})")
+        lines.append(f"Completed: {queue['completed']}, failed: {queue['failed']}, "
+                     f"cancelled: {queue['cancelled']}, turned away (queue full): {queue['rejected']}")
+        cache = self.caption_cache()
+        status['cache'] = cache.stats() if cache is not None else None
+        if cache is not None:
+            stats = status['cache']
+            lines.append(f"Caption cache: {stats['entries']} captions, {stats['stored_mb']}/{stats['limit_mb']} MB, "
+                         f"hits: {stats['hits']}, misses: {stats['misses']}, evictions: {stats['evictions']}")
+        else:
+            lines.append("Caption cache: disabled")
+        if status['pinned']:
+            lines.append("Pinned: the model is never unloaded")
+        elif status['idle_unload_seconds']:
+            lines.append(f"Unloads after {status['idle_unload_seconds']:.0f}s idle"
+                         + (f" (idle for {status['idle_seconds']}s)" if status['idle_seconds'] is not None else ""))
+        for error in status['errors']:
+            lines.append(f"Load error: {error}")
+        lines.append(f"\n{json.dumps(status, indent=2)}")
+        
+        return [types.TextContent(type="text", text="\n".join(lines))]
+    
     async def run(self):
         """Run the MCP server"""
         async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-            await self.server.run(
-                read_stream,
-                write_stream,
-                InitializationOptions(
-                    server_name="JoyCaption MCP",
-                    server_version="1.0.0",
-                    capabilities=self.server.get_capabilities(
-                        notification_options=NotificationOptions(),
-                        experimental_capabilities={},
+            # Start loading the model now, so the first caption doesn't wait for all of it
+            self.models.start()
+            self.worker.start()
+            try:
+                await self.server.run(
+                    read_stream,
+                    write_stream,
+                    InitializationOptions(
+                        server_name="JoyCaption MCP",
+                        server_version="1.0.0",
+                        capabilities=self.server.get_capabilities(
+                            notification_options=NotificationOptions(),
+                            experimental_capabilities={},
+                        ),
                     ),
-                ),
-            )
+                )
+            finally:
+                await self.worker.stop()
+                await self.models.stop()
+                self.decode_pool.shutdown(wait=False)
+                if self.cache is not None:
+                    self.cache.close()
 
 def main():
     """Main entry point"""
@@ -8,7 +8,7 @@ setup(
         "mcp>=0.9.0",
         "torch>=2.0.0",
         "torchvision",
-        "transformers>=4.36.0",
+        "transformers>=4.39.0",
         "Pillow>=10.0.0",
         "accelerate>=0.25.0",
     ],
@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+"""
+Test script for JoyCaption MCP
+
+Runs offline: the inference worker gets a fake generate function and a
+stand-in for ModelManager, so no model is downloaded or loaded.
+"""
+
+import asyncio
+import io
+import json
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from joycaption_mcp.cache import EVICT_TO, CaptionCache, caption_key, image_digest, open_caption_cache
+from joycaption_mcp.inference import CaptionJob, InferenceWorker, QueueFullError
+from joycaption_mcp.model import ModelManager
+from joycaption_mcp.pipeline import prefetch
+from joycaption_mcp.server import ImageLoadError, JoyCaptionServer
+
+
+class FakeModels:
+    """Stand-in for ModelManager with a model that is always ready"""
+
+    expected_models = ModelManager.expected_models
+
+    def __init__(self, processor=None):
+        self.state = 'ready'
+        self.candidates = [("blip", "fake/blip")]
+        self.model_type = "blip"
+        self.model_name = "fake/blip"
+        self.processor = processor
+
+    @asynccontextmanager
+    async def use(self):
+        yield self
+
+
+def recording_generate(calls: list, gate: threading.Event = None):
+    """generate(models, jobs) that records each batch and, given a gate, blocks until it is set"""
+    def generate(models, jobs):
+        calls.append([job.image for job in jobs])
+        if gate is not None:
+            gate.wait(5)
+        return [f"caption of {job.image}" for job in jobs]
+    return generate
+
+
+# Enough of torch for ModelManager.load to pick the CPU
+FAKE_TORCH = SimpleNamespace(cuda=SimpleNamespace(is_available=lambda: False))
+
+
+def fake_loader(models: ModelManager, gate: threading.Event = None, failures: int = 0) -> list:
+    """Replace the model download with a stand-in that can be held on a gate or made to fail"""
+    attempts = []
+
+    def load_candidate(torch, device, model_type, model_name):
+        attempts.append(model_name)
+        if gate is not None:
+            gate.wait(5)
+        if len(attempts) <= failures:
+            raise OSError("weights not found")
+        models.processor, models.model = "processor", SimpleNamespace(eval=lambda: None)
+        models.model_type, models.model_name = model_type, model_name
+
+    models.load_candidate = load_candidate
+    return attempts
+
+
+def make_job(image, prompt="Describe this image in detail:", mode="descriptive") -> CaptionJob:
+    return CaptionJob(image, prompt, mode, 0.7, 0.9, 256)
+
+
+def make_server(tmp: str, calls: list, processor=None) -> JoyCaptionServer:
+    """JoyCaptionServer with a fake model, a recording worker and a throwaway caption cache"""
+    server = JoyCaptionServer()
+    server.models = FakeModels(processor)
+    server.worker = InferenceWorker(server.models, recording_generate(calls), batch_window=0)
+    server.cache = CaptionCache(Path(tmp) / "captions.sqlite", 1_000_000)
+    server.cache_opened = True
+    return server
+
+
+async def wait_until(condition, timeout: float = 5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "timed out waiting for the worker"
+        await asyncio.sleep(0.01)
+
+
+def test_worker_rejects_when_full_and_ignores_abandoned_jobs():
+    """A full queue turns callers away, and jobs whose callers gave up free their slot at once"""
+    async def run():
+        gate, calls = threading.Event(), []
+        worker = InferenceWorker(FakeModels(), recording_generate(calls, gate),
+                                 max_queue=2, max_batch=1, batch_window=0)
+        first = asyncio.ensure_future(worker.submit(make_job("img0")))
+        await wait_until(lambda: calls)
+
+        waiting = [asyncio.ensure_future(worker.submit(make_job(f"img{i}"))) for i in (1, 2)]
+        await asyncio.sleep(0)
+        assert worker.queued() == 2
+        with pytest.raises(QueueFullError, match="2 captions queued"):
+            await worker.submit(make_job("img3"))
+
+        # Both callers time out: their jobs no longer hold the queue
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+        assert worker.queued() == 0
+        live = asyncio.ensure_future(worker.submit(make_job("img4")))
+
+        gate.set()
+        assert await first == "caption of img0"
+        assert await live == "caption of img4"
+        # The abandoned jobs never reached the model
+        assert calls == [["img0"], ["img4"]]
+        status = worker.status()
+        assert (status['completed'], status['cancelled'], status['rejected'], status['queued']) == (2, 2, 1, 0)
+        await worker.stop()
+
+    asyncio.run(run())
+
+
+def test_worker_batches_compatible_jobs_up_to_max_batch():
+    """Jobs arriving together share a batch only with the same settings, and batches stop at max_batch"""
+    async def run():
+        calls = []
+        worker = InferenceWorker(FakeModels(), recording_generate(calls), max_batch=4, batch_window=0.05)
+        order = [("a0", "A"), ("b0", "B"), ("a1", "A"), ("a2", "A"), ("b1", "B"), ("a3", "A"), ("a4", "A")]
+        captions = await asyncio.gather(*(worker.submit(make_job(image, prompt=prompt)) for image, prompt in order))
+
+        assert captions == [f"caption of {image}" for image, _ in order]
+        # The first batch fills up with A jobs, the deferred B jobs go next, then the A left over
+        assert calls == [["a0", "a1", "a2", "a3"], ["b0", "b1"], ["a4"]]
+        # Mode and sampling settings split batches too
+        assert make_job("x").batch_key() != make_job("x", mode="straightforward").batch_key()
+        status = worker.status()
+        assert (status['batches'], status['average_batch_size'], status['completed']) == (3, 2.33, 7)
+        await worker.stop()
+
+    asyncio.run(run())
+
+
+def test_caption_waits_for_background_load_without_blocking_the_loop(monkeypatch):
+    """A caption queued while the model loads waits for it, and the event loop keeps running meanwhile"""
+    monkeypatch.setitem(sys.modules, "torch", FAKE_TORCH)
+
+    async def run():
+        gate, calls = threading.Event(), []
+        models = ModelManager([("blip", "fake/blip")], pinned=False, idle_unload=0)
+        fake_loader(models, gate)
+        worker = InferenceWorker(models, recording_generate(calls), batch_window=0)
+        models.start_loading()
+        caption = asyncio.ensure_future(worker.submit(make_job("img0")))
+        await wait_until(lambda: models.waiting == 1)
+
+        # The loader thread is stuck, but timers on the loop still fire on time
+        started = time.monotonic()
+        await asyncio.sleep(0.05)
+        assert time.monotonic() - started < 0.5
+        status = models.status()
+        assert (status['state'], status['requests_waiting']) == ('loading', 1)
+        assert status['loading_for_seconds'] is not None
+        assert calls == [] and not caption.done()
+
+        gate.set()
+        assert await caption == "caption of img0"
+        status = models.status()
+        assert (status['state'], status['model_name'], status['loads'], status['requests_waiting']) \
+            == ('ready', "fake/blip", 1, 0)
+        await worker.stop()
+
+    asyncio.run(run())
+
+
+def test_failed_load_is_retried_by_the_next_request(monkeypatch):
+    """A load that fails fails the waiting caption with the reason; the next caption loads again"""
+    monkeypatch.setitem(sys.modules, "torch", FAKE_TORCH)
+
+    async def run():
+        calls = []
+        models = ModelManager([("blip", "fake/blip")], pinned=False, idle_unload=0)
+        attempts = fake_loader(models, failures=1)
+        worker = InferenceWorker(models, recording_generate(calls), batch_window=0)
+        with pytest.raises(RuntimeError, match="Could not load any vision-language model: blip: weights not found"):
+            await worker.submit(make_job("img0"))
+        assert models.status()['state'] == 'failed'
+
+        assert await worker.submit(make_job("img1")) == "caption of img1"
+        assert attempts == ["fake/blip", "fake/blip"]
+        status = models.status()
+        assert (status['state'], status['loads'], status['errors']) == ('ready', 1, [])
+        assert calls == [["img1"]]
+        await worker.stop()
+
+    asyncio.run(run())
+
+
+def test_idle_unload_skips_pinned_model(monkeypatch):
+    """An idle model is unloaded and reported as such, unless it is pinned"""
+    monkeypatch.setitem(sys.modules, "torch", FAKE_TORCH)
+    monkeypatch.setattr("joycaption_mcp.model.DEFAULT_PRELOAD", False)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = make_server(tmp, [])
+
+        async def run():
+            managers = [ModelManager([("blip", "fake/blip")], pinned=pinned, idle_unload=0.05)
+                        for pinned in (False, True)]
+            for models in managers:
+                fake_loader(models)
+                await models.start_loading()
+                models.start()
+            # The idle check runs at most once a second
+            await asyncio.sleep(1.2)
+            for models in managers:
+                await models.stop()
+            return managers
+
+        unpinned, pinned = asyncio.run(run())
+        assert (unpinned.state, unpinned.model, unpinned.unloads) == ('not_loaded', None, 1)
+        assert (pinned.state, pinned.unloads) == ('ready', 0)
+
+        server.models = pinned
+        text = asyncio.run(server.model_status())[0].text
+        assert "Model state: ready" in text and "Model: fake/blip (blip) on cpu" in text
+        assert "Pinned: the model is never unloaded" in text
+        server.models = unpinned
+        text = asyncio.run(server.model_status())[0].text
+        assert "Model state: not_loaded" in text and "Unloads after 0s idle" in text
+        server.cache.close()
+
+
+def test_caption_key_covers_every_setting():
+    """Changing the image or any generation setting changes the key"""
+    base = dict(digest="ab" * 32, model_type="blip", model_name="fake/blip", mode="descriptive",
+                prompt="Describe this image in detail:", temperature=0.7, top_p=0.9, max_tokens=256)
+    changes = dict(digest="cd" * 32, model_type="git", model_name="other/blip", mode="straightforward",
+                   prompt="Describe this image:", temperature=0.6, top_p=0.8, max_tokens=255)
+    key = caption_key(**base)
+    assert caption_key(**base) == key
+    for name, value in changes.items():
+        assert caption_key(**dict(base, **{name: value})) != key, name
+
+
+def test_caption_cache_hits_and_evicts_least_recently_used():
+    """Hits are counted, used entries survive eviction and the store shrinks to EVICT_TO of its limit"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "captions.sqlite"
+        cache = CaptionCache(path, max_bytes=2000)
+        keys = [f"{i:064x}" for i in range(21)]
+        caption = "c" * 36  # 100 bytes per entry with its key
+        for key in keys[:10]:
+            cache.set(key, caption)
+        assert cache.get(keys[0]) == caption
+        assert cache.get("missing") is None
+        assert cache.stats()['evictions'] == 0
+
+        # The 21st entry goes over the limit: the oldest are dropped down to EVICT_TO of it
+        for key in keys[10:]:
+            cache.set(key, caption)
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['evictions']) == (1, 1, 3)
+        assert cache.total == 2000 * EVICT_TO == cache.stored_bytes()
+        # keys[0] was read after the others were written, so keys[1] went first
+        assert [cache.get(key) is not None for key in keys[:5]] == [True, False, False, False, True]
+        assert cache.get(keys[-1]) == caption
+        cache.close()
+
+        reopened = CaptionCache(path, max_bytes=2000)
+        assert reopened.get(keys[-1]) == caption
+        assert len(reopened) == 18
+        reopened.close()
+        assert open_caption_cache(Path(tmp), max_mb=0) is None
+
+
+def test_caption_file_serves_repeats_and_renamed_copies_from_cache():
+    """Identical bytes with identical settings skip the model, unless the request opts out"""
+    with tempfile.TemporaryDirectory() as tmp:
+        image = Path(tmp) / "red.png"
+        Image.new("RGB", (32, 32), "red").save(image)
+        renamed = Path(tmp) / "renamed.png"
+        shutil.copy(image, renamed)
+        calls = []
+        server = make_server(tmp, calls)
+        args = ("descriptive", "Describe this image in detail:", 0.7, 0.9, 256)
+
+        async def run():
+            first = await server.caption_file(image, *args)
+            assert first[1] is False
+            assert await server.caption_file(image, *args) == (first[0], True)
+            assert await server.caption_file(renamed, *args) == (first[0], True)
+            assert len(calls) == 1
+            # A fresh sample when asked for one, or when a setting differs
+            assert (await server.caption_file(image, *args, use_cache=False))[1] is False
+            assert (await server.caption_file(image, "descriptive", args[1], 0.5, 0.9, 256))[1] is False
+            assert len(calls) == 3
+            await server.worker.stop()
+
+        asyncio.run(run())
+        assert server.cache.stats()['hits'] == 2
+        server.cache.close()
+
+
+def test_cold_server_answers_cached_captions_without_loading():
+    """Before the model has loaded, captions stored by any configured model come straight from the cache"""
+    with tempfile.TemporaryDirectory() as tmp:
+        image = Path(tmp) / "red.png"
+        Image.new("RGB", (32, 32), "red").save(image)
+        prompt = "Describe this image in detail:"
+        server = make_server(tmp, [])
+        models = ModelManager([("blip2", "fake/blip2"), ("blip", "fake/blip")], pinned=False, idle_unload=0)
+        server.models = server.worker.models = models
+        # Stored by the fallback model in an earlier session
+        digest = image_digest(image.read_bytes())
+        server.cache.set(caption_key(digest, "blip", "fake/blip", "descriptive", prompt, 0.7, 0.9, 256), "a red square")
+
+        async def run():
+            return await asyncio.wait_for(server.caption_file(image, "descriptive", prompt, 0.7, 0.9, 256), 1)
+
+        assert asyncio.run(run()) == ("a red square", True)
+        assert models.state == 'not_loaded' and server.cache.stats()['hits'] == 1
+        # Once a model is loaded, only it and the models preferred to it are asked for
+        models.model_type, models.model_name = "blip2", "fake/blip2"
+        assert models.expected_models() == [("blip2", "fake/blip2")]
+        server.cache.close()
+
+
+def test_sampled_captions_are_only_cached_on_request():
+    """A sampling model gives a fresh caption per request unless the caller opts into the cache"""
+    with tempfile.TemporaryDirectory() as tmp:
+        image = Path(tmp) / "red.png"
+        Image.new("RGB", (32, 32), "red").save(image)
+        calls = []
+        server = make_server(tmp, calls)
+        server.models.model_type, server.models.model_name = "git", "fake/git"
+        args = ("descriptive", "Describe this image in detail:", 0.7, 0.9, 256)
+
+        async def run():
+            assert [(await server.caption_file(image, *args))[1] for _ in range(2)] == [False, False]
+            assert len(server.cache) == 0
+            assert [(await server.caption_file(image, *args, use_cache=True))[1] for _ in range(2)] == [False, True]
+            assert len(calls) == 3
+            await server.worker.stop()
+
+        asyncio.run(run())
+        server.cache.close()
+
+
+def test_captions_are_cached_under_the_model_that_wrote_them():
+    """A model swap between generating and storing a caption doesn't file it under the new model"""
+    with tempfile.TemporaryDirectory() as tmp:
+        image = Path(tmp) / "red.png"
+        Image.new("RGB", (32, 32), "red").save(image)
+        calls = []
+        server = make_server(tmp, calls)
+        generate = recording_generate(calls)
+
+        def generate_then_swap(models, jobs):
+            captions = generate(models, jobs)
+            models.model_type, models.model_name = "blip", "fake/blip"
+            return captions
+
+        server.worker.generate = generate_then_swap
+        args = ("descriptive", "Describe this image in detail:", 0.7, 0.9, 256)
+
+        async def run():
+            # Written by the sampling model, so not cached even though BLIP is loaded by now
+            server.models.model_type, server.models.model_name = "git", "fake/git"
+            assert (await server.caption_file(image, *args))[1] is False
+            assert len(server.cache) == 0
+            server.models.model_type, server.models.model_name = "git", "fake/git"
+            assert (await server.caption_file(image, *args, use_cache=True))[1] is False
+            await server.worker.stop()
+
+        asyncio.run(run())
+        digest = image_digest(image.read_bytes())
+        assert server.cache.get(caption_key(digest, "git", "fake/git", *args)) is not None
+        assert server.cache.get(caption_key(digest, "blip", "fake/blip", *args)) is None
+        server.cache.close()
+
+
+def make_image_dir(directory: Path, names: list) -> None:
+    """Write one small PNG per name, each a different colour so none share a cache entry"""
+    for i, name in enumerate(names):
+        Image.new("RGB", (8, 8), (i * 40, 0, 0)).save(directory / name)
+
+
+def test_caption_directory_skips_limits_reports_and_waits_for_room():
+    """Sidecars are skipped unless overwrite is set, limit holds, failures are listed and a full queue is waited out"""
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    with tempfile.TemporaryDirectory() as tmp:
+        images = Path(tmp) / "images"
+        images.mkdir()
+        make_image_dir(images, ["a.png", "b.png", "c.png", "d.png", "e.png"])
+        (images / "b.json").write_text('{"caption": "kept"}')
+        (images / "broken.png").write_bytes(b"not an image")
+        gate, calls = threading.Event(), []
+        server = make_server(tmp, calls)
+        server.worker = InferenceWorker(server.models, recording_generate(calls, gate),
+                                        max_queue=2, max_batch=1, batch_window=0)
+        progress = []
+
+        async def on_progress(done, total, message):
+            progress.append((done, total))
+
+        async def run():
+            # Another client's captions fill the queue (one running, two waiting)
+            others = [asyncio.ensure_future(server.worker.submit(make_job("other0")))]
+            await wait_until(lambda: calls)
+            others += [asyncio.ensure_future(server.worker.submit(make_job(f"other{i}"))) for i in (1, 2)]
+            await wait_until(lambda: server.worker.queued() == 2)
+            async with create_connected_server_and_client_session(server.server) as client:
+                call = asyncio.ensure_future(client.call_tool(
+                    "caption_directory", {"directory": str(images), "limit": 4}, progress_callback=on_progress))
+                await asyncio.sleep(0.3)
+                # Waiting for room, not turned away
+                assert not call.done() and not (images / "a.json").exists()
+                gate.set()
+                result = await call
+                await asyncio.gather(*others)
+                sidecars = [path.name for path in sorted(images.glob("*.json"))]
+                assert json.loads((images / "b.json").read_text())["caption"] == "kept"
+                again = await client.call_tool("caption_directory", {"directory": str(images), "overwrite": True})
+            await server.worker.stop()
+            return result.content[0].text, sidecars, again.content[0].text
+
+        text, sidecars, again = asyncio.run(run())
+        # Sorted: a, b (has a sidecar), broken, c, d, e; the limit stops before e
+        assert "Captioned 3 of 4 images" in text
+        assert "Skipped 1 images that already have a JSON caption file" in text
+        assert "Failed: 1" in text and "broken.png: cannot identify image file" in text
+        assert sidecars == ["a.json", "b.json", "c.json", "d.json"]
+        assert progress and progress[-1] == (4, 4)
+
+        # overwrite recaptions b and picks up e; a, c and d come from the cache
+        assert "Captioned 5 of 6 images" in again and "3 captions came from the cache" in again
+        assert json.loads((images / "b.json").read_text())["caption"].startswith("caption of")
+        assert (images / "e.json").exists()
+        server.decode_pool.shutdown()
+        server.cache.close()
+
+
+def test_caption_directory_keeps_finished_sidecars_when_interrupted():
+    """Each sidecar is written as soon as its caption is ready, so a cancelled run keeps them"""
+    with tempfile.TemporaryDirectory() as tmp:
+        images = Path(tmp) / "images"
+        images.mkdir()
+        make_image_dir(images, ["a.png", "b.png", "c.png"])
+        gate, calls = threading.Event(), []
+        server = make_server(tmp, calls)
+
+        def generate(models, jobs):
+            # The first caption comes back at once, the rest hang until the run is cancelled
+            calls.append(len(jobs))
+            if len(calls) > 1:
+                gate.wait(5)
+            return ["a caption"] * len(jobs)
+
+        server.worker = InferenceWorker(server.models, generate, max_batch=1, batch_window=0)
+
+        async def run():
+            task = asyncio.ensure_future(server.caption_directory(
+                {"directory": str(images), "use_cache": False}))
+            await wait_until(lambda: (images / "a.json").exists())
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            gate.set()
+            await server.worker.stop()
+
+        asyncio.run(run())
+        assert json.loads((images / "a.json").read_text())["caption"] == "a caption"
+        assert sorted(path.name for path in images.iterdir()) == ["a.json", "a.png", "b.png", "c.png"]
+        server.decode_pool.shutdown()
+        server.cache.close()
+
+
+class RecordingProcessor:
+    """Processor stand-in that records which thread called it and with what"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, image, text=None, return_tensors=None):
+        self.calls.append((threading.current_thread().name, image.size, text))
+        return {"pixel_values": f"pixels of {image.size}"}
+
+
+def png_bytes(size=(16, 8)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "blue").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_prepare_image_runs_the_processor_on_a_decode_thread():
+    """With the model ready, decoding and preprocessing both happen off the inference thread"""
+    with tempfile.TemporaryDirectory() as tmp:
+        processor, jobs = RecordingProcessor(), []
+        server = make_server(tmp, [], processor)
+        server.worker.generate = lambda models, batch: jobs.extend(batch) or ["a caption"] * len(batch)
+        image = Path(tmp) / "blue.png"
+        image.write_bytes(png_bytes())
+        prompt = "Describe this image in detail:"
+
+        async def run():
+            assert await server.caption_file(image, "descriptive", prompt, 0.7, 0.9, 256, use_cache=False) \
+                == ("a caption", False)
+            await server.worker.stop()
+
+        asyncio.run(run())
+        thread, size, text = processor.calls[0]
+        assert thread.startswith("decode") and (size, text) == ((16, 8), prompt)
+        # The job carries the processor output and which model it was prepared for
+        assert jobs[0].inputs == {"pixel_values": "pixels of (16, 8)"}
+        assert jobs[0].inputs_model == ("blip", "fake/blip")
+
+        # Until the model is loaded, only the decode happens here
+        server.models.state = 'loading'
+        decoded, inputs, inputs_model = server.prepare_image(png_bytes(), prompt, "descriptive")
+        assert decoded.size == (16, 8) and (inputs, inputs_model) == (None, None)
+        assert len(processor.calls) == 1
+        with pytest.raises(ImageLoadError, match="cannot identify image file"):
+            server.prepare_image(b"not an image", prompt, "descriptive")
+        server.decode_pool.shutdown()
+        server.cache.close()
+
+
+def test_prefetch_keeps_order_reports_errors_and_bounds_lookahead():
+    """Results come back in input order with per-item errors, and no more than lookahead items run ahead"""
+    started = []
+
+    def work(item):
+        started.append(item)
+        if item == 3:
+            raise ValueError("bad item")
+        time.sleep(0.01 * (item % 2))  # odd items finish after the even ones queued behind them
+        return item * 10
+
+    results = prefetch(work, range(8), workers=2, lookahead=3)
+    assert next(results) == (0, 0, None)
+    # The first item, plus three looked ahead once it was handed over
+    time.sleep(0.1)
+    assert sorted(started) == [0, 1, 2, 3]
+    rest = list(results)
+    assert [(item, result) for item, result, _ in rest] == [(1, 10), (2, 20), (3, None), (4, 40),
+                                                          (5, 50), (6, 60), (7, 70)]
+    assert [str(error) for _, _, error in rest if error] == ["bad item"]
+
+    # lookahead=0 runs each item only when the consumer asks for it
+    started.clear()
+    inline = prefetch(work, range(8), lookahead=0)
+    assert next(inline) == (0, 0, None) and started == [0]
+    assert [error is not None for _, _, error in inline] == [False, False, True, False, False, False, False]